@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FlowMark 性能基准测试
+
+在 Qt offscreen 平台下运行，测量按键到预览的延迟、Markdown 转换吞吐量、
+文件读写吞吐量和主窗口启动时间，结果写入 JSON 以便在不同提交之间比较。
+
+用法：
+    python benchmarks/run_benchmarks.py -o results.json
+    python benchmarks/run_benchmarks.py --sizes 1K,1M --compare old.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+# 使用临时的用户目录，避免读写真实的设置和编辑日志
+os.environ["HOME"] = tempfile.mkdtemp(prefix="flowmark-bench-")
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# 默认测试的文档大小
+DEFAULT_SIZES = "1K,10K,100K,1M,10M,50M"
+
+# 生成文档时循环使用的片段
+SAMPLE_SECTIONS = [
+    "## 第 {n} 节 Section {n}\n\n",
+    "这是一段中文内容，用于测试 CJK 文本的渲染性能。Some *emphasis* and **bold** text, "
+    "with `inline code` and a [link](https://example.com/{n}).\n\n",
+    "- 列表项 one\n- 列表项 two\n  - nested item\n- 列表项 three\n\n",
+    "```python\ndef f{n}(x):\n    return x * {n}\n```\n\n",
+    "| 列 A | 列 B | 列 C |\n| --- | --- | --- |\n| {n} | b | c |\n| 1 | 2 | 3 |\n\n",
+    "> 引用 quote block number {n}\n> continued line\n\n",
+]
+
+
+def parse_size(text):
+    """解析 1K / 10M 这样的大小"""
+    text = text.strip().upper()
+    units = {"K": 1024, "M": 1024 * 1024, "G": 1024 * 1024 * 1024}
+    if text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+
+def format_size(size):
+    """格式化大小"""
+    for unit, factor in (("M", 1024 * 1024), ("K", 1024)):
+        if size >= factor and size % factor == 0:
+            return f"{size // factor}{unit}"
+    return str(size)
+
+
+def generate_document(size):
+    """生成约 size 字节（UTF-8）的 Markdown 文档"""
+    parts = []
+    total = 0
+    n = 0
+    while total < size:
+        section = SAMPLE_SECTIONS[n % len(SAMPLE_SECTIONS)].format(n=n)
+        parts.append(section)
+        total += len(section.encode("utf-8"))
+        n += 1
+    return "".join(parts)
+
+
+def git_commit():
+    """获取当前提交"""
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "HEAD"], cwd=ROOT, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return None
+
+
+def summarize(samples):
+    """汇总样本（毫秒）"""
+    ordered = sorted(samples)
+    return {
+        "mean": statistics.mean(ordered),
+        "p50": ordered[len(ordered) // 2],
+        "p95": ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))],
+        "max": ordered[-1],
+        "samples": len(ordered),
+    }
+
+
+class BenchmarkRunner:
+    """基准测试执行器"""
+
+    def __init__(self, sizes, keystrokes=30, repeat=3):
+        self.sizes = sizes
+        self.keystrokes = keystrokes
+        self.repeat = repeat
+        self.results = []
+        self._app = None
+
+    def record(self, name, size, unit, value):
+        """记录一项结果"""
+        self.results.append({"name": name, "size": size, "unit": unit, "value": value})
+        shown = value["p50"] if isinstance(value, dict) else value
+        print(f"{name:<28} {format_size(size):>6} {shown:>12.3f} {unit}")
+
+    def app(self):
+        """延迟创建 QApplication"""
+        if self._app is None:
+            from PyQt6.QtWidgets import QApplication
+            self._app = QApplication.instance() or QApplication([])
+        return self._app
+
+    def run(self):
+        for size in self.sizes:
+            text = generate_document(size)
+            self.bench_converter(size, text)
+            self.bench_file_io(size, text)
+            self.bench_startup(size)
+            self.bench_keystroke(size, text)
+        return self.results
+
+    def bench_converter(self, size, text):
+        """MarkdownConverter.to_html 吞吐量：冷启动和单字符编辑后的增量渲染"""
+        from flowmark.utils.markdown_converter import MarkdownConverter
+
+        megabytes = len(text.encode("utf-8")) / 1024 / 1024
+        cold = []
+        for _ in range(self.repeat):
+            converter = MarkdownConverter()
+            started = time.perf_counter()
+            converter.to_html(text)
+            cold.append(time.perf_counter() - started)
+        self.record("to_html.cold", size, "MB/s", megabytes / min(cold))
+
+        warm = []
+        middle = len(text) // 2
+        for i in range(self.repeat):
+            edited = text[:middle] + str(i) + text[middle:]
+            started = time.perf_counter()
+            converter.to_html(edited)
+            warm.append((time.perf_counter() - started) * 1000)
+        self.record("to_html.incremental_edit", size, "ms", summarize(warm))
+
+    def bench_file_io(self, size, text):
+        """FileHandler.open_file / save_file 吞吐量"""
+        from flowmark.utils.file_handler import FileHandler
+
+        file_handler = FileHandler()
+        megabytes = len(text.encode("utf-8")) / 1024 / 1024
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "bench.md")
+            save_times = []
+            open_times = []
+            for _ in range(self.repeat):
+                started = time.perf_counter()
+                file_handler.save_file(path, text)
+                save_times.append(time.perf_counter() - started)
+                started = time.perf_counter()
+                file_handler.open_file(path)
+                open_times.append(time.perf_counter() - started)
+        self.record("file.save", size, "MB/s", megabytes / min(save_times))
+        self.record("file.open", size, "MB/s", megabytes / min(open_times))
+
+    def bench_startup(self, size):
+        """MainWindow() 构造时间（与文档大小无关，只在第一个大小上测量）"""
+        if size != self.sizes[0]:
+            return
+        self.app()
+        from flowmark.ui.main_window import MainWindow
+
+        samples = []
+        for _ in range(self.repeat):
+            started = time.perf_counter()
+            window = MainWindow()
+            samples.append((time.perf_counter() - started) * 1000)
+            window.close()
+            window.deleteLater()
+        self.record("main_window.startup", 0, "ms", summarize(samples))
+
+    def bench_keystroke(self, size, text):
+        """按键延迟，以及从 update_preview 到渲染结果应用到预览的延迟"""
+        app = self.app()
+        from PyQt6.QtCore import QEventLoop, QTimer
+        from PyQt6.QtGui import QTextCursor
+        from flowmark.ui.main_window import MainWindow
+
+        window = MainWindow()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "bench.md")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(text)
+            window.load_file(path)
+            # 大文件在后台流式加载，等待加载完成
+            while window.editor.isReadOnly():
+                app.processEvents()
+                time.sleep(0.001)
+        window.preview_tab.setCurrentWidget(window.render_page)
+        app.processEvents()
+
+        cursor = QTextCursor(window.editor.document())
+        cursor.setPosition(window.editor.document().characterCount() // 2)
+
+        keystroke = []
+        preview = []
+        for i in range(self.keystrokes):
+            started = time.perf_counter()
+            cursor.insertText("x")
+            keystroke.append((time.perf_counter() - started) * 1000)
+
+            loop = QEventLoop()
+            window.render_worker.rendered.connect(loop.quit)
+            QTimer.singleShot(60000, loop.quit)
+            started = time.perf_counter()
+            window.update_preview()
+            loop.exec()
+            app.processEvents()
+            preview.append((time.perf_counter() - started) * 1000)
+            window.render_worker.rendered.disconnect(loop.quit)
+
+        self.record("editor.keystroke", size, "ms", summarize(keystroke))
+        self.record("update_preview.latency", size, "ms", summarize(preview))
+        window.close()
+        window.deleteLater()
+
+
+def compare(results, baseline_path):
+    """与之前的结果比较，输出变化比例"""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    previous = {(item["name"], item["size"]): item for item in baseline["results"]}
+    print(f"\n与 {baseline_path} ({baseline['meta'].get('commit')}) 比较：")
+    for item in results:
+        old = previous.get((item["name"], item["size"]))
+        if old is None:
+            continue
+        new_value = item["value"]["p50"] if isinstance(item["value"], dict) else item["value"]
+        old_value = old["value"]["p50"] if isinstance(old["value"], dict) else old["value"]
+        if old_value:
+            change = (new_value - old_value) / old_value * 100
+            print(f"{item['name']:<28} {format_size(item['size']):>6} {change:+8.1f}% ({item['unit']})")
+
+
+def main(argv=None):
+    """基准测试主函数"""
+    parser = argparse.ArgumentParser(description="FlowMark 性能基准测试")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES, help=f"文档大小列表，默认 {DEFAULT_SIZES}")
+    parser.add_argument("--keystrokes", type=int, default=30, help="每个大小模拟的按键次数")
+    parser.add_argument("--repeat", type=int, default=3, help="吞吐量测试的重复次数")
+    parser.add_argument("-o", "--output", default="bench_results.json", help="结果 JSON 文件")
+    parser.add_argument("--compare", help="与之前的结果 JSON 比较")
+    args = parser.parse_args(argv)
+
+    sizes = [parse_size(size) for size in args.sizes.split(",") if size.strip()]
+    runner = BenchmarkRunner(sizes, keystrokes=args.keystrokes, repeat=args.repeat)
+    results = runner.run()
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "qt_platform": os.environ.get("QT_QPA_PLATFORM"),
+        },
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\n结果已写入 {args.output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
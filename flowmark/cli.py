@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FlowMark 命令行入口
+
+不带子命令时启动图形界面；`flowmark convert` 在无显示环境下批量把
+Markdown 转换为 HTML 片段，`flowmark export` 导出完整的（可内嵌样式和
+图片的）HTML 文件，这两个子命令不会导入 PyQt6；`flowmark pdf` 在工作
+进程中用 offscreen 平台排版导出 PDF，不需要显示器。
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from flowmark.utils.file_handler import FileHandler
+
+# Markdown 文件扩展名
+MARKDOWN_EXTENSIONS = (".md", ".markdown")
+
+# 默认的转换缓存文件名
+CACHE_FILE_NAME = ".flowmark-cache.json"
+
+# 转换器输出格式的版本，渲染方式变化时递增，使旧的缓存条目失效
+CONVERTER_VERSION = 1
+
+# PDF 支持的纸张大小
+PAGE_SIZES = ("A3", "A4", "A5", "B5", "Letter", "Legal")
+
+# 每个工作进程复用的转换器
+_converter = None
+# 每个工作进程复用的 PDF 导出器及其 QGuiApplication
+_pdf_exporter = None
+_pdf_app = None
+
+
+def file_digest(file_path):
+    """计算文件内容的 SHA-1"""
+    digest = hashlib.sha1()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def collect_inputs(paths, output_dir=None, suffix=".html"):
+    """收集要转换的文件，返回 (输入路径, 输出路径) 列表"""
+    tasks = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+                for name in sorted(files):
+                    if name.lower().endswith(MARKDOWN_EXTENSIONS):
+                        source = os.path.join(root, name)
+                        relative = os.path.relpath(source, path)
+                        tasks.append((source, output_path(relative, source, output_dir, suffix)))
+        elif os.path.isfile(path):
+            tasks.append((path, output_path(os.path.basename(path), path, output_dir, suffix)))
+        else:
+            raise FileNotFoundError(f"文件不存在: {path}")
+    return tasks
+
+
+def output_path(relative, source, output_dir, suffix=".html"):
+    """计算输出文件路径：指定输出目录时保持相对结构，否则与输入文件放在一起"""
+    base = os.path.splitext(relative if output_dir else source)[0] + suffix
+    return os.path.join(output_dir, base) if output_dir else base
+
+
+def convert_file(source, target, cached_digest=None, extensions=None):
+    """在工作进程中转换单个文件
+
+    内容哈希与缓存一致且输出已存在时跳过转换。
+    返回 (输入路径, 状态, 内容哈希, 字节数, 错误信息)。
+    """
+    global _converter
+    try:
+        digest = file_digest(source)
+        size = os.path.getsize(source)
+        if digest == cached_digest and os.path.exists(target):
+            return source, "skipped", digest, size, ""
+
+        if _converter is None:
+            from flowmark.utils.markdown_converter import MarkdownConverter
+            _converter = MarkdownConverter(extensions=extensions)
+
+        file_handler = FileHandler()
+        html = _converter.to_html(file_handler.open_file(source))
+        file_handler.save_file(target, html)
+        return source, "converted", digest, size, ""
+    except Exception as e:
+        return source, "failed", None, 0, str(e)
+
+
+def converter_version():
+    """转换缓存条目的版本：FlowMark 转换器版本和 Python-Markdown 版本"""
+    try:
+        from importlib.metadata import version
+        markdown_version = version("markdown")
+    except Exception:
+        markdown_version = ""
+    return f"{CONVERTER_VERSION}/{markdown_version}"
+
+
+def load_cache(cache_path):
+    """读取转换缓存"""
+    if not cache_path or not os.path.exists(cache_path):
+        return {}
+    try:
+        with open(cache_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except ValueError:
+        return {}
+
+
+def convert(paths, output_dir=None, jobs=None, force=False, cache_path=None, quiet=False,
+            extensions=None):
+    """批量转换 Markdown 文件为 HTML，返回统计信息
+
+    缓存文件中其他输入的条目原样保留；条目记录转换时的扩展和转换器
+    版本，两者与本次不同时视为未命中。
+    """
+    from flowmark.utils.markdown_converter import DEFAULT_EXTENSIONS
+
+    started = time.perf_counter()
+    cache = load_cache(cache_path)
+    extension_names = list(DEFAULT_EXTENSIONS if extensions is None else extensions)
+    version = converter_version()
+    stats = {"converted": 0, "skipped": 0, "failed": 0, "bytes": 0}
+
+    pending = []
+    for source, target in collect_inputs(paths, output_dir):
+        key = os.path.abspath(source)
+        stat = os.stat(source)
+        entry = None if force else cache.get(key)
+        if entry and (entry.get("extensions") != extension_names or entry.get("version") != version):
+            entry = None
+        # 修改时间和大小都没变时无需读取文件
+        if entry and entry["mtime_ns"] == stat.st_mtime_ns and entry["size"] == stat.st_size \
+                and os.path.exists(target):
+            stats["skipped"] += 1
+            continue
+        pending.append((source, target, entry["sha1"] if entry else None, stat))
+
+    if pending:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = {
+                executor.submit(convert_file, source, target, digest, extensions): (source, stat)
+                for source, target, digest, stat in pending
+            }
+            # 每个文件转换完成后立即写出，按完成顺序汇报
+            for future in as_completed(futures):
+                source, status, digest, size, error = future.result()
+                stats[status] += 1
+                if status == "failed":
+                    cache.pop(os.path.abspath(source), None)
+                    print(f"转换失败: {source}: {error}", file=sys.stderr)
+                    continue
+                stats["bytes"] += size
+                stat = futures[future][1]
+                cache[os.path.abspath(source)] = {
+                    "mtime_ns": stat.st_mtime_ns, "size": stat.st_size, "sha1": digest,
+                    "extensions": extension_names, "version": version,
+                }
+                if not quiet and status == "converted":
+                    print(f"已转换: {source}")
+
+    if cache_path:
+        FileHandler().save_file(cache_path, json.dumps(cache, ensure_ascii=False))
+
+    stats["elapsed"] = time.perf_counter() - started
+    return stats
+
+
+def export(paths, output=None, self_contained=True, css_path=None, jobs=None, quiet=False,
+           extensions=None):
+    """把 Markdown 文件导出为完整的 HTML 文件，返回统计信息"""
+    from flowmark.utils.html_exporter import HtmlExporter
+    from flowmark.utils.markdown_converter import MarkdownConverter
+
+    started = time.perf_counter()
+    if output and output.lower().endswith((".html", ".htm")) and len(paths) == 1 and os.path.isfile(paths[0]):
+        tasks = [(paths[0], output)]
+    else:
+        tasks = collect_inputs(paths, output)
+
+    exporter = HtmlExporter(
+        MarkdownConverter(extensions=extensions), self_contained=self_contained,
+        css_path=css_path, jobs=jobs,
+    )
+    file_handler = FileHandler()
+    stats = {"exported": 0, "failed": 0, "images": 0, "missing": 0, "bytes": 0}
+    for source, target in tasks:
+        try:
+            result = exporter.export(
+                file_handler.open_file(source), target,
+                base_dir=os.path.dirname(os.path.abspath(source)),
+            )
+        except Exception as e:
+            stats["failed"] += 1
+            print(f"导出失败: {source}: {e}", file=sys.stderr)
+            continue
+        stats["exported"] += 1
+        for key in ("images", "missing", "bytes"):
+            stats[key] += result[key]
+        if result["missing"]:
+            print(f"{source}: {result['missing']} 张图片未找到", file=sys.stderr)
+        if not quiet:
+            print(f"已导出: {target}")
+
+    stats["elapsed"] = time.perf_counter() - started
+    return stats
+
+
+def export_pdf_file(source, target, page_size="A4", margin_mm=20, extensions=None):
+    """在工作进程中把单个文件导出为 PDF
+
+    返回 (输入路径, 页数, 未找到的图片数, 字节数, 错误信息)。
+    """
+    global _pdf_exporter, _pdf_app
+    try:
+        if _pdf_exporter is None:
+            if not (os.environ.get("DISPLAY") or os.environ.get("WAYLAND_DISPLAY")):
+                os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+            from PyQt6.QtGui import QGuiApplication, QPageSize
+            from flowmark.preview.pdf_exporter import PdfExporter
+            from flowmark.utils.markdown_converter import MarkdownConverter
+            _pdf_app = QGuiApplication.instance() or QGuiApplication(["flowmark"])
+            _pdf_exporter = PdfExporter(
+                MarkdownConverter(extensions=extensions),
+                page_size=QPageSize.PageSizeId[page_size], margin_mm=margin_mm,
+            )
+        result = _pdf_exporter.export(
+            FileHandler().open_file(source), target,
+            base_dir=os.path.dirname(os.path.abspath(source)),
+        )
+        return source, result["pages"], result["missing"], result["bytes"], ""
+    except Exception as e:
+        return source, 0, 0, 0, str(e)
+
+
+def export_pdf(paths, output=None, page_size="A4", margin_mm=20, jobs=None, quiet=False,
+               extensions=None):
+    """把 Markdown 文件批量导出为 PDF，返回统计信息"""
+    started = time.perf_counter()
+    if output and output.lower().endswith(".pdf") and len(paths) == 1 and os.path.isfile(paths[0]):
+        tasks = [(paths[0], output)]
+    else:
+        tasks = collect_inputs(paths, output, ".pdf")
+
+    stats = {"exported": 0, "failed": 0, "pages": 0, "missing": 0, "bytes": 0}
+    if tasks:
+        # 每个工作进程有自己的 QGuiApplication，多个文件并行排版
+        with ProcessPoolExecutor(max_workers=min(jobs or os.cpu_count() or 1, len(tasks))) as executor:
+            futures = {
+                executor.submit(export_pdf_file, source, target, page_size, margin_mm, extensions): target
+                for source, target in tasks
+            }
+            for future in as_completed(futures):
+                source, pages, missing, size, error = future.result()
+                if error:
+                    stats["failed"] += 1
+                    print(f"导出失败: {source}: {error}", file=sys.stderr)
+                    continue
+                stats["exported"] += 1
+                stats["pages"] += pages
+                stats["missing"] += missing
+                stats["bytes"] += size
+                if missing:
+                    print(f"{source}: {missing} 张图片未找到", file=sys.stderr)
+                if not quiet:
+                    print(f"已导出: {futures[future]}（{pages} 页）")
+
+    stats["elapsed"] = time.perf_counter() - started
+    return stats
+
+
+def format_stats(stats):
+    """格式化吞吐量统计"""
+    elapsed = max(stats["elapsed"], 1e-9)
+    files = stats["converted"] + stats["skipped"]
+    return (
+        f"转换 {stats['converted']} 个，跳过 {stats['skipped']} 个，失败 {stats['failed']} 个，"
+        f"耗时 {elapsed:.2f} 秒，{files / elapsed:.1f} 文件/秒，"
+        f"{stats['bytes'] / elapsed / 1024 / 1024:.2f} MB/秒"
+    )
+
+
+def run_convert(args):
+    """执行 convert 子命令"""
+    extensions = None
+    if args.extensions is not None:
+        extensions = [name.strip() for name in args.extensions.split(",") if name.strip()]
+    if args.no_cache:
+        cache_path = None
+    else:
+        cache_path = os.path.join(args.output or os.getcwd(), CACHE_FILE_NAME)
+    stats = convert(
+        args.inputs, output_dir=args.output, jobs=args.jobs, force=args.force,
+        cache_path=cache_path, quiet=args.quiet, extensions=extensions,
+    )
+    print(format_stats(stats))
+    return 1 if stats["failed"] else 0
+
+
+def run_export(args):
+    """执行 export 子命令"""
+    extensions = None
+    if args.extensions is not None:
+        extensions = [name.strip() for name in args.extensions.split(",") if name.strip()]
+    stats = export(
+        args.inputs, output=args.output, self_contained=not args.no_embed, css_path=args.css,
+        jobs=args.jobs, quiet=args.quiet, extensions=extensions,
+    )
+    print(
+        f"导出 {stats['exported']} 个，失败 {stats['failed']} 个，内嵌图片 {stats['images']} 张，"
+        f"未找到 {stats['missing']} 张，共 {stats['bytes'] / 1024 / 1024:.2f} MB，"
+        f"耗时 {stats['elapsed']:.2f} 秒"
+    )
+    return 1 if stats["failed"] else 0
+
+
+def run_pdf(args):
+    """执行 pdf 子命令"""
+    extensions = None
+    if args.extensions is not None:
+        extensions = [name.strip() for name in args.extensions.split(",") if name.strip()]
+    stats = export_pdf(
+        args.inputs, output=args.output, page_size=args.page_size, margin_mm=args.margin,
+        jobs=args.jobs, quiet=args.quiet, extensions=extensions,
+    )
+    print(
+        f"导出 {stats['exported']} 个，失败 {stats['failed']} 个，共 {stats['pages']} 页，"
+        f"未找到图片 {stats['missing']} 张，共 {stats['bytes'] / 1024 / 1024:.2f} MB，"
+        f"耗时 {stats['elapsed']:.2f} 秒"
+    )
+    return 1 if stats["failed"] else 0
+
+
+def build_parser():
+    """创建命令行参数解析器"""
+    parser = argparse.ArgumentParser(prog="flowmark", description="FlowMark Markdown 编辑器")
+    subparsers = parser.add_subparsers(dest="command")
+
+    convert_parser = subparsers.add_parser("convert", help="批量将 Markdown 转换为 HTML")
+    convert_parser.add_argument("inputs", nargs="+", help="Markdown 文件或目录")
+    convert_parser.add_argument("-o", "--output", help="输出目录，默认与输入文件放在一起")
+    convert_parser.add_argument("-j", "--jobs", type=int, default=None, help="并行进程数，默认为 CPU 核数")
+    convert_parser.add_argument("-f", "--force", action="store_true", help="忽略缓存，重新转换所有文件")
+    convert_parser.add_argument("--no-cache", action="store_true", help="不读写转换缓存")
+    convert_parser.add_argument("-e", "--extensions", help="逗号分隔的 Markdown 扩展，默认 fenced_code,tables")
+    convert_parser.add_argument("-q", "--quiet", action="store_true", help="只输出统计信息")
+    convert_parser.set_defaults(func=run_convert)
+
+    export_parser = subparsers.add_parser("export", help="导出完整的 HTML 文件（默认内嵌样式和图片）")
+    export_parser.add_argument("inputs", nargs="+", help="Markdown 文件或目录")
+    export_parser.add_argument("-o", "--output", help="输出目录；只有一个输入文件时也可以是 .html 文件")
+    export_parser.add_argument("--no-embed", action="store_true", help="不内嵌图片，改写为相对于输出文件的路径")
+    export_parser.add_argument("--css", help="使用指定的样式表代替默认样式")
+    export_parser.add_argument("-j", "--jobs", type=int, default=None, help="并行编码图片的线程数")
+    export_parser.add_argument("-e", "--extensions", help="逗号分隔的 Markdown 扩展，默认 fenced_code,tables")
+    export_parser.add_argument("-q", "--quiet", action="store_true", help="只输出统计信息")
+    export_parser.set_defaults(func=run_export)
+
+    pdf_parser = subparsers.add_parser("pdf", help="批量导出 PDF（不需要显示器）")
+    pdf_parser.add_argument("inputs", nargs="+", help="Markdown 文件或目录")
+    pdf_parser.add_argument("-o", "--output", help="输出目录；只有一个输入文件时也可以是 .pdf 文件")
+    pdf_parser.add_argument("--page-size", choices=PAGE_SIZES, default="A4", help="纸张大小，默认 A4")
+    pdf_parser.add_argument("--margin", type=float, default=20, help="页边距（毫米），默认 20")
+    pdf_parser.add_argument("-j", "--jobs", type=int, default=None, help="并行进程数，默认为 CPU 核数")
+    pdf_parser.add_argument("-e", "--extensions", help="逗号分隔的 Markdown 扩展，默认 fenced_code,tables")
+    pdf_parser.add_argument("-q", "--quiet", action="store_true", help="只输出统计信息")
+    pdf_parser.set_defaults(func=run_pdf)
+
+    return parser
+
+
+def main(argv=None):
+    """命令行主函数"""
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or (argv[0].startswith("-") and argv[0] not in ("-h", "--help")):
+        # 没有子命令时启动图形界面
+        from flowmark.main import main as gui_main
+        return gui_main()
+
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FlowMark 文本块跟踪基类
+"""
+
+from PyQt6.QtCore import QObject, pyqtSignal
+
+
+class BlockTracker(QObject):
+    """按文本块维护派生数据的基类
+
+    为 QTextDocument 的每个文本块保存一个由 compute_block 计算的值，
+    并根据 contentsChange(position, removed, added) 只重新计算被编辑的块。
+    未受影响的块直接复用，因此每次编辑的代价与编辑大小成正比。
+
+    块数据依赖前一个块时（例如是否处于围栏代码块中），子类把 stateful
+    设为 True，compute_block 会额外收到前一个块的数据；编辑后继续向后
+    重新计算，直到某个块的数据与原来相同为止。
+    """
+
+    # 块数据发生变化
+    changed = pyqtSignal()
+
+    # 块数据是否依赖前一个块
+    stateful = False
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._document = None
+        self._blocks = []
+
+    def document(self):
+        """获取当前跟踪的文档"""
+        return self._document
+
+    def set_document(self, document):
+        """设置要跟踪的文档"""
+        if self._document is not None:
+            self._document.contentsChange.disconnect(self._on_contents_change)
+        self._document = document
+        if document is not None:
+            document.contentsChange.connect(self._on_contents_change)
+        self.rebuild()
+
+    def rebuild(self):
+        """重新计算所有块"""
+        values = []
+        if self._document is not None:
+            previous = None
+            block = self._document.begin()
+            while block.isValid():
+                previous = self._compute(block, previous)
+                values.append(previous)
+                block = block.next()
+        self._replace(0, len(self._blocks), values)
+
+    def block_values(self):
+        """获取所有块的数据"""
+        return self._blocks
+
+    def compute_block(self, block, previous=None):
+        """计算单个块的数据，stateful 时 previous 为前一个块的数据
+
+        默认不保存任何数据：只关心哪些块被编辑的子类（通过 blocks_replaced）
+        不需要覆盖。
+        """
+        return None
+
+    def _compute(self, block, previous):
+        if self.stateful:
+            return self.compute_block(block, previous)
+        return self.compute_block(block)
+
+    def blocks_replaced(self, start, old_values, new_values):
+        """块数据被替换后的回调，子类可据此增量维护汇总数据"""
+
+    def _on_contents_change(self, position, removed, added):
+        document = self._document
+        delta = document.blockCount() - len(self._blocks)
+        first = document.findBlock(position).blockNumber()
+        end_position = min(position + added, document.characterCount() - 1)
+        last = document.findBlock(end_position).blockNumber()
+        old_last = last - delta
+        if first < 0 or last < first or old_last < first or old_last >= len(self._blocks):
+            self.rebuild()
+            return
+
+        values = []
+        previous = self._blocks[first - 1] if first > 0 else None
+        block = document.findBlockByNumber(first)
+        for _ in range(last - first + 1):
+            previous = self._compute(block, previous)
+            values.append(previous)
+            block = block.next()
+        end = old_last + 1
+        if self.stateful:
+            # 后续块的数据随前一个块变化时继续重新计算
+            while block.isValid() and end < len(self._blocks):
+                value = self.compute_block(block, previous)
+                if value == self._blocks[end]:
+                    break
+                values.append(value)
+                previous = value
+                end += 1
+                block = block.next()
+        self._replace(first, end, values)
+
+    def _replace(self, start, end, values):
+        old_values = self._blocks[start:end]
+        self._blocks[start:end] = values
+        self.blocks_replaced(start, old_values, values)
+        self.changed.emit()
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FlowMark 按块差异更新文档
+"""
+
+import difflib
+
+from PyQt6.QtGui import QTextCursor
+
+# 去掉公共前后缀后两边的行数都超过该值时不再逐行比较，整段替换
+# （SequenceMatcher 最坏情况下是平方复杂度）
+DIFF_LINE_LIMIT = 20000
+
+
+def block_opcodes(old_lines, new_lines):
+    """计算把 old_lines 变为 new_lines 的行级操作
+
+    返回覆盖全部行的 (操作, i1, i2, j1, j2) 列表，操作与
+    difflib.SequenceMatcher.get_opcodes 相同。先去掉公共的前缀和后缀，
+    只比较中间变化的部分。
+    """
+    limit = min(len(old_lines), len(new_lines))
+    prefix = 0
+    while prefix < limit and old_lines[prefix] == new_lines[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < limit - prefix and old_lines[-1 - suffix] == new_lines[-1 - suffix]:
+        suffix += 1
+    old_end = len(old_lines) - suffix
+    new_end = len(new_lines) - suffix
+
+    opcodes = []
+    if prefix:
+        opcodes.append(("equal", 0, prefix, 0, prefix))
+    old_middle = old_lines[prefix:old_end]
+    new_middle = new_lines[prefix:new_end]
+    if min(len(old_middle), len(new_middle)) > DIFF_LINE_LIMIT:
+        opcodes.append(("replace", prefix, old_end, prefix, new_end))
+    elif old_middle or new_middle:
+        matcher = difflib.SequenceMatcher(None, old_middle, new_middle, autojunk=False)
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            opcodes.append((tag, i1 + prefix, i2 + prefix, j1 + prefix, j2 + prefix))
+    if suffix:
+        opcodes.append(("equal", old_end, len(old_lines), new_end, len(new_lines)))
+    return opcodes
+
+
+def map_block(opcodes, number):
+    """把修改前的块号映射为修改后的块号
+
+    未变化的块映射到对应的新块，被替换或删除的块映射到变化部分的开头。
+    """
+    if not opcodes:
+        return number
+    last = max(opcodes[-1][4] - 1, 0)
+    for tag, i1, i2, j1, j2 in opcodes:
+        if i1 <= number < i2:
+            return min(j1 + number - i1 if tag == "equal" else j1, last)
+    return last
+
+
+def patch_document(document, text):
+    """把文档内容改为 text，只替换变化的块
+
+    所有修改在一个编辑块中完成，撤销一次即可恢复；未变化的块保留其
+    字符格式、语法高亮和排版。返回行级操作列表，可用 map_block 映射
+    块号（例如恢复滚动位置）。
+    """
+    old_lines = document.toPlainText().split("\n")
+    new_lines = text.split("\n")
+    opcodes = block_opcodes(old_lines, new_lines)
+    changes = [opcode for opcode in opcodes if opcode[0] != "equal"]
+    if not changes:
+        return opcodes
+
+    cursor = QTextCursor(document)
+    cursor.beginEditBlock()
+    # 从后往前修改，前面的块号保持有效
+    for tag, i1, i2, j1, j2 in reversed(changes):
+        inserted = "\n".join(new_lines[j1:j2])
+        if tag == "insert":
+            if i1 < document.blockCount():
+                cursor.setPosition(document.findBlockByNumber(i1).position())
+                cursor.insertText(inserted + "\n")
+            else:
+                cursor.movePosition(QTextCursor.MoveOperation.End)
+                cursor.insertText("\n" + inserted)
+            continue
+        first = document.findBlockByNumber(i1)
+        last = document.findBlockByNumber(i2 - 1)
+        if tag == "replace":
+            cursor.setPosition(first.position())
+            cursor.setPosition(last.position() + last.length() - 1, QTextCursor.MoveMode.KeepAnchor)
+        elif last.next().isValid():
+            # 删除这些块及其后的段落分隔符
+            cursor.setPosition(first.position())
+            cursor.setPosition(last.next().position(), QTextCursor.MoveMode.KeepAnchor)
+        else:
+            # 删除到文档末尾时连同前面的段落分隔符一起删除
+            cursor.setPosition(max(first.position() - 1, 0))
+            cursor.setPosition(last.position() + last.length() - 1, QTextCursor.MoveMode.KeepAnchor)
+        cursor.insertText(inserted)
+    if document.toPlainText() != text:
+        # 文本中含有 QTextDocument 会转换的字符（例如 U+2029）时逐块比较不准确，
+        # 在同一个编辑块中整体替换
+        cursor.select(QTextCursor.SelectionType.Document)
+        cursor.insertText(text)
+        opcodes = [("replace", 0, len(old_lines), 0, len(new_lines))]
+    cursor.endEditBlock()
+    return opcodes
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FlowMark 文档大纲（标题索引）
+"""
+
+import bisect
+import re
+from collections import namedtuple
+
+from PyQt6.QtCore import pyqtSignal
+
+from flowmark.editor.block_tracker import BlockTracker
+
+# 一个标题：行号（块号）、级别、标题文字
+Heading = namedtuple("Heading", ["line", "level", "title"])
+
+# 每个块的数据：标题级别和文字（不是标题时为 0 和 None），以及该块之后仍未关闭的围栏标记
+_BlockInfo = namedtuple("_BlockInfo", ["level", "title", "fence"])
+
+_HEADING_RE = re.compile(r"^ {0,3}(#{1,6})(?:[ \t]+(.*?))?(?:[ \t]+#+)?[ \t]*$")
+_FENCE_RE = re.compile(r"^ {0,3}(`{3,}|~{3,})")
+
+_EMPTY = _BlockInfo(0, None, None)
+
+
+class HeadingIndex(BlockTracker):
+    """增量维护的 ATX（# 开头）标题索引
+
+    按块记录标题和围栏代码块状态，编辑时只重新计算被修改的块；开启或
+    关闭围栏时继续向后重新计算，直到状态不再变化，因此代码块中的 #
+    不会被当作标题。标题所在的行号保存在有序列表中，按序号跳转到标题、
+    由行号查找所在章节都是 O(log n)。
+    """
+
+    stateful = True
+
+    # 标题列表（级别或文字）发生变化，仅行号移动时不发出
+    headings_changed = pyqtSignal()
+
+    def __init__(self, parent=None):
+        # 标题所在的行号（有序）及对应的 (级别, 文字)
+        self._lines = []
+        self._titles = []
+        super().__init__(parent)
+
+    def compute_block(self, block, previous=None):
+        fence = previous.fence if previous is not None else None
+        text = block.text()
+        if fence is not None:
+            stripped = text.strip()
+            if stripped.startswith(fence) and stripped.strip(fence[0]) == "":
+                return _EMPTY
+            return _BlockInfo(0, None, fence)
+        match = _FENCE_RE.match(text)
+        if match:
+            return _BlockInfo(0, None, match.group(1))
+        match = _HEADING_RE.match(text)
+        if match:
+            return _BlockInfo(len(match.group(1)), (match.group(2) or "").strip(), None)
+        return _EMPTY
+
+    def blocks_replaced(self, start, old_values, new_values):
+        end = start + len(old_values)
+        delta = len(new_values) - len(old_values)
+        low = bisect.bisect_left(self._lines, start)
+        high = bisect.bisect_left(self._lines, end)
+        old_titles = self._titles[low:high]
+
+        lines = []
+        titles = []
+        for offset, value in enumerate(new_values):
+            if value.level:
+                lines.append(start + offset)
+                titles.append((value.level, value.title))
+
+        if delta:
+            # 编辑位置之后的标题整体移动
+            self._lines[high:] = [line + delta for line in self._lines[high:]]
+        self._lines[low:high] = lines
+        self._titles[low:high] = titles
+        if titles != old_titles:
+            self.headings_changed.emit()
+
+    def __len__(self):
+        return len(self._lines)
+
+    def headings(self):
+        """所有标题"""
+        return [Heading(line, level, title) for line, (level, title) in zip(self._lines, self._titles)]
+
+    def heading(self, index):
+        """第 index 个标题"""
+        level, title = self._titles[index]
+        return Heading(self._lines[index], level, title)
+
+    def line_of(self, index):
+        """第 index 个标题所在的行号"""
+        return self._lines[index]
+
+    def section_at(self, line):
+        """行号所在章节的标题序号，位于第一个标题之前时返回 -1"""
+        return bisect.bisect_right(self._lines, line) - 1
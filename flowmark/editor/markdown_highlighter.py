@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FlowMark Markdown 语法高亮
+"""
+
+import re
+
+from PyQt6.QtGui import QColor, QFont, QSyntaxHighlighter, QTextCharFormat
+
+# 块状态：普通文本 / 表格行；围栏代码块的状态另外编码围栏字符和长度
+STATE_NORMAL = 0
+STATE_TABLE = 1
+STATE_FENCE_BASE = 16
+
+_FENCE_RE = re.compile(r"^ {0,3}(`{3,}|~{3,})")
+_HEADING_RE = re.compile(r"^ {0,3}(#{1,6})(\s|$)")
+_QUOTE_RE = re.compile(r"^ {0,3}>")
+_LIST_RE = re.compile(r"^\s*(?:[*+-]|\d+[.)])\s")
+_HR_RE = re.compile(r"^ {0,3}([-*_])(?:\s*\1){2,}\s*$")
+_TABLE_DELIMITER_RE = re.compile(r"^\s*\|?\s*:?-+:?\s*(\|\s*:?-+:?\s*)+\|?\s*$")
+_INLINE_CODE_RE = re.compile(r"(`+)(?!`).+?(?<!`)\1(?!`)")
+_BOLD_RE = re.compile(r"(\*\*|__)(?=\S)(.+?)(?<=\S)\1")
+_ITALIC_RE = re.compile(r"(?<![*_\w])([*_])(?=\S)(.+?)(?<=\S)\1(?![*_\w])")
+_ASTRAL_RE = re.compile("[\U00010000-\U0010ffff]")
+_LINK_RE = re.compile(r"!?\[[^\]\n]*\]\([^)\n]*\)|!?\[[^\]\n]*\]\[[^\]\n]*\]|<https?://[^>\s]+>")
+
+
+def _format(color=None, bold=False, italic=False, underline=False, monospace=False, background=None):
+    char_format = QTextCharFormat()
+    if color:
+        char_format.setForeground(QColor(color))
+    if background:
+        char_format.setBackground(QColor(background))
+    if bold:
+        char_format.setFontWeight(QFont.Weight.Bold)
+    if italic:
+        char_format.setFontItalic(True)
+    if underline:
+        char_format.setFontUnderline(True)
+    if monospace:
+        char_format.setFontFamilies(["monospace"])
+        char_format.setFontFixedPitch(True)
+    return char_format
+
+
+def fence_state(marker):
+    """把围栏标记（字符和长度）编码为块状态"""
+    return STATE_FENCE_BASE + len(marker) * 2 + (marker[0] == "~")
+
+
+def fence_marker(state):
+    """从块状态中取出围栏标记，不在围栏代码块中时返回 None"""
+    if state < STATE_FENCE_BASE:
+        return None
+    value = state - STATE_FENCE_BASE
+    return ("~" if value % 2 else "`") * (value // 2)
+
+
+class MarkdownHighlighter(QSyntaxHighlighter):
+    """Markdown 语法高亮
+
+    每个文本块保存词法状态（是否处于围栏代码块中、是否处于表格中）。
+    QSyntaxHighlighter 只重新高亮被编辑的块，并且仅当块的结束状态变化时
+    才继续处理后面的块，因此普通按键只需处理一个块；只有开启或关闭
+    代码围栏时才会影响后续内容。
+    """
+
+    # 超过该块数时不再高亮，避免打开超大文件时的开销
+    MAX_BLOCKS = 100000
+
+    def __init__(self, document=None):
+        super().__init__(document)
+        self.formats = {
+            "heading": _format("#1f5fa8", bold=True),
+            "marker": _format("#8a8a8a"),
+            "bold": _format(bold=True),
+            "italic": _format(italic=True),
+            "code": _format("#b5403a", monospace=True),
+            "fence": _format("#6a737d", monospace=True),
+            "link": _format("#0969da", underline=True),
+            "quote": _format("#6a737d", italic=True),
+            "table": _format("#8250df"),
+        }
+        self._offsets = None
+
+    def setFormat(self, start, count, char_format):
+        # Qt 的位置以 UTF-16 代码单元计，文本中有 BMP 以外的字符（如 emoji）时需要换算
+        if self._offsets is not None:
+            end = self._offsets[start + count]
+            start = self._offsets[start]
+            count = end - start
+        super().setFormat(start, count, char_format)
+
+    def highlightBlock(self, text):
+        previous = self.previousBlockState()
+        document = self.document()
+        if document is not None and document.blockCount() > self.MAX_BLOCKS:
+            self.setCurrentBlockState(previous)
+            return
+
+        self._offsets = None
+        if _ASTRAL_RE.search(text):
+            offsets = [0]
+            for char in text:
+                offsets.append(offsets[-1] + (2 if ord(char) > 0xFFFF else 1))
+            self._offsets = offsets
+
+        marker = fence_marker(previous)
+        if marker is not None:
+            # 围栏代码块内部
+            self.setFormat(0, len(text), self.formats["fence"])
+            stripped = text.strip()
+            closed = stripped.startswith(marker) and stripped.strip(marker[0]) == ""
+            self.setCurrentBlockState(STATE_NORMAL if closed else previous)
+            return
+
+        match = _FENCE_RE.match(text)
+        if match:
+            self.setFormat(0, len(text), self.formats["fence"])
+            self.setCurrentBlockState(fence_state(match.group(1)))
+            return
+
+        state = STATE_NORMAL
+        match = _HEADING_RE.match(text)
+        if match:
+            self.setFormat(0, len(text), self.formats["heading"])
+        elif _HR_RE.match(text):
+            self.setFormat(0, len(text), self.formats["marker"])
+        else:
+            if _QUOTE_RE.match(text):
+                self.setFormat(0, len(text), self.formats["quote"])
+            match = _LIST_RE.match(text)
+            if match:
+                self.setFormat(0, match.end(), self.formats["marker"])
+            if "|" in text and (
+                previous == STATE_TABLE or text.lstrip().startswith("|")
+                or _TABLE_DELIMITER_RE.match(text)
+            ):
+                state = STATE_TABLE
+                self.highlight_table(text)
+            self.highlight_inline(text)
+
+        self.setCurrentBlockState(state)
+
+    def highlight_table(self, text):
+        """高亮表格的分隔符"""
+        if _TABLE_DELIMITER_RE.match(text):
+            self.setFormat(0, len(text), self.formats["table"])
+            return
+        for index, char in enumerate(text):
+            if char == "|":
+                self.setFormat(index, 1, self.formats["table"])
+
+    def highlight_inline(self, text):
+        """高亮行内元素：强调、链接和行内代码"""
+        for match in _BOLD_RE.finditer(text):
+            self.setFormat(match.start(), match.end() - match.start(), self.formats["bold"])
+        for match in _ITALIC_RE.finditer(text):
+            self.setFormat(match.start(), match.end() - match.start(), self.formats["italic"])
+        for match in _LINK_RE.finditer(text):
+            self.setFormat(match.start(), match.end() - match.start(), self.formats["link"])
+        # 行内代码中的内容不再作为其他语法，最后设置以覆盖前面的格式
+        for match in _INLINE_CODE_RE.finditer(text):
+            self.setFormat(match.start(), match.end() - match.start(), self.formats["code"])
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FlowMark 富文本到 Markdown 的序列化
+"""
+
+from PyQt6.QtCore import QObject
+from PyQt6.QtGui import QFont, QTextCursor
+
+# QTextDocument 文本中的段落分隔符、换行符和不间断空格（与 toPlainText 的转换一致）
+PLAIN_TEXT_TABLE = {0x2029: "\n", 0x2028: "\n", 0x00A0: " "}
+
+# 字符格式对应的 Markdown 标记，按嵌套顺序（外层在前）
+_UNDERLINE = 0
+_BOLD = 1
+_ITALIC = 2
+_OPEN_MARKERS = {_UNDERLINE: "<u>", _BOLD: "**", _ITALIC: "*"}
+_CLOSE_MARKERS = {_UNDERLINE: "</u>", _BOLD: "**", _ITALIC: "*"}
+
+
+def format_styles(char_format):
+    """字符格式中需要序列化的样式（下划线、粗体、斜体）"""
+    styles = []
+    if char_format.fontUnderline():
+        styles.append(_UNDERLINE)
+    if char_format.fontWeight() >= QFont.Weight.DemiBold.value:
+        styles.append(_BOLD)
+    if char_format.fontItalic():
+        styles.append(_ITALIC)
+    return tuple(styles)
+
+
+def serialize_runs(runs):
+    """把 (样式, 文本) 片段序列化为 Markdown
+
+    相邻片段共同的样式只打开一次；某个样式结束时先关闭在其之后打开的
+    样式再重新打开，保证标记正确嵌套。标记不会紧贴空白（否则 Markdown
+    不认为是强调），首尾空白移到标记之外。
+    """
+    parts = []
+    stack = []
+    # 尚未输出的尾部空白，等关闭标记输出后再输出
+    pending = ""
+    for styles, text in runs:
+        core = text.strip()
+        if not core:
+            # 只有空白的片段不改变样式
+            pending += text
+            continue
+        leading = text[:len(text) - len(text.lstrip())]
+        trailing = text[len(text.rstrip()):]
+        keep = 0
+        while keep < len(stack) and stack[keep] in styles:
+            keep += 1
+        for style in reversed(stack[keep:]):
+            parts.append(_CLOSE_MARKERS[style])
+        del stack[keep:]
+        parts.append(pending + leading)
+        for style in styles:
+            if style not in stack:
+                parts.append(_OPEN_MARKERS[style])
+                stack.append(style)
+        parts.append(core)
+        pending = trailing
+    for style in reversed(stack):
+        parts.append(_CLOSE_MARKERS[style])
+    parts.append(pending)
+    return "".join(parts)
+
+
+class MarkdownSerializer(QObject):
+    """把 QTextDocument 的块和片段序列化为 Markdown
+
+    编辑器中的文本本身就是 Markdown 源码，RichEditor.format_text 等设置的
+    字符格式（粗体、斜体、下划线）序列化为对应的标记，其余文本原样保留。
+    文档中没有这些格式时直接返回纯文本；否则逐块序列化并按块号缓存
+    结果。块的修订号在只改变格式时不会变化，撤销后还会回到旧值，因此
+    缓存由 contentsChange（内容和格式变化都会发出）使变化的块失效，
+    编辑后只重新序列化这些块，其余块直接拼接。
+
+    每个文档一个实例（作为文档的子对象），通过 for_document 获取。
+    """
+
+    def __init__(self, document):
+        super().__init__(document)
+        self._document = document
+        self._rich_revision = -1
+        self._rich = False
+        # 每块的序列化结果，None 表示需要重新序列化；尚未序列化过时整个列表为 None
+        self._parts = None
+        self._block_count = 0
+        # 没有块失效时直接返回上一次拼接的结果
+        self._joined = None
+        # 文档没有排版时只改变格式不会发出 contentsChange
+        document.documentLayout()
+        document.contentsChange.connect(self._on_contents_change)
+
+    @staticmethod
+    def for_document(document):
+        """获取文档的序列化器，第一次使用时创建"""
+        serializer = document.findChild(MarkdownSerializer)
+        if serializer is None:
+            serializer = MarkdownSerializer(document)
+        return serializer
+
+    def has_rich_formats(self):
+        """文档中是否使用过需要序列化的字符格式"""
+        revision = self._document.revision()
+        if revision != self._rich_revision:
+            self._rich = any(
+                format_styles(text_format.toCharFormat())
+                for text_format in self._document.allFormats() if text_format.isCharFormat()
+            )
+            self._rich_revision = revision
+        return self._rich
+
+    def to_markdown(self, start=None, end=None):
+        """序列化整个文档，或 [start, end) 范围内的文本"""
+        document = self._document
+        if not self.has_rich_formats():
+            if start is None:
+                return document.toPlainText()
+            cursor = QTextCursor(document)
+            cursor.setPosition(start)
+            cursor.setPosition(end, QTextCursor.MoveMode.KeepAnchor)
+            return cursor.selectedText().translate(PLAIN_TEXT_TABLE)
+
+        parts = self._update_parts()
+        if start is None:
+            if self._joined is None:
+                self._joined = "\n".join(parts).translate(PLAIN_TEXT_TABLE)
+            return self._joined
+
+        selected = []
+        block = document.findBlock(start)
+        while block.isValid():
+            block_start = block.position()
+            block_end = block_start + block.length() - 1
+            if start <= block_start and block_end <= end:
+                selected.append(parts[block.blockNumber()])
+            else:
+                selected.append(self._serialize(block, max(start, block_start), min(end, block_end)))
+            if block_end >= end:
+                break
+            block = block.next()
+        return "\n".join(selected).translate(PLAIN_TEXT_TABLE)
+
+    def _update_parts(self):
+        """重新序列化失效的块，返回每块的结果"""
+        document = self._document
+        parts = self._parts
+        if parts is None or len(parts) != document.blockCount():
+            parts = self._parts = [None] * document.blockCount()
+            self._block_count = len(parts)
+        block = None
+        for number in [number for number, part in enumerate(parts) if part is None]:
+            # 连续失效的块顺序遍历，否则按块号查找
+            if block is not None and block.blockNumber() == number - 1:
+                block = block.next()
+            else:
+                block = document.findBlockByNumber(number)
+            parts[number] = self._serialize(block)
+        return parts
+
+    def _serialize(self, block, start=None, end=None):
+        """序列化块中 [start, end) 范围内的片段"""
+        runs = []
+        iterator = block.begin()
+        while not iterator.atEnd():
+            fragment = iterator.fragment()
+            iterator += 1
+            text = fragment.text()
+            position = fragment.position()
+            if start is not None:
+                # 位置以 UTF-16 代码单元计
+                data = text.encode("utf-16-le", "surrogatepass")
+                lower = max(start - position, 0)
+                upper = min(end - position, len(data) // 2)
+                if lower >= upper:
+                    continue
+                # 范围的边界可能落在代理对中间
+                text = data[lower * 2:upper * 2].decode("utf-16-le", "surrogatepass")
+            styles = format_styles(fragment.charFormat())
+            if runs and runs[-1][0] == styles:
+                runs[-1] = (styles, runs[-1][1] + text)
+            else:
+                runs.append((styles, text))
+        if not any(styles for styles, text in runs):
+            return "".join(text for styles, text in runs)
+        return serialize_runs(runs)
+
+    def _on_contents_change(self, position, removed, added):
+        parts = self._parts
+        if parts is None:
+            return
+        self._joined = None
+        document = self._document
+        count = document.blockCount()
+        first = document.findBlock(position).blockNumber()
+        last = document.findBlock(position + added).blockNumber()
+        if first < 0:
+            first = count - 1
+        if last < 0:
+            last = count - 1
+        # 变化前对应的块范围：块数的变化都发生在这个范围内
+        old_last = last - (count - self._block_count)
+        if old_last < first - 1 or old_last >= len(parts):
+            self._parts = None
+            return
+        parts[first:old_last + 1] = [None] * (last - first + 1)
+        self._block_count = count
@@ -7,14 +7,29 @@ FlowMark 富文本编辑器类
 
 from PyQt6.QtWidgets import QTextEdit, QFileDialog, QMessageBox
 from PyQt6.QtGui import QTextCursor, QTextCharFormat, QFont
-from PyQt6.QtCore import Qt
+from PyQt6.QtCore import Qt, QTimer, pyqtSignal
+
+from flowmark.editor.markdown_highlighter import MarkdownHighlighter
+from flowmark.utils.tracing import traced
 
 class RichEditor(QTextEdit):
     """富文本编辑器类"""
     
+    # 超过该字符数的粘贴分块插入
+    LARGE_PASTE_CHARS = 256 * 1024
+    
+    # 分块粘贴时每块的字符数
+    PASTE_CHUNK_CHARS = 64 * 1024
+    
+    # 大段文本开始和结束粘贴，期间可以暂停预览、统计等更新
+    paste_started = pyqtSignal()
+    paste_finished = pyqtSignal()
+    
     def __init__(self):
         super().__init__()
         self.setPlaceholderText("在此输入内容...")
+        self.highlighter = MarkdownHighlighter(self.document())
+        self._pasting = False
         
     def format_text(self, format_type):
         """格式化文本"""
@@ -100,6 +115,98 @@ class RichEditor(QTextEdit):
         cursor.insertText("\n---\n")
         self.setTextCursor(cursor)
         
+    def prepare_document(self, document):
+        """为新文档设置语法高亮器和字体
+
+        在填充内容之前调用，高亮在插入文本时一次完成；排版之后再逐块
+        高亮会导致逐块重新排版。
+        """
+        document.setDefaultFont(self.font())
+        return MarkdownHighlighter(document)
+        
+    def set_document(self, document):
+        """切换到另一个文档，每个文档有自己的语法高亮器"""
+        highlighter = document.findChild(MarkdownHighlighter)
+        if highlighter is None:
+            highlighter = self.prepare_document(document)
+        self.highlighter = highlighter
+        document.setDefaultFont(self.font())
+        self.setDocument(document)
+        
+    def insertFromMimeData(self, source):
+        """粘贴时只插入纯文本
+        
+        编辑器中的文本就是 Markdown 源码，不经过 QTextEdit 的 HTML 导入；
+        超过 LARGE_PASTE_CHARS 的文本交给 paste_text 分块插入。
+        """
+        if not source.hasText():
+            super().insertFromMimeData(source)
+            return
+        text = source.text()
+        if len(text) >= self.LARGE_PASTE_CHARS:
+            self.paste_text(text)
+            return
+        cursor = self.textCursor()
+        cursor.insertText(text)
+        self.setTextCursor(cursor)
+        self.ensureCursorVisible()
+        
+    def is_pasting(self):
+        """是否正在分块粘贴"""
+        return self._pasting
+        
+    def paste_text(self, text):
+        """分块插入大段文本
+        
+        每插入一块后回到事件循环，界面保持响应；所有块合并为一次可撤销的
+        编辑。粘贴期间编辑器只读（结束后恢复原来的只读状态），开始和结束时
+        分别发出 paste_started 和 paste_finished。
+        """
+        if self._pasting:
+            return
+        self._pasting = True
+        read_only = self.isReadOnly()
+        self.setReadOnly(True)
+        self.paste_started.emit()
+        cursor = self.textCursor()
+        chunks = self._paste_chunks(text)
+        
+        def insert_chunk(first=False):
+            chunk = next(chunks, None)
+            if chunk is not None:
+                if first:
+                    # 第一块连同被替换的选区一起作为一次编辑
+                    cursor.beginEditBlock()
+                else:
+                    cursor.joinPreviousEditBlock()
+                cursor.insertText(chunk)
+                cursor.endEditBlock()
+                QTimer.singleShot(0, insert_chunk)
+                return
+            self._pasting = False
+            self.setReadOnly(read_only)
+            # 粘贴期间可能切换了文档，光标仍在原来的文档中
+            if cursor.document() is self.document():
+                self.setTextCursor(cursor)
+                self.ensureCursorVisible()
+            self.paste_finished.emit()
+        
+        insert_chunk(True)
+        
+    def _paste_chunks(self, text):
+        """把文本切分为大约 PASTE_CHUNK_CHARS 的块，尽量在换行处切分"""
+        size = self.PASTE_CHUNK_CHARS
+        start = 0
+        while start < len(text):
+            end = start + size
+            if end < len(text):
+                newline = text.rfind("\n", start, end)
+                if newline >= 0:
+                    end = newline + 1
+            yield text[start:end]
+            start = end
+        
+    @traced("RichEditor.to_plain_text")
     def to_plain_text(self):
         """获取纯文本内容"""
         return self.toPlainText()
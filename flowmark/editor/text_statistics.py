@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FlowMark 增量文本统计
+"""
+
+import re
+
+from flowmark.editor.block_tracker import BlockTracker
+
+# 中日文字符（汉字、假名），每个字符按一个字计
+_CJK = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff"
+_CJK_RE = re.compile(f"[{_CJK}]")
+# 一个中日文字符，或一个由字母数字组成的单词
+_WORD_RE = re.compile(f"[{_CJK}]|(?:(?![{_CJK}])\\w)+(?:['’](?:(?![{_CJK}])\\w)+)*")
+
+
+def count_block(text):
+    """统计一段文本，返回 (字符数, 字数, 中日文字符数)"""
+    return len(text), len(_WORD_RE.findall(text)), len(_CJK_RE.findall(text))
+
+
+class TextStatistics(BlockTracker):
+    """增量文本统计
+
+    按块缓存字符数、字数和中日文字符数，编辑时只重新统计被修改的块，
+    并增量更新总数。中文、日文按字计数，西文按单词计数。
+    """
+
+    def __init__(self, parent=None):
+        self.chars = 0
+        self.words = 0
+        self.cjk_chars = 0
+        super().__init__(parent)
+
+    @property
+    def lines(self):
+        """行数"""
+        return max(1, len(self._blocks))
+
+    def compute_block(self, block):
+        return count_block(block.text())
+
+    def blocks_replaced(self, start, old_values, new_values):
+        for chars, words, cjk_chars in old_values:
+            self.chars -= chars
+            self.words -= words
+            self.cjk_chars -= cjk_chars
+        for chars, words, cjk_chars in new_values:
+            self.chars += chars
+            self.words += words
+            self.cjk_chars += cjk_chars
@@ -6,14 +6,34 @@ FlowMark 主入口文件
 """
 
 import sys
+from flowmark.utils.startup import profiler
+
+from PyQt6.QtCore import QTimer
 from PyQt6.QtWidgets import QApplication
+profiler.mark("导入 PyQt6")
+
 from flowmark.ui.main_window import MainWindow
+profiler.mark("导入主窗口")
 
 def main():
     """主函数"""
+    if "--startup-report" in sys.argv:
+        sys.argv.remove("--startup-report")
+        profiler.enabled = True
+    
     app = QApplication(sys.argv)
+    profiler.mark("创建 QApplication")
     window = MainWindow()
+    profiler.mark("创建主窗口")
     window.show()
+    
+    if profiler.enabled:
+        # 事件循环开始处理后窗口已经显示
+        def report():
+            profiler.mark("显示窗口")
+            print(profiler.report(), file=sys.stderr)
+        QTimer.singleShot(0, report)
+    
     sys.exit(app.exec())
 
 if __name__ == "__main__":
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FlowMark 预览图片缓存
+"""
+
+import hashlib
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from PyQt6.QtCore import QObject, QSize, Qt, QUrl, pyqtSignal
+from PyQt6.QtGui import QColor, QImage, QImageReader, QPainter, QTextDocument
+
+from flowmark.utils.tracing import traced
+
+# 磁盘缩略图缓存目录
+THUMBNAIL_DIR = os.path.join(os.path.expanduser("~"), ".flowmark", "thumbnails")
+
+
+def is_image_resource(resource_type):
+    """loadResource 的资源类型是否为图片（PyQt 传入的可能是整数）"""
+    return resource_type in (QTextDocument.ResourceType.ImageResource, QTextDocument.ResourceType.ImageResource.value)
+
+
+class ImageCache(QObject):
+    """预览图片的异步解码与缓存
+
+    图片在线程池中用 Pillow 解码并缩小到预览尺寸（JPEG 使用 draft 模式
+    直接按缩小后的尺寸解码），结果同时放入内存 LRU（按字节数限制）和
+    磁盘缩略图缓存。缓存键由绝对路径、修改时间和文件大小组成，图片
+    文件变化后自动失效。解码完成前预览显示占位图，完成后发出 image_ready。
+
+    预览每次重新渲染时 Qt 都会重新请求图片资源，命中内存缓存时直接返回；
+    超出内存上限被淘汰的图片从磁盘缩略图读回，都不会再次解码原图。
+    """
+
+    # 图片解码完成信号：绝对路径
+    image_ready = pyqtSignal(str)
+    # 内部信号：绝对路径, 缓存键, QImage（为 None 表示解码失败）
+    _decoded = pyqtSignal(str, object, object)
+
+    def __init__(self, max_size=QSize(800, 800), memory_bytes=256 * 1024 * 1024,
+                 disk_bytes=256 * 1024 * 1024, cache_dir=THUMBNAIL_DIR, workers=None, parent=None):
+        super().__init__(parent)
+        self._max_size = QSize(max_size)
+        self._memory_bytes = memory_bytes
+        self._disk_bytes = disk_bytes
+        self._cache_dir = cache_dir
+        self._images = OrderedDict()
+        self._image_bytes = 0
+        self._pending = {}
+        self._failed = set()
+        self._lock = threading.Lock()
+        # 线程池在第一次解码时才创建
+        self._workers = workers or min(4, os.cpu_count() or 1)
+        self._executor = None
+        self._placeholder = None
+        self.decoded = 0
+        self.disk_hits = 0
+        self._decoded.connect(self._on_decoded)
+
+    @staticmethod
+    def resolve(name, base_dir):
+        """把图片地址解析为本地绝对路径，非本地文件返回 None"""
+        url = QUrl(name)
+        if url.isLocalFile():
+            path = url.toLocalFile()
+        elif url.scheme():
+            return None
+        else:
+            path = url.path() or name
+        if not os.path.isabs(path):
+            path = os.path.join(base_dir or os.getcwd(), path)
+        return os.path.normpath(path)
+
+    def cache_key(self, path):
+        """内存与磁盘缓存的键，文件不存在时返回 None"""
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return (path, stat.st_mtime_ns, stat.st_size, self._max_size.width(), self._max_size.height())
+
+    def resource(self, name, base_dir):
+        """供预览的 loadResource 使用：返回 (绝对路径, 图片)
+
+        非本地图片或无法加载时图片为 None，由调用方走 Qt 默认的加载方式。
+        """
+        path = self.resolve(name, base_dir)
+        if path is None:
+            return None, None
+        return path, self.image(path)
+
+    def is_placeholder(self, image):
+        """是否为占位图"""
+        return image is self._placeholder
+
+    def placeholder(self):
+        """解码完成前显示的占位图"""
+        if self._placeholder is None:
+            image = QImage(160, 90, QImage.Format.Format_ARGB32_Premultiplied)
+            image.fill(QColor("#eeeeee"))
+            painter = QPainter(image)
+            painter.setPen(QColor("#999999"))
+            painter.drawRect(0, 0, image.width() - 1, image.height() - 1)
+            painter.drawText(image.rect(), Qt.AlignmentFlag.AlignCenter, "加载中...")
+            painter.end()
+            self._placeholder = image
+        return self._placeholder
+
+    @traced("ImageCache.image")
+    def image(self, path):
+        """获取缩小后的图片
+
+        已缓存时直接返回 QImage；否则提交后台解码并返回占位图。
+        文件不存在或无法解码时返回 None。
+        """
+        key = self.cache_key(path)
+        if key is None:
+            return None
+        with self._lock:
+            image = self._images.get(key)
+            if image is not None:
+                self._images.move_to_end(key)
+                return image
+            if key in self._failed:
+                return None
+            if key not in self._pending:
+                self._pending[key] = self._submit(self._load, path, key)
+        return self.placeholder()
+
+    def _submit(self, func, *args):
+        """提交后台任务，调用方持有 _lock
+
+        第一次提交时创建线程池，并在第一个解码任务之后清理过大的磁盘缓存，
+        没有显示过图片时不会创建线程，也不会扫描缩略图目录。
+        """
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix="flowmark-image")
+            future = self._executor.submit(func, *args)
+            self._executor.submit(self.prune_disk_cache)
+            return future
+        return self._executor.submit(func, *args)
+
+    def is_pending(self, path=None):
+        """是否有正在解码的图片"""
+        with self._lock:
+            if path is None:
+                return bool(self._pending)
+            return any(key[0] == path for key in self._pending)
+
+    def _load(self, path, key):
+        """在线程池中加载图片：先查磁盘缓存，未命中再解码并写入磁盘缓存"""
+        try:
+            cache_path = self._disk_path(key)
+            image = QImage(cache_path) if os.path.exists(cache_path) else QImage()
+            if not image.isNull():
+                with self._lock:
+                    self.disk_hits += 1
+            else:
+                image = self._decode(path)
+                if image is not None and not image.isNull():
+                    self._store(image, cache_path)
+                    with self._lock:
+                        self.decoded += 1
+        except Exception:
+            image = None
+        if image is not None and image.isNull():
+            image = None
+        self._decoded.emit(path, key, image)
+
+    def _decode(self, path):
+        """用 Pillow 解码并缩小图片，Pillow 不可用时使用 QImageReader"""
+        width, height = self._max_size.width(), self._max_size.height()
+        try:
+            from PIL import Image, ImageOps
+        except ImportError:
+            reader = QImageReader(path)
+            reader.setAutoTransform(True)
+            size = reader.size()
+            if size.isValid() and (size.width() > width or size.height() > height):
+                reader.setScaledSize(size.scaled(self._max_size, Qt.AspectRatioMode.KeepAspectRatio))
+            return reader.read()
+
+        with Image.open(path) as source:
+            # JPEG 直接以接近目标的尺寸解码，省去大部分解码开销
+            source.draft("RGB", (width, height))
+            image = ImageOps.exif_transpose(source)
+            image.thumbnail((width, height))
+            if "A" in image.getbands() or "transparency" in image.info:
+                mode, image_format = "RGBA", QImage.Format.Format_RGBA8888
+            else:
+                mode, image_format = "RGB", QImage.Format.Format_RGB888
+            if image.mode != mode:
+                image = image.convert(mode)
+            data = image.tobytes("raw", mode)
+            return QImage(data, image.width, image.height, image.width * len(mode), image_format).copy()
+
+    def _disk_path(self, key):
+        digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+        return os.path.join(self._cache_dir, digest[:2], digest + ".png")
+
+    def _store(self, image, cache_path):
+        """写入磁盘缓存（先写临时文件再替换）"""
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            temp_path = f"{cache_path}.{uuid.uuid4().hex[:8]}.tmp"
+            # 缩略图只是缓存，压缩级别偏低以减少写入耗时
+            if image.save(temp_path, "PNG", 80):
+                os.replace(temp_path, cache_path)
+            elif os.path.exists(temp_path):
+                os.remove(temp_path)
+        except OSError:
+            pass
+
+    def _on_decoded(self, path, key, image):
+        with self._lock:
+            self._pending.pop(key, None)
+            if image is None:
+                self._failed.add(key)
+            else:
+                self._images[key] = image
+                self._image_bytes += image.sizeInBytes()
+                while self._image_bytes > self._memory_bytes and len(self._images) > 1:
+                    _, evicted = self._images.popitem(last=False)
+                    self._image_bytes -= evicted.sizeInBytes()
+        self.image_ready.emit(path)
+
+    def prune_disk_cache(self):
+        """磁盘缓存超过上限时删除最久未使用的缩略图"""
+        entries = []
+        total = 0
+        for root, _, files in os.walk(self._cache_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_atime, stat.st_size, path))
+                total += stat.st_size
+        entries.sort()
+        for _, size, path in entries:
+            if total <= self._disk_bytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+    def clear(self):
+        """清空内存缓存"""
+        with self._lock:
+            self._images.clear()
+            self._image_bytes = 0
+            self._failed.clear()
+
+    def stats(self):
+        """获取缓存统计"""
+        with self._lock:
+            return {
+                "images": len(self._images),
+                "bytes": self._image_bytes,
+                "pending": len(self._pending),
+                "decoded": self.decoded,
+                "disk_hits": self.disk_hits,
+            }
+
+    def shutdown(self):
+        """停止线程池，不等待未完成的解码"""
+        with self._lock:
+            executor = self._executor
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
@@ -5,21 +5,89 @@
 FlowMark Markdown 预览类
 """
 
+import bisect
+
+from PyQt6.QtCore import QTimer, pyqtSignal
+from PyQt6.QtGui import QTextDocument
 from PyQt6.QtWidgets import QTextEdit
 
+from flowmark.preview.image_cache import is_image_resource
+from flowmark.preview.source_map import ANCHOR_PREFIX, anchored_html
+from flowmark.utils.tracing import traced
+
 class MarkdownPreview(QTextEdit):
     """Markdown 预览类"""
     
+    # 点击预览中的块：块序号, 块内的相对位置
+    block_clicked = pyqtSignal(int, float)
+        
     def __init__(self):
         super().__init__()
         self.setReadOnly(True)
         self.setPlaceholderText("预览区域...")
         self._render_mode = False
+        self._block_count = 0
+        self._block_tops = None
+        self.document().documentLayout().documentSizeChanged.connect(self._invalidate_blocks)
+        
+        # 图片由 ImageCache 在后台解码，解码完成后合并刷新排版；
+        # 图片缓存在第一次加载图片时才通过 _image_cache_factory 获取
+        self._image_cache = None
+        self._image_cache_factory = None
+        self._base_dir = None
+        self._waiting_images = {}
+        self._image_timer = QTimer(self)
+        self._image_timer.setSingleShot(True)
+        self._image_timer.setInterval(100)
+        self._image_timer.timeout.connect(self._refresh_images)
         
     def set_render_mode(self, render_mode):
         """设置渲染模式"""
         self._render_mode = render_mode
         
+    def set_image_cache(self, image_cache, base_dir):
+        """设置图片缓存
+
+        image_cache 为返回图片缓存的函数，第一次加载图片时才调用；
+        base_dir 为返回相对路径基准目录的函数。
+        """
+        self._image_cache_factory = image_cache
+        self._base_dir = base_dir
+        
+    def image_cache(self):
+        """图片缓存，第一次使用时获取；没有设置时返回 None"""
+        if self._image_cache is None and self._image_cache_factory is not None:
+            self._image_cache = self._image_cache_factory()
+            self._image_cache.image_ready.connect(self._on_image_ready)
+        return self._image_cache
+        
+    def loadResource(self, resource_type, name):
+        """从图片缓存加载图片，未解码完成时先显示占位图"""
+        cache = self.image_cache() if is_image_resource(resource_type) else None
+        if cache is not None:
+            path, image = cache.resource(name.toString(), self._base_dir())
+            if image is not None:
+                if cache.is_placeholder(image):
+                    self._waiting_images.setdefault(path, []).append(name)
+                return image
+        return super().loadResource(resource_type, name)
+        
+    def _on_image_ready(self, path):
+        names = self._waiting_images.pop(path, None)
+        if not names:
+            return
+        image = self._image_cache.image(path)
+        for name in names:
+            if image is not None:
+                self.document().addResource(QTextDocument.ResourceType.ImageResource.value, name, image)
+        self._image_timer.start()
+        
+    def _refresh_images(self):
+        """图片替换占位图后重新排版"""
+        document = self.document()
+        document.markContentsDirty(0, document.characterCount())
+        
+    @traced("MarkdownPreview.set_content")
     def set_content(self, content):
         """设置内容"""
         if self._render_mode:
@@ -29,6 +97,80 @@ class MarkdownPreview(QTextEdit):
             # 源码模式下使用纯文本显示
             self.setPlainText(content)
         
+    @traced("MarkdownPreview.set_html")
+    def set_html(self, html):
+        """设置已渲染的 HTML 内容"""
+        self._block_count = 0
+        self.setHtml(html)
+        
+    @traced("MarkdownPreview.set_blocks")
+    def set_blocks(self, blocks):
+        """设置逐块渲染的结果，并记录每个块在预览中的位置"""
+        html = anchored_html(blocks)
+        self._block_count = sum(1 for block in blocks if block.html)
+        self.setHtml(html)
+        self._invalidate_blocks()
+        
+    @property
+    def block_count(self):
+        """块数，内容不是逐块设置时为 0"""
+        return self._block_count
+        
+    def block_top(self, index):
+        """块顶部在文档中的纵坐标"""
+        return self._tops()[index]
+        
+    def block_height(self, index):
+        """块的高度"""
+        tops = self._tops()
+        if index + 1 < len(tops):
+            return tops[index + 1] - tops[index]
+        return self.document().size().height() - tops[index]
+        
+    def block_at(self, y):
+        """文档纵坐标 y 所在的块序号"""
+        if not self._block_count:
+            return -1
+        return max(0, bisect.bisect_right(self._tops(), y) - 1)
+        
+    def _invalidate_blocks(self, *args):
+        self._block_tops = None
+        
+    def _tops(self):
+        """按锚点查找各块顶部的位置，排版变化后重新计算"""
+        if self._block_tops is None:
+            tops = [None] * self._block_count
+            layout = self.document().documentLayout()
+            block = self.document().begin()
+            while block.isValid():
+                # 锚点插在块的第一个文本容器开头，只需检查第一个片段
+                iterator = block.begin()
+                if not iterator.atEnd():
+                    for name in iterator.fragment().charFormat().anchorNames():
+                        if name.startswith(ANCHOR_PREFIX):
+                            index = int(name[len(ANCHOR_PREFIX):])
+                            if index < len(tops):
+                                tops[index] = layout.blockBoundingRect(block).top()
+                block = block.next()
+            previous = 0.0
+            for index, top in enumerate(tops):
+                # 没有锚点的块取前一个块的位置，并保证位置单调递增
+                if top is None or top < previous:
+                    tops[index] = previous
+                else:
+                    previous = top
+            self._block_tops = tops
+        return self._block_tops
+        
+    def mouseReleaseEvent(self, event):
+        super().mouseReleaseEvent(event)
+        if self._block_count and not self.textCursor().hasSelection():
+            y = event.position().y() + self.verticalScrollBar().value()
+            index = self.block_at(y)
+            height = self.block_height(index)
+            fraction = (y - self.block_top(index)) / height if height > 0 else 0.0
+            self.block_clicked.emit(index, min(1.0, max(0.0, fraction)))
+        
     def setStyleSheet(self, style_sheet):
         """设置样式表"""
         super().setStyleSheet(style_sheet)
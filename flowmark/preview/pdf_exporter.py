@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FlowMark PDF 导出
+"""
+
+import hashlib
+import os
+import time
+
+from PyQt6.QtCore import QMarginsF, QRectF, QSizeF, Qt
+from PyQt6.QtGui import (
+    QFont, QImage, QPageLayout, QPageSize, QPainter, QPdfWriter, QTextDocument,
+)
+
+from flowmark.utils.html_exporter import document_title, resolve_image
+
+# QTextDocument 支持的 CSS 子集
+PDF_CSS = """\
+h1, h2, h3, h4, h5, h6 { margin-top: 14px; margin-bottom: 6px; font-weight: 600; }
+p, ul, ol, blockquote, pre, table { margin-top: 0; margin-bottom: 10px; }
+a { color: #0969da; text-decoration: none; }
+blockquote { margin-left: 0; padding-left: 12px; color: #57606a; border-left: 4px solid #d0d7de; }
+code { font-family: monospace; background-color: #f0f2f4; }
+pre { font-family: monospace; background-color: #f6f8fa; padding: 8px; }
+table { border-collapse: collapse; }
+th, td { padding: 4px 8px; border: 1px solid #d0d7de; }
+"""
+
+# 页脚（页码）高度，单位为 pt
+FOOTER_POINTS = 18
+# 屏幕默认分辨率，HTML 中的像素尺寸按此换算为物理尺寸
+SCREEN_DPI = 96
+# 图片超过页面宽度时按该倍数的清晰度缩小
+IMAGE_SCALE = 2
+
+
+class _PdfDocument(QTextDocument):
+    """相对路径的图片按文档所在目录解析，过宽的图片缩小到页面宽度"""
+
+    def __init__(self, base_dir, max_image_width):
+        super().__init__()
+        self.base_dir = base_dir
+        self.max_image_width = max_image_width
+        # 无法加载的图片地址（绘制时会再次请求，不能简单计数）
+        self.missing = set()
+
+    def loadResource(self, resource_type, url):
+        if resource_type != QTextDocument.ResourceType.ImageResource.value:
+            return super().loadResource(resource_type, url)
+        path = resolve_image(url.toString(), self.base_dir)
+        # 后台线程中只能使用 QImage
+        image = QImage(path) if path else QImage()
+        if image.isNull():
+            self.missing.add(url.toString())
+            return image
+        if image.width() > self.max_image_width:
+            image = image.scaledToWidth(
+                self.max_image_width * IMAGE_SCALE, Qt.TransformationMode.SmoothTransformation
+            )
+            image.setDevicePixelRatio(IMAGE_SCALE)
+        return image
+
+
+class PdfExporter:
+    """用 QTextDocument 排版、QPdfWriter 逐页输出 PDF
+
+    只使用可在后台线程中使用的 QtGui 类（图片以 QImage 加载），可以在
+    导出线程或没有显示器的命令行（offscreen 平台）中运行。排版好的文档
+    按（HTML 哈希、图片目录、页面设置）缓存一份，内容没有变化时再次导出
+    直接复用排版，只重新输出页面。缓存的文档属于第一次导出时所在的线程，
+    之后须在同一个线程中导出。
+    """
+
+    def __init__(self, converter, page_size=QPageSize.PageSizeId.A4, margin_mm=20,
+                 resolution=300, font_size=10.5):
+        self.converter = converter
+        self.page_size = page_size
+        self.margin_mm = margin_mm
+        self.resolution = resolution
+        self.font_size = font_size
+        self._document = None
+        self._key = None
+
+    def clear_cache(self):
+        """丢弃缓存的排版"""
+        self._document = None
+        self._key = None
+
+    def export(self, text, target, base_dir=None, title=None, progress=None, cancelled=None):
+        """导出到 target，返回统计信息
+
+        base_dir 为解析相对图片路径的目录；progress(已完成页数, 总页数) 报告
+        进度，排版期间总页数为 0；cancelled() 返回 True 时停止导出，目标文件
+        保持不变。
+        """
+        started = time.perf_counter()
+        stats = {"pages": 0, "missing": 0, "bytes": 0, "reused": False, "cancelled": False}
+        target = os.path.abspath(target)
+        target_dir = os.path.dirname(target)
+        if not os.path.exists(target_dir):
+            os.makedirs(target_dir)
+        if title is None:
+            title = document_title(text, os.path.splitext(os.path.basename(target))[0])
+
+        temp_path = target + ".tmp"
+        writer = QPdfWriter(temp_path)
+        writer.setResolution(self.resolution)
+        writer.setPageSize(QPageSize(self.page_size))
+        writer.setPageMargins(
+            QMarginsF(self.margin_mm, self.margin_mm, self.margin_mm, self.margin_mm),
+            QPageLayout.Unit.Millimeter,
+        )
+        writer.setTitle(title)
+        writer.setCreator("FlowMark")
+        page_rect = writer.pageLayout().paintRectPixels(self.resolution)
+        footer = round(FOOTER_POINTS * self.resolution / 72)
+        page_height = page_rect.height() - footer
+
+        painter = None
+        try:
+            if progress is not None:
+                progress(0, 0)
+            html = self.converter.to_html(text)
+            key = (
+                hashlib.sha1(html.encode("utf-8")).digest(), base_dir,
+                self.page_size, self.margin_mm, self.resolution, self.font_size,
+            )
+            document = self._document if key == self._key else None
+            if document is None:
+                self.clear_cache()
+                document = _PdfDocument(base_dir, page_rect.width() * SCREEN_DPI // self.resolution)
+                # 按 PDF 的分辨率排版，字号和图片尺寸换算为物理尺寸
+                document.documentLayout().setPaintDevice(writer)
+                font = QFont()
+                font.setPointSizeF(self.font_size)
+                document.setDefaultFont(font)
+                document.setDocumentMargin(0)
+                document.setDefaultStyleSheet(PDF_CSS)
+                document.setPageSize(QSizeF(page_rect.width(), page_height))
+                document.setHtml(html)
+            else:
+                # 分辨率相同，已有的排版仍然有效
+                document.documentLayout().setPaintDevice(writer)
+                stats["reused"] = True
+            page_count = document.pageCount()
+            stats["missing"] = len(document.missing)
+            if cancelled is not None and cancelled():
+                stats["cancelled"] = True
+            else:
+                self._document, self._key = document, key
+
+            if not stats["cancelled"]:
+                painter = QPainter(writer)
+                number_font = QFont()
+                number_font.setPointSizeF(self.font_size * 0.8)
+                for page in range(page_count):
+                    if cancelled is not None and cancelled():
+                        stats["cancelled"] = True
+                        break
+                    if page:
+                        writer.newPage()
+                    painter.save()
+                    painter.translate(0, -page * page_height)
+                    document.drawContents(painter, QRectF(0, page * page_height, page_rect.width(), page_height))
+                    painter.restore()
+                    painter.setFont(number_font)
+                    painter.setPen(Qt.GlobalColor.gray)
+                    painter.drawText(
+                        QRectF(0, page_height, page_rect.width(), footer),
+                        Qt.AlignmentFlag.AlignHCenter | Qt.AlignmentFlag.AlignBottom,
+                        f"{page + 1} / {page_count}",
+                    )
+                    stats["pages"] = page + 1
+                    if progress is not None:
+                        progress(page + 1, page_count)
+                painter.end()
+                painter = None
+        except BaseException:
+            if painter is not None:
+                painter.end()
+            self.clear_cache()
+            del writer
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        finally:
+            if self._document is not None:
+                # 不再引用即将释放的 QPdfWriter
+                self._document.documentLayout().setPaintDevice(None)
+
+        # 释放 QPdfWriter 以关闭文件
+        del writer
+        if stats["cancelled"]:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        else:
+            os.replace(temp_path, target)
+            stats["bytes"] = os.path.getsize(target)
+        stats["seconds"] = time.perf_counter() - started
+        return stats
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FlowMark 预览调度器
+"""
+
+import time
+
+from PyQt6.QtCore import QObject, QTimer
+
+
+class PreviewScheduler(QObject):
+    """预览调度器
+
+    合并连续的编辑请求：在去抖窗口内的多次修改只触发一次渲染，
+    同时保证内容最多滞后 max_delay_ms。只渲染当前可见的预览页，
+    隐藏的预览页被标记为脏，切换到该页时再渲染。
+    """
+
+    def __init__(self, render_func, debounce_ms=150, max_delay_ms=1000, parent=None):
+        super().__init__(parent)
+        self._render_func = render_func
+        self._debounce_ms = debounce_ms
+        self._max_delay_ms = max_delay_ms
+        self._targets = []
+        self._dirty = set()
+        self._visible = None
+        self._first_pending = None
+        self._suspended = 0
+
+        self._requested = 0
+        self._performed = 0
+        self._skipped = 0
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self.flush)
+
+    def set_intervals(self, debounce_ms, max_delay_ms):
+        """设置去抖窗口和最大滞后时间（毫秒）"""
+        self._debounce_ms = max(0, int(debounce_ms))
+        self._max_delay_ms = max(self._debounce_ms, int(max_delay_ms))
+
+    def register(self, target):
+        """注册一个预览目标（初始内容视为空文档，不需要渲染）"""
+        if target not in self._targets:
+            self._targets.append(target)
+
+    def set_visible(self, target):
+        """设置当前可见的预览目标，若其内容已过期则立即渲染"""
+        self._visible = target
+        if target in self._dirty and not self._suspended:
+            self._render(target)
+
+    def schedule(self):
+        """请求一次预览更新"""
+        self._requested += 1
+        for target in self._targets:
+            if target in self._dirty:
+                # 该目标已有待处理的更新，本次请求被合并
+                self._skipped += 1
+            else:
+                self._dirty.add(target)
+
+        if self._suspended:
+            return
+
+        now = time.monotonic()
+        if self._first_pending is None:
+            self._first_pending = now
+
+        # 去抖，但不超过最大滞后时间
+        elapsed_ms = (now - self._first_pending) * 1000
+        remaining_ms = max(0, self._max_delay_ms - elapsed_ms)
+        self._timer.start(int(min(self._debounce_ms, remaining_ms)))
+
+    def flush(self):
+        """立即渲染当前可见且已过期的预览目标"""
+        self._timer.stop()
+        self._first_pending = None
+        if self._suspended:
+            return
+        if self._visible in self._dirty:
+            self._render(self._visible)
+
+    def suspend(self):
+        """暂停渲染，期间的更新请求只做标记"""
+        self._suspended += 1
+        self._timer.stop()
+
+    def resume(self):
+        """恢复渲染，并对暂停期间的更新做一次合并渲染"""
+        if self._suspended:
+            self._suspended -= 1
+        if not self._suspended:
+            self.flush()
+
+    def is_dirty(self, target):
+        """目标内容是否已过期"""
+        return target in self._dirty
+
+    def stats(self):
+        """获取调度统计"""
+        return {
+            "requested": self._requested,
+            "performed": self._performed,
+            "skipped": self._skipped,
+            "pending": len(self._dirty),
+        }
+
+    def _render(self, target):
+        self._dirty.discard(target)
+        self._performed += 1
+        self._render_func(target)
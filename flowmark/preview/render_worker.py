@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FlowMark 后台渲染线程
+"""
+
+import threading
+
+from PyQt6.QtCore import QThread, pyqtSignal
+
+
+class RenderWorker(QThread):
+    """后台渲染线程
+
+    每个渲染任务带有递增的代号（generation）。队列中只保留最新的一个
+    待处理任务，被新任务替换的旧任务直接丢弃；渲染完成时若已有更新的
+    任务提交，结果同样被丢弃，因此只有最新的结果会被应用到预览。
+    GUI 线程提交任务后立即返回，从不等待渲染完成。
+    """
+
+    # 渲染完成信号：代号, 渲染结果（HTML 字符串或 RenderedBlock 列表）
+    rendered = pyqtSignal(int, object)
+
+    def __init__(self, render_func, parent=None):
+        super().__init__(parent)
+        self._render_func = render_func
+        self._condition = threading.Condition()
+        self._pending = None
+        self._generation = 0
+        self._busy = False
+        self._stopping = False
+
+        self._submitted = 0
+        self._completed = 0
+        self._dropped = 0
+
+    @property
+    def generation(self):
+        """最新提交的任务代号"""
+        return self._generation
+
+    def submit(self, text):
+        """提交渲染任务，返回任务代号"""
+        if not self.isRunning():
+            # 第一次提交时才启动线程
+            self.start()
+        with self._condition:
+            self._generation += 1
+            self._submitted += 1
+            if self._pending is not None:
+                # 尚未开始的旧任务已过期
+                self._dropped += 1
+            self._pending = (self._generation, text)
+            self._condition.notify()
+            return self._generation
+
+    def is_current(self, generation):
+        """任务结果是否仍是最新的"""
+        return generation == self._generation
+
+    def drop(self):
+        """记录一次在应用前被丢弃的结果"""
+        with self._condition:
+            self._dropped += 1
+
+    def stop(self):
+        """停止线程并等待其退出"""
+        with self._condition:
+            self._stopping = True
+            self._pending = None
+            self._condition.notify()
+        self.wait()
+
+    def metrics(self):
+        """获取渲染队列统计"""
+        with self._condition:
+            return {
+                "queue_depth": int(self._pending is not None) + int(self._busy),
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "dropped": self._dropped,
+            }
+
+    def run(self):
+        while True:
+            with self._condition:
+                while self._pending is None and not self._stopping:
+                    self._condition.wait()
+                if self._stopping:
+                    return
+                generation, text = self._pending
+                self._pending = None
+                self._busy = True
+
+            try:
+                html = self._render_func(text)
+            except Exception as e:
+                html = f"<p>渲染失败: {e}</p>"
+
+            with self._condition:
+                self._busy = False
+                if generation != self._generation:
+                    # 渲染期间已有更新的任务，结果作废
+                    self._dropped += 1
+                    continue
+                self._completed += 1
+            self.rendered.emit(generation, html)
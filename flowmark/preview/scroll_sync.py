@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FlowMark 编辑器与渲染预览的滚动同步
+"""
+
+from PyQt6.QtCore import QObject, QPoint
+from PyQt6.QtGui import QTextCursor
+
+from flowmark.utils.tracing import traced
+
+
+class ScrollSync(QObject):
+    """编辑器与渲染预览之间的双向滚动同步和点击跳转
+
+    编辑器的行号经 SourceMap 换算为渲染块及块内位置，再由预览控件给出
+    块的纵坐标，全程都是二分查找，文档再大每次滚动的代价也是 O(log n)。
+    预览没有块信息（例如启用了依赖整篇文档的扩展）时按滚动比例同步。
+    """
+
+    def __init__(self, editor, source_map, parent=None):
+        super().__init__(parent)
+        self.editor = editor
+        self.source_map = source_map
+        self.enabled = True
+        self._preview = None
+        self._syncing = False
+        editor.verticalScrollBar().valueChanged.connect(self.sync_from_editor)
+        editor.cursorPositionChanged.connect(self.reveal_cursor)
+
+    def preview(self):
+        """当前同步的预览控件"""
+        return self._preview
+
+    def set_preview(self, preview):
+        """设置要同步的预览控件（MarkdownPreview 或 VirtualPreview）"""
+        if preview is self._preview:
+            return
+        if self._preview is not None:
+            self._preview.verticalScrollBar().valueChanged.disconnect(self._on_preview_scrolled)
+            self._preview.block_clicked.disconnect(self.jump_to_block)
+        self._preview = preview
+        if preview is not None:
+            preview.verticalScrollBar().valueChanged.connect(self._on_preview_scrolled)
+            preview.block_clicked.connect(self.jump_to_block)
+
+    def _active(self):
+        return self.enabled and not self._syncing and self._preview is not None and self._preview.isVisible()
+
+    def editor_top_line(self):
+        """编辑器视口顶部的行号（可为小数）"""
+        cursor = self.editor.cursorForPosition(QPoint(0, 0))
+        block = cursor.block()
+        rect = self.editor.document().documentLayout().blockBoundingRect(block)
+        offset = self.editor.verticalScrollBar().value() - rect.top()
+        fraction = offset / rect.height() if rect.height() > 0 else 0.0
+        return block.blockNumber() + min(1.0, max(0.0, fraction))
+
+    def editor_line_top(self, line):
+        """编辑器中某行（可为小数）的纵坐标"""
+        document = self.editor.document()
+        number = max(0, min(int(line), document.blockCount() - 1))
+        rect = document.documentLayout().blockBoundingRect(document.findBlockByNumber(number))
+        return rect.top() + rect.height() * min(1.0, max(0.0, line - number))
+
+    def preview_position(self, editor_line):
+        """编辑器行号对应的预览纵坐标，没有块信息时返回 None"""
+        preview = self._preview
+        index, fraction = self.source_map.block_for_line(self.source_map.source_line(editor_line))
+        if index < 0 or index >= preview.block_count:
+            return None
+        return preview.block_top(index) + preview.block_height(index) * fraction
+
+    def editor_line_at(self, y):
+        """预览纵坐标对应的编辑器行号，没有块信息时返回 None"""
+        preview = self._preview
+        index = preview.block_at(y)
+        if index < 0 or index >= self.source_map.block_count:
+            return None
+        height = preview.block_height(index)
+        fraction = (y - preview.block_top(index)) / height if height > 0 else 0.0
+        line = self.source_map.line_for_block(index, min(1.0, max(0.0, fraction)))
+        return self.source_map.editor_line(line)
+
+    @traced("ScrollSync.sync_from_editor")
+    def sync_from_editor(self, *args):
+        """按编辑器的滚动位置滚动预览"""
+        if not self._active():
+            return
+        editor_bar = self.editor.verticalScrollBar()
+        preview_bar = self._preview.verticalScrollBar()
+        y = self.preview_position(self.editor_top_line())
+        if y is None:
+            y = _proportional(editor_bar, preview_bar)
+        self._set_value(preview_bar, y)
+
+    @traced("ScrollSync.sync_from_preview")
+    def sync_from_preview(self):
+        """按预览的滚动位置滚动编辑器"""
+        if not self._active():
+            return
+        editor_bar = self.editor.verticalScrollBar()
+        preview_bar = self._preview.verticalScrollBar()
+        line = self.editor_line_at(preview_bar.value())
+        if line is None:
+            y = _proportional(preview_bar, editor_bar)
+        else:
+            y = self.editor_line_top(line)
+        self._set_value(editor_bar, y)
+
+    def _on_preview_scrolled(self, value):
+        # 只跟随用户在预览中的滚动，预览重新排版引起的滚动条变化不影响编辑器
+        if self._preview.underMouse() or self._preview.hasFocus():
+            self.sync_from_preview()
+
+    def jump_to_block(self, index, fraction=0.0):
+        """点击预览中的块时，把编辑器光标移到对应的源文本行
+
+        编辑器按点击位置在预览视口中的高度滚动，被点击的内容在两侧对齐。
+        """
+        if not self.enabled or self._syncing or index >= self.source_map.block_count:
+            return
+        document = self.editor.document()
+        line = self.source_map.editor_line(self.source_map.line_for_block(index, fraction))
+        number = max(0, min(int(line), document.blockCount() - 1))
+        preview = self._preview
+        viewport_y = preview.block_top(index) + preview.block_height(index) * fraction
+        viewport_y -= preview.verticalScrollBar().value()
+
+        self._syncing = True
+        try:
+            self.editor.setTextCursor(QTextCursor(document.findBlockByNumber(number)))
+            self._set_value(self.editor.verticalScrollBar(), self.editor_line_top(line) - viewport_y)
+        finally:
+            self._syncing = False
+        self.editor.setFocus()
+
+    def reveal_cursor(self):
+        """光标所在的块不在预览视口内时滚动预览，使其可见"""
+        if not self._active():
+            return
+        line = self.editor.textCursor().blockNumber()
+        y = self.preview_position(line)
+        if y is None:
+            return
+        preview_bar = self._preview.verticalScrollBar()
+        height = self._preview.viewport().height()
+        if y < preview_bar.value() or y > preview_bar.value() + height:
+            self._set_value(preview_bar, y - height / 3)
+
+    def _set_value(self, scrollbar, value):
+        self._syncing = True
+        try:
+            scrollbar.setValue(int(max(scrollbar.minimum(), min(value, scrollbar.maximum()))))
+        finally:
+            self._syncing = False
+
+
+def _proportional(source, target):
+    """按滚动比例换算滚动位置"""
+    if source.maximum() <= 0:
+        return 0
+    return target.maximum() * source.value() / source.maximum()
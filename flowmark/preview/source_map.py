@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FlowMark 源文本与预览位置的映射
+"""
+
+import bisect
+import re
+
+from flowmark.editor.block_tracker import BlockTracker
+
+# 预览中标记块起点的锚点名前缀
+ANCHOR_PREFIX = "fm-block-"
+
+# 可以放置锚点的第一个文本容器标签
+_CONTAINER_TAG_RE = re.compile(r"<(?:p|h[1-6]|li|pre|td|th|dt|dd|blockquote)(?:\s[^>]*)?>", re.IGNORECASE)
+
+
+def anchored_html(blocks):
+    """把逐块渲染的结果拼接为完整 HTML，并在每个块的第一个文本容器中插入锚点
+
+    块序号与 SourceMap 一致（跳过没有输出的块）。没有文本容器的块
+    （例如分割线）不插入锚点，其位置取前一个块的位置。
+    """
+    parts = []
+    for index, block in enumerate(block for block in blocks if block.html):
+        match = _CONTAINER_TAG_RE.search(block.html)
+        if match:
+            end = match.end()
+            parts.append(f'{block.html[:end]}<a name="{ANCHOR_PREFIX}{index}"></a>{block.html[end:]}')
+        else:
+            parts.append(block.html)
+    return "\n".join(parts)
+
+
+class _LineMap:
+    """单调的行号换算函数
+
+    由若干分段组成，每段从 xs[i] 开始，斜率为 1（结果为 ys[i] + x - xs[i]）
+    或为 0（flat[i]，结果恒为 ys[i]），按分段起点二分查找。最后一段总是
+    斜率为 1 且向后无限延伸。
+    """
+
+    def __init__(self):
+        self._xs = [0]
+        self._ys = [0]
+        self._flat = [False]
+
+    def __call__(self, x):
+        index = max(0, bisect.bisect_right(self._xs, x) - 1)
+        if self._flat[index]:
+            return self._ys[index]
+        return self._ys[index] + x - self._xs[index]
+
+    def _cut(self, x):
+        """确保 x 是一个分段的起点，返回该分段的序号"""
+        index = max(0, bisect.bisect_right(self._xs, x) - 1)
+        if self._xs[index] == x:
+            return index
+        y = self._ys[index] if self._flat[index] else self._ys[index] + x - self._xs[index]
+        self._xs.insert(index + 1, x)
+        self._ys.insert(index + 1, y)
+        self._flat.insert(index + 1, self._flat[index])
+        return index + 1
+
+    def _first_at_least(self, y):
+        """结果不小于 y 的最小 x"""
+        index = bisect.bisect_left(self._ys, y)
+        if index > 0 and not self._flat[index - 1]:
+            previous = index - 1
+            end = self._xs[index] if index < len(self._xs) else None
+            x = self._xs[previous] + y - self._ys[previous]
+            if end is None or x < end:
+                return x
+        return self._xs[index]
+
+    def replace_input(self, first, old_last, new_last):
+        """在函数之前套用一个补丁：输入中 [first, old_last] 行被替换为 [first, new_last] 行"""
+        middle = min(old_last, new_last) + 1
+        self._cut(middle)
+        tail = self._cut(old_last + 1)
+        middle = bisect.bisect_left(self._xs, middle)
+        delta = new_last - old_last
+        xs = self._xs[:middle]
+        ys = self._ys[:middle]
+        flat = self._flat[:middle]
+        if delta > 0:
+            # 新增的行都对应原来的下一行
+            xs.append(old_last + 1)
+            ys.append(self._ys[tail])
+            flat.append(True)
+        self._xs = xs + [x + delta for x in self._xs[tail:]]
+        self._ys = ys + self._ys[tail:]
+        self._flat = flat + self._flat[tail:]
+
+    def replace_output(self, first, old_last, new_last):
+        """在函数之后套用一个补丁：结果中 [first, old_last] 行被替换为 [first, new_last] 行"""
+        delta = new_last - old_last
+        if delta < 0:
+            # 被删除的行都对应到替换后的下一行
+            start = self._cut(self._first_at_least(new_last + 2))
+            end = self._cut(self._first_at_least(old_last + 1))
+            if start < end:
+                self._xs[start:end] = [self._xs[start]]
+                self._ys[start:end] = [new_last + 1]
+                self._flat[start:end] = [True]
+        tail = self._cut(self._first_at_least(old_last + 1))
+        self._ys[tail:] = [y + delta for y in self._ys[tail:]]
+
+
+class SourceMap(BlockTracker):
+    """编辑器行号、源文本行号和渲染块之间的索引
+
+    渲染完成时由 RenderedBlock 列表建立（set_blocks），按块的起始行号
+    二分查找，因此行号与块的互相换算都是 O(log n)。两次渲染之间的编辑
+    不重建索引，而是通过 BlockTracker 的增量回调记录为行号偏移补丁，
+    补丁在记录时就折叠进两个方向的分段换算表，查询时二分查找，
+    不随补丁数增加。
+
+    预览中块的位置由预览控件提供（block_top / block_height / block_at）。
+    """
+
+    # 补丁数上限，预览长时间不刷新时丢弃索引，等待下次渲染重建
+    MAX_PATCHES = 1024
+
+    def __init__(self, parent=None):
+        self._starts = []
+        self._ends = []
+        # 行号偏移补丁：(起始行, 原结束行, 新结束行)，均为闭区间
+        self._patches = []
+        self._dropped = 0
+        # 补丁折叠后的换算表：编辑器行号 -> 源文本行号，源文本行号 -> 编辑器行号
+        self._to_source = _LineMap()
+        self._to_editor = _LineMap()
+        super().__init__(parent)
+
+    def blocks_replaced(self, start, old_values, new_values):
+        if old_values or new_values:
+            patch = (start, start + len(old_values) - 1, start + len(new_values) - 1)
+            self._patches.append(patch)
+            self._to_source.replace_input(*patch)
+            self._to_editor.replace_output(*patch)
+        if len(self._patches) > self.MAX_PATCHES:
+            self._dropped += len(self._patches)
+            self._patches = []
+            self._to_source = _LineMap()
+            self._to_editor = _LineMap()
+            self._starts = []
+            self._ends = []
+
+    @property
+    def block_count(self):
+        """渲染块数"""
+        return len(self._starts)
+
+    def mark(self):
+        """记录当前的补丁位置，提交渲染时调用"""
+        return self._dropped + len(self._patches)
+
+    def set_blocks(self, blocks, mark=None):
+        """用渲染结果重建索引
+
+        mark 为提交渲染时 mark() 的返回值，之后发生的编辑仍需作为补丁保留。
+        """
+        blocks = [block for block in blocks if block.html]
+        self._starts = [block.start_line for block in blocks]
+        self._ends = [block.end_line for block in blocks]
+        keep = -1 if mark is None else mark - self._dropped
+        # 提交渲染之后的补丁已被丢弃时，索引会略有偏差，直到下次渲染
+        self._patches = self._patches[keep:] if keep >= 0 else []
+        self._to_source = _LineMap()
+        self._to_editor = _LineMap()
+        for patch in self._patches:
+            self._to_source.replace_input(*patch)
+            self._to_editor.replace_output(*patch)
+
+    def source_line(self, editor_line):
+        """编辑器中的行号换算为渲染时的源文本行号"""
+        return max(0, self._to_source(editor_line))
+
+    def editor_line(self, source_line):
+        """渲染时的源文本行号换算为编辑器中的行号"""
+        return max(0, self._to_editor(source_line))
+
+    def block_for_line(self, source_line):
+        """源文本行号所在的块序号及块内的相对位置，没有块时返回 (-1, 0)"""
+        if not self._starts:
+            return -1, 0.0
+        index = max(0, bisect.bisect_right(self._starts, source_line) - 1)
+        start = self._starts[index]
+        end = self._ends[index]
+        if source_line >= end:
+            # 块之后的空行
+            return index, 1.0
+        span = max(1, end - start)
+        return index, min(1.0, max(0.0, (source_line - start) / span))
+
+    def line_for_block(self, index, fraction=0.0):
+        """块序号及块内相对位置换算为源文本行号（可为小数）"""
+        if not self._starts:
+            return 0.0
+        index = max(0, min(index, len(self._starts) - 1))
+        start = self._starts[index]
+        return start + (self._ends[index] - start) * fraction
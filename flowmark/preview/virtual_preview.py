@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FlowMark 虚拟化渲染预览
+"""
+
+import bisect
+from collections import OrderedDict
+
+from PyQt6.QtCore import QRectF, pyqtSignal
+from PyQt6.QtGui import QAbstractTextDocumentLayout, QPainter, QTextDocument
+from PyQt6.QtWidgets import QAbstractScrollArea
+
+from flowmark.preview.image_cache import is_image_resource
+from flowmark.utils.tracing import traced
+
+
+class HeightIndex:
+    """块高度的树状数组（Fenwick 树）
+
+    修改单个块的高度、求某块顶部的纵坐标、由纵坐标查找所在块
+    都是 O(log n)，块数再多也不需要整体重算偏移。
+    """
+
+    def __init__(self, heights=()):
+        self._heights = list(heights)
+        size = len(self._heights)
+        self._tree = [0] * (size + 1)
+        for index, height in enumerate(self._heights, 1):
+            self._tree[index] += height
+            parent = index + (index & -index)
+            if parent <= size:
+                self._tree[parent] += self._tree[index]
+        self._total = sum(self._heights)
+
+    def __len__(self):
+        return len(self._heights)
+
+    def __getitem__(self, index):
+        return self._heights[index]
+
+    @property
+    def total(self):
+        """总高度"""
+        return self._total
+
+    def set(self, index, height):
+        """修改块的高度"""
+        delta = height - self._heights[index]
+        if not delta:
+            return
+        self._heights[index] = height
+        self._total += delta
+        index += 1
+        while index < len(self._tree):
+            self._tree[index] += delta
+            index += index & -index
+
+    def top(self, index):
+        """块顶部的纵坐标，即前 index 个块的高度之和"""
+        result = 0
+        while index > 0:
+            result += self._tree[index]
+            index -= index & -index
+        return result
+
+    def find(self, y):
+        """纵坐标 y 所在的块序号"""
+        size = len(self._heights)
+        if not size:
+            return -1
+        position = 0
+        step = 1 << size.bit_length()
+        while step:
+            candidate = position + step
+            if candidate <= size and self._tree[candidate] <= y:
+                position = candidate
+                y -= self._tree[candidate]
+            step >>= 1
+        return min(position, size - 1)
+
+
+class _BlockDocument(QTextDocument):
+    """单个块的文档，图片从预览的图片缓存加载"""
+
+    def __init__(self, preview):
+        super().__init__()
+        self._preview = preview
+        # 仍显示占位图的图片路径
+        self.waiting_images = set()
+
+    def loadResource(self, resource_type, name):
+        cache = self._preview.image_cache() if is_image_resource(resource_type) else None
+        if cache is not None:
+            path, image = cache.resource(name.toString(), self._preview.base_dir())
+            if image is not None:
+                if cache.is_placeholder(image):
+                    self.waiting_images.add(path)
+                return image
+        return super().loadResource(resource_type, name)
+
+
+class VirtualPreview(QAbstractScrollArea):
+    """只排版可见区域附近内容的渲染预览
+
+    预览由逐块渲染的 HTML 组成，每个块使用独立的 QTextDocument 排版，
+    但只有视口及其上下 margin 范围内的块才会被创建和排版，离开范围的块
+    随即释放。其余块的高度按源文本长度估算，排版后换成实际高度，滚动条
+    按累计高度计算（见 HeightIndex），因此排版耗时和内存只与视口大小
+    有关，与文档大小无关。
+    """
+
+    # 点击预览中的块：块序号, 块内的相对位置
+    block_clicked = pyqtSignal(int, float)
+
+    # 块与块之间的间距
+    BLOCK_SPACING = 8
+    # 左右留白
+    PADDING = 8
+
+    def __init__(self, parent=None, margin=None):
+        super().__init__(parent)
+        self._blocks = []
+        self._heights = HeightIndex()
+        self._measured = []
+        # 已排版的块：块序号 -> QTextDocument
+        self._documents = OrderedDict()
+        # 按 HTML 记录实测高度，编辑后未变化的块无需重新排版就能得到准确高度
+        self._height_cache = {}
+        self._layout_width = 0
+        self._margin = margin
+        self.layouts = 0
+        # 图片缓存在第一次加载图片时才通过 _image_cache_factory 获取
+        self._image_cache = None
+        self._image_cache_factory = None
+        self._base_dir = None
+
+        self.verticalScrollBar().setSingleStep(20)
+        self.verticalScrollBar().valueChanged.connect(self.viewport().update)
+
+    def set_image_cache(self, image_cache, base_dir):
+        """设置图片缓存
+
+        image_cache 为返回图片缓存的函数，第一次加载图片时才调用；
+        base_dir 为返回相对路径基准目录的函数。
+        """
+        self._image_cache_factory = image_cache
+        self._base_dir = base_dir
+
+    def image_cache(self):
+        """图片缓存，第一次使用时获取；没有设置时返回 None"""
+        if self._image_cache is None and self._image_cache_factory is not None:
+            self._image_cache = self._image_cache_factory()
+            self._image_cache.image_ready.connect(self._on_image_ready)
+        return self._image_cache
+
+    def base_dir(self):
+        """相对图片路径的基准目录"""
+        return self._base_dir() if self._base_dir is not None else None
+
+    def _on_image_ready(self, path):
+        # 释放仍显示占位图的块，下次绘制时按实际图片重新排版和测量
+        stale = [index for index, document in self._documents.items() if path in document.waiting_images]
+        for index in stale:
+            del self._documents[index]
+            self._measured[index] = False
+            self._height_cache.pop(self._blocks[index].html, None)
+        if stale:
+            self.viewport().update()
+
+    @property
+    def block_count(self):
+        """块数"""
+        return len(self._blocks)
+
+    @property
+    def total_height(self):
+        """内容总高度（含估算部分）"""
+        return self._heights.total
+
+    def margin(self):
+        """视口上下额外排版的范围（像素）"""
+        if self._margin is not None:
+            return self._margin
+        return self.viewport().height()
+
+    @traced("VirtualPreview.set_blocks")
+    def set_blocks(self, blocks):
+        """设置逐块渲染的结果（RenderedBlock 列表）"""
+        anchor = self._anchor()
+        width = self._text_width()
+        old_documents = {}
+        for index, document in self._documents.items():
+            old_documents[self._blocks[index].html] = document
+
+        self._blocks = [block for block in blocks if block.html]
+        self._documents = OrderedDict()
+        heights = []
+        self._measured = []
+        height_cache = {}
+        for index, block in enumerate(self._blocks):
+            height = self._height_cache.get(block.html)
+            if height is not None:
+                height_cache[block.html] = height
+                heights.append(height)
+                self._measured.append(True)
+            else:
+                heights.append(self.estimate_height(block, width))
+                self._measured.append(False)
+            document = old_documents.pop(block.html, None)
+            if document is not None:
+                # 未变化的块直接复用已排版的文档
+                self._documents[index] = document
+        # 只保留当前文档中块的实测高度
+        self._height_cache = height_cache
+        self._heights = HeightIndex(heights)
+
+        self._update_scrollbar()
+        if anchor is not None:
+            self._restore_anchor(anchor)
+        self.viewport().update()
+
+    def clear(self):
+        """清空预览"""
+        self.set_blocks([])
+
+    def estimate_height(self, block, width):
+        """按源文本估算块的高度"""
+        metrics = self.fontMetrics()
+        line_height = metrics.lineSpacing()
+        chars_per_line = max(1, int(width / max(1, metrics.averageCharWidth())))
+        lines = 0
+        for line in block.text.split("\n"):
+            lines += 1 + len(line) // chars_per_line
+        return lines * line_height + self.BLOCK_SPACING
+
+    def block_at(self, y):
+        """内容纵坐标 y 所在的块序号"""
+        return self._heights.find(max(0, y))
+
+    def block_top(self, index):
+        """块顶部的内容纵坐标"""
+        return self._heights.top(index)
+
+    def block_height(self, index):
+        """块的高度（未排版时为估算值）"""
+        return self._heights[index]
+
+    def block(self, index):
+        """获取块"""
+        return self._blocks[index]
+
+    def scroll_to_block(self, index, fraction=0.0):
+        """滚动到指定块，fraction 为块内的相对位置"""
+        if not self._blocks:
+            return
+        index = max(0, min(index, len(self._blocks) - 1))
+        # 先排版目标块，使用实际高度定位
+        self._layout(index)
+        self._update_scrollbar()
+        self.verticalScrollBar().setValue(int(self.block_top(index) + self._heights[index] * fraction))
+
+    def layout_count(self):
+        """当前已排版（驻留内存）的块数"""
+        return len(self._documents)
+
+    def _text_width(self):
+        return max(1, self.viewport().width() - 2 * self.PADDING)
+
+    def _layout(self, index):
+        """排版一个块，返回其文档；实际高度与记录不同时更新偏移"""
+        document = self._documents.get(index)
+        if document is None:
+            document = _BlockDocument(self)
+            document.setDocumentMargin(0)
+            document.setDefaultFont(self.font())
+            document.setHtml(self._blocks[index].html)
+            document.setTextWidth(self._text_width())
+            self._documents[index] = document
+            self.layouts += 1
+        else:
+            self._documents.move_to_end(index)
+        height = int(document.size().height()) + self.BLOCK_SPACING
+        if not self._measured[index]:
+            self._heights.set(index, height)
+            self._measured[index] = True
+            if not document.waiting_images:
+                self._height_cache[self._blocks[index].html] = height
+        return document
+
+    def _anchor(self):
+        """记录视口顶部所在的块及块内偏移，用于高度变化后保持位置"""
+        if not self._blocks:
+            return None
+        top = self.verticalScrollBar().value()
+        index = self.block_at(top)
+        return self._blocks[index].start_line, top - self.block_top(index)
+
+    def _restore_anchor(self, anchor):
+        start_line, delta = anchor
+        starts = [block.start_line for block in self._blocks]
+        index = max(0, bisect.bisect_right(starts, start_line) - 1)
+        self._update_scrollbar()
+        self.verticalScrollBar().setValue(int(self.block_top(index) + delta))
+
+    def _update_scrollbar(self):
+        scrollbar = self.verticalScrollBar()
+        page = self.viewport().height()
+        scrollbar.setPageStep(page)
+        scrollbar.setRange(0, max(0, int(self.total_height) - page))
+
+    @traced("VirtualPreview.layout_viewport")
+    def _layout_viewport(self):
+        """排版视口附近的块，释放范围以外的块，返回可见块序号范围"""
+        if not self._blocks:
+            self._documents.clear()
+            return range(0)
+
+        scrollbar = self.verticalScrollBar()
+        top = scrollbar.value()
+        height = self.viewport().height()
+        margin = self.margin()
+
+        first = self.block_at(top - margin)
+        anchor_index = self.block_at(top)
+        anchor_delta = top - self.block_top(anchor_index)
+
+        # 排版上方 margin 内的块，其高度变化不应让可见内容跳动
+        index = first
+        while index < anchor_index:
+            self._layout(index)
+            index += 1
+        top = self.block_top(anchor_index) + anchor_delta
+
+        last = anchor_index
+        bottom = self.block_top(anchor_index)
+        while True:
+            self._layout(last)
+            bottom += self._heights[last]
+            if bottom > top + height + margin or last == len(self._blocks) - 1:
+                break
+            last += 1
+
+        # 释放范围以外的文档，内存只与视口大小有关
+        for index in [index for index in self._documents if index < first or index > last]:
+            del self._documents[index]
+
+        self._update_scrollbar()
+        if scrollbar.value() != int(top):
+            scrollbar.blockSignals(True)
+            scrollbar.setValue(int(top))
+            scrollbar.blockSignals(False)
+        return range(first, last + 1)
+
+    def paintEvent(self, event):
+        visible = self._layout_viewport()
+        painter = QPainter(self.viewport())
+        painter.fillRect(event.rect(), self.palette().base())
+        top = self.verticalScrollBar().value()
+        bottom = top + self.viewport().height()
+        context = QAbstractTextDocumentLayout.PaintContext()
+        context.palette = self.palette()
+        y = self.block_top(visible.start) if visible else 0
+        for index in visible:
+            block_y = y
+            y += self._heights[index]
+            if block_y > bottom or y < top:
+                continue
+            painter.save()
+            painter.translate(self.PADDING, block_y - top)
+            context.clip = QRectF(0, top - block_y, self._text_width(), self.viewport().height())
+            self._documents[index].documentLayout().draw(painter, context)
+            painter.restore()
+        painter.end()
+
+    def mouseReleaseEvent(self, event):
+        super().mouseReleaseEvent(event)
+        if self._blocks:
+            y = event.position().y() + self.verticalScrollBar().value()
+            index = self.block_at(y)
+            fraction = (y - self.block_top(index)) / max(1, self._heights[index])
+            self.block_clicked.emit(index, min(1.0, max(0.0, fraction)))
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        width = self._text_width()
+        if width != self._layout_width:
+            # 宽度变化后所有实测高度失效，重新估算
+            anchor = self._anchor()
+            self._layout_width = width
+            self._documents.clear()
+            self._height_cache.clear()
+            self._heights = HeightIndex(self.estimate_height(block, width) for block in self._blocks)
+            self._measured = [False] * len(self._blocks)
+            if anchor is not None:
+                self._restore_anchor(anchor)
+        self._update_scrollbar()
@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FlowMark 后台保存与自动保存
+"""
+
+import itertools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from PyQt6.QtCore import QObject, QTimer, pyqtSignal
+from PyQt6.QtGui import QTextCursor, QTextDocument
+
+from flowmark.editor.markdown_serializer import MarkdownSerializer
+from flowmark.utils.edit_journal import JOURNAL_DIR, EditJournal
+from flowmark.utils.revision_history import RevisionHistory, history_path
+
+# 默认的撤销步数上限，超过时在手动保存后清空撤销栈
+DEFAULT_MAX_UNDO_STEPS = 1000
+
+
+class AutoSaver(QObject):
+    """后台保存与自动保存
+
+    保存在单独的线程中进行（原子写入），GUI 线程只负责取出文本快照。
+    编辑停止 idle_ms 毫秒后自动保存已有路径的文档；每次编辑同时追加到
+    编辑日志中，崩溃后可以由磁盘上的文件加日志恢复未保存的内容。
+    多个文档各自使用一个 AutoSaver，未命名文档的日志按实例区分。
+
+    每次保存成功后在保存线程中把保存的内容记录为一个修订（history），
+    修订历史保存在文件旁边。撤销步数超过 max_undo_steps 时，用户手动
+    保存（而不是自动保存）成功后清空撤销栈，更早的状态可以从修订历史中
+    恢复；saved 发出时 undo_trimmed 表示这次保存是否清空了撤销栈。
+    """
+
+    _keys = itertools.count()
+
+    # 保存成功：文件路径
+    saved = pyqtSignal(str)
+    # 保存失败：文件路径, 错误信息
+    save_failed = pyqtSignal(str, str)
+    # 后台线程通知保存结果：会话, 文件路径, 日志位置,
+    # 日志基准文本副本 (写入时的日志路径, SHA-1)（没有副本时为 None）, 错误信息,
+    # 保存成功后是否按上限清空撤销栈
+    _save_done = pyqtSignal(int, str, int, object, str, bool)
+
+    def __init__(self, file_handler, text_func=None, idle_ms=3000, parent=None):
+        super().__init__(parent)
+        self.file_handler = file_handler
+        # 未指定时保存所跟踪文档序列化得到的 Markdown
+        self._text_func = text_func
+        self._key = next(AutoSaver._keys)
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._document = None
+        self._file_path = None
+        self._journal = None
+        self._session = 0
+        self._saving = 0
+        self.history = RevisionHistory()
+        self.max_undo_steps = DEFAULT_MAX_UNDO_STEPS
+        self.undo_trimmed = False
+
+        self._idle_timer = QTimer(self)
+        self._idle_timer.setSingleShot(True)
+        self._idle_timer.setInterval(idle_ms)
+        self._idle_timer.timeout.connect(self._on_idle)
+
+        self._save_done.connect(self._on_save_done)
+
+    @property
+    def file_path(self):
+        """当前文档的文件路径，未命名文档为 None"""
+        return self._file_path
+
+    def set_idle_interval(self, idle_ms):
+        """设置自动保存的空闲时间（毫秒），0 表示关闭自动保存"""
+        self._idle_timer.setInterval(max(0, int(idle_ms)))
+
+    def set_history_limits(self, max_bytes, max_undo_steps):
+        """设置修订历史的内存上限（字节）和撤销步数上限（0 表示不限制）"""
+        self._executor.submit(self.history.set_limit, max_bytes)
+        self.max_undo_steps = max(0, int(max_undo_steps))
+
+    def attach(self, document, file_path, resume=False):
+        """开始跟踪文档，以磁盘上的文件为基准开始新的编辑日志
+
+        resume 为 True 时继续使用已有的日志并保留文档的修改状态，用于文档被
+        换出内存后重新载入（此时文档内容与日志重放后的结果一致）。
+        """
+        self.detach()
+        self._session += 1
+        self._document = document
+        self._file_path = file_path
+        self._journal = EditJournal(EditJournal.path_for(file_path, key=self._key))
+        if file_path:
+            self._executor.submit(self.history.set_path, history_path(file_path))
+        if resume:
+            self._journal.resume(file_path)
+        else:
+            self._journal.start(file_path)
+            document.setModified(False)
+        document.contentsChange.connect(self._on_contents_change)
+
+    def detach(self, discard=False):
+        """停止跟踪文档（例如加载新内容前），discard 为 True 时删除编辑日志"""
+        self._idle_timer.stop()
+        if self._document is not None:
+            self._document.contentsChange.disconnect(self._on_contents_change)
+            self._document = None
+        if self._journal is not None:
+            if self._journal.has_edits() and not discard:
+                self._journal.close()
+            else:
+                self._journal.discard()
+            self._journal = None
+
+    def save(self, file_path=None, trim_undo=False):
+        """在后台保存文档，file_path 为空时保存到当前路径
+
+        trim_undo 为 True（用户手动保存）时，保存成功后再按 max_undo_steps
+        清空撤销栈，保存失败时撤销历史保持不变。
+        """
+        file_path = file_path or self._file_path
+        if not file_path or self._document is None:
+            return False
+        self._idle_timer.stop()
+        serializer = MarkdownSerializer.for_document(self._document)
+        content = self._text_func() if self._text_func else serializer.to_markdown()
+        # 日志中的位置对应文档文本；格式序列化为标记后保存的内容与之不同，
+        # 日志改以保存时的文档文本为基准，由保存线程写到日志旁边的副本中
+        base_text = self._document.toPlainText() if serializer.has_rich_formats() else None
+        checkpoint = self._journal.checkpoint()
+        self._document.setModified(False)
+        self._saving += 1
+        session = self._session
+        journal_path = self._journal.journal_path
+        future = self._executor.submit(self._write, file_path, content, journal_path, base_text)
+        future.add_done_callback(
+            lambda f: self._save_done.emit(
+                session, file_path, checkpoint,
+                (journal_path, f.result()) if not f.exception() and f.result() else None,
+                str(f.exception() or ""), trim_undo,
+            )
+        )
+        return True
+
+    def trim_undo(self):
+        """撤销步数超过 max_undo_steps 时清空撤销栈，返回是否清空了
+
+        只在用户手动保存成功之后调用：自动保存时清空会在编辑中途悄悄丢掉撤销。
+        """
+        if self._document is None or not self.max_undo_steps:
+            return False
+        if self._document.availableUndoSteps() <= self.max_undo_steps:
+            return False
+        self._document.clearUndoRedoStacks(QTextDocument.Stacks.UndoStack)
+        return True
+
+    def is_saving(self):
+        """是否有正在进行的保存"""
+        return self._saving > 0
+
+    @staticmethod
+    def recover(file_path, base_text):
+        """若文件有未保存的编辑日志，返回恢复后的文本，否则返回 None"""
+        return EditJournal.recover(EditJournal.path_for(file_path), base_text)
+
+    @staticmethod
+    def recover_untitled(directory=JOURNAL_DIR):
+        """恢复异常退出的进程遗留的未命名文档，返回 (日志路径, 内容) 列表（从新到旧）
+
+        日志在用户决定是否恢复之后才由 discard_untitled 删除；没有内容的
+        遗留日志直接删除。
+        """
+        recovered = []
+        for journal_path in EditJournal.find_untitled(directory):
+            text = EditJournal.recover(journal_path, "")
+            if text:
+                recovered.append((journal_path, text))
+            else:
+                os.remove(journal_path)
+        return recovered
+
+    @staticmethod
+    def discard_untitled(journal_paths):
+        """删除已经处理过的遗留日志"""
+        for journal_path in journal_paths:
+            if os.path.exists(journal_path):
+                os.remove(journal_path)
+
+    def shutdown(self):
+        """等待进行中的保存完成并关闭"""
+        self._executor.shutdown(wait=True)
+        self.detach()
+
+    def _write(self, file_path, content, journal_path, base_text):
+        """在保存线程中写入文件并记录修订，返回日志基准文本副本的 SHA-1"""
+        base_digest = EditJournal.write_base(journal_path, base_text) if base_text is not None else None
+        self.file_handler.save_file(file_path, content)
+        try:
+            self.history.set_path(history_path(file_path))
+            self.history.commit(content)
+        except OSError:
+            # 修订历史写入失败（例如目录只读）不影响保存本身
+            pass
+        return base_digest
+
+    def _on_contents_change(self, position, removed, added):
+        document = self._document
+        end = min(position + added, document.characterCount() - 1)
+        cursor = QTextCursor(document)
+        cursor.setPosition(position)
+        cursor.setPosition(end, QTextCursor.MoveMode.KeepAnchor)
+        inserted = cursor.selectedText().replace("\u2029", "\n")
+        self._journal.record(position, removed, inserted)
+        if self._file_path and self._idle_timer.interval() > 0:
+            self._idle_timer.start()
+
+    def _on_idle(self):
+        if self._document is not None and self._document.isModified():
+            self.save()
+
+    def _on_save_done(self, session, file_path, checkpoint, base, error, trim_undo):
+        self._saving -= 1
+        self.undo_trimmed = False
+        current = session == self._session and self._journal is not None
+        if error:
+            if current:
+                self._document.setModified(True)
+            self.save_failed.emit(file_path, error)
+            return
+        if current:
+            if file_path != self._file_path:
+                # 另存为：日志随文档一起移动到新路径
+                self._file_path = file_path
+                self._journal.move(EditJournal.path_for(file_path, key=self._key))
+            base_digest = None
+            if base is not None:
+                base_digest = base[1]
+                self._journal.adopt_base(*base)
+            self._journal.commit(checkpoint, file_path, base_digest)
+            if not self._saving:
+                # 没有进行中的保存时才清理不再引用的副本
+                self._journal.prune_bases()
+            if trim_undo:
+                self.undo_trimmed = self.trim_undo()
+        # 最近文件列表只在 GUI 线程中修改
+        self.file_handler.add_recent_file(file_path)
+        self.saved.emit(file_path)
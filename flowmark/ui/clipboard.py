@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FlowMark 剪贴板
+"""
+
+from PyQt6.QtCore import QByteArray, QMimeData
+from PyQt6.QtWidgets import QApplication
+
+# Markdown 的 MIME 类型（RFC 7763）
+MARKDOWN_MIME = "text/markdown"
+PLAIN_MIME = "text/plain"
+HTML_MIME = "text/html"
+
+
+class MarkdownMimeData(QMimeData):
+    """同时提供 Markdown、纯文本和 HTML 的剪贴板数据
+
+    Markdown 和纯文本就是复制的原文；HTML 只在粘贴目标真正请求时才
+    转换并缓存，复制本身不做任何转换。
+    """
+
+    def __init__(self, markdown, converter):
+        super().__init__()
+        self._markdown = markdown
+        self._converter = converter
+        self._html = None
+
+    def formats(self):
+        return [MARKDOWN_MIME, PLAIN_MIME, HTML_MIME]
+
+    def hasFormat(self, mime_type):
+        return mime_type in (MARKDOWN_MIME, PLAIN_MIME, HTML_MIME)
+
+    def retrieveData(self, mime_type, preferred_type):
+        if mime_type == PLAIN_MIME:
+            return self._markdown
+        if mime_type == MARKDOWN_MIME:
+            return QByteArray(self._markdown.encode("utf-8"))
+        if mime_type == HTML_MIME:
+            if self._html is None:
+                self._html = self._converter.to_html(self._markdown)
+            return self._html
+        return super().retrieveData(mime_type, preferred_type)
+
+
+def copy_markdown(markdown, converter, clipboard=None):
+    """把 Markdown 文本放到剪贴板"""
+    if clipboard is None:
+        clipboard = QApplication.clipboard()
+    clipboard.setMimeData(MarkdownMimeData(markdown, converter))
@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FlowMark 多文档内存池
+"""
+
+import os
+import sys
+import zlib
+
+from PyQt6.QtCore import QObject, QPoint
+from PyQt6.QtGui import QTextCursor, QTextDocument
+
+from flowmark.editor.document_patch import block_opcodes, map_block, patch_document
+from flowmark.editor.markdown_serializer import MarkdownSerializer
+from flowmark.ui.autosave import AutoSaver
+
+# 驻留文档每个字符的估计内存（文本、字符格式、语法高亮和排版），用于内存预算
+BYTES_PER_CHAR = 48
+# 换出文档的文本超过该长度时压缩保存
+COMPRESS_CHARS = 4096
+
+
+class PooledDocument:
+    """文档池中的一个文档
+
+    驻留时持有完整的 QTextDocument（含排版、语法高亮和撤销栈）；被换出
+    后只保留文本（较长时用 zlib 压缩）、修改状态、光标和滚动位置，
+    再次激活时重新载入，撤销历史不保留。
+    """
+
+    def __init__(self, autosaver, text="", file_path=None):
+        self.autosaver = autosaver
+        self.document = None
+        self.modified = False
+        # 光标的 (锚点, 位置)
+        self.cursor = (0, 0)
+        # 视口顶部的块号及其上方被滚出的像素
+        self.scroll = (0, 0)
+        self.last_used = 0
+        self._file_path = file_path
+        self._snapshot = ""
+        self._attached = False
+        self._set_snapshot(text)
+
+    @property
+    def file_path(self):
+        """文件路径，未命名文档为 None"""
+        return self.autosaver.file_path or self._file_path
+
+    @property
+    def title(self):
+        """标签页上显示的名称"""
+        return os.path.basename(self.file_path) if self.file_path else "未命名"
+
+    @property
+    def is_resident(self):
+        """QTextDocument 是否在内存中"""
+        return self.document is not None
+
+    def is_modified(self):
+        """是否有未保存的修改"""
+        if self.document is not None:
+            return self.document.isModified()
+        return self.modified
+
+    def is_blank(self):
+        """是否为没有内容也没有修改的未命名文档"""
+        return self.file_path is None and not self.is_modified() and not self.text()
+
+    def text(self):
+        """文档的纯文本"""
+        if self.document is not None:
+            return self.document.toPlainText()
+        if isinstance(self._snapshot, bytes):
+            return zlib.decompress(self._snapshot).decode("utf-8")
+        return self._snapshot
+
+    def memory_size(self):
+        """估计占用的内存（字节）"""
+        history = self.autosaver.history.memory_size()
+        if self.document is not None:
+            return self.document.characterCount() * BYTES_PER_CHAR + history
+        return sys.getsizeof(self._snapshot) + history
+
+    def save_view(self, editor):
+        """记录编辑器中的光标和滚动位置"""
+        cursor = editor.textCursor()
+        self.cursor = (cursor.anchor(), cursor.position())
+        block = editor.cursorForPosition(QPoint(0, 0)).block()
+        top = self.document.documentLayout().blockBoundingRect(block).top()
+        self.scroll = (block.blockNumber(), int(editor.verticalScrollBar().value() - top))
+
+    def restore_view(self, editor):
+        """恢复光标和滚动位置
+
+        滚动位置按块号记录，重新载入后排版高度可能不同，仍能回到同一段内容。
+        """
+        document = self.document
+        end = document.characterCount() - 1
+        anchor, position = self.cursor
+        cursor = QTextCursor(document)
+        cursor.setPosition(min(anchor, end))
+        cursor.setPosition(min(position, end), QTextCursor.MoveMode.KeepAnchor)
+        editor.setTextCursor(cursor)
+        self.restore_scroll(editor)
+
+    def restore_scroll(self, editor):
+        """恢复滚动位置"""
+        document = self.document
+        block = document.findBlockByNumber(self.scroll[0])
+        if block.isValid():
+            top = document.documentLayout().blockBoundingRect(block).top()
+            editor.verticalScrollBar().setValue(int(top) + self.scroll[1])
+
+    def attach(self, document):
+        """开始使用载入的 QTextDocument，document 已填充为 text() 的内容
+
+        第一次载入时以磁盘上的文件为基准开始编辑日志，之后沿用原来的日志。
+        """
+        self.autosaver.attach(document, self.file_path, resume=self._attached)
+        self._attached = True
+        self.document = document
+        self._snapshot = ""
+
+    def detach(self):
+        """换出 QTextDocument，只保留文本和修改状态，返回换出的文档"""
+        document = self.document
+        self.modified = document.isModified()
+        self._set_snapshot(document.toPlainText())
+        self.autosaver.detach()
+        # 保存在磁盘上的修订历史下次查看时再读取
+        self.autosaver.history.release()
+        self.document = None
+        return document
+
+    def reload(self, text):
+        """以磁盘上的新内容重新加载（文件被其他程序修改后）
+
+        驻留时只替换变化的块，作为一次可撤销的编辑，未变化的块保留排版；
+        之后以新的文件为基准重新开始编辑日志。换出时替换保存的文本，
+        下次载入时重新开始编辑日志。记录的滚动位置映射到新的块号。
+        """
+        if self.document is not None:
+            opcodes = patch_document(self.document, text)
+            self.autosaver.attach(self.document, self.file_path)
+        else:
+            opcodes = block_opcodes(self.text().split("\n"), text.split("\n"))
+            self._set_snapshot(text)
+            self.modified = False
+            self._attached = False
+        self.scroll = (map_block(opcodes, self.scroll[0]), self.scroll[1])
+
+    def _set_snapshot(self, text):
+        if len(text) >= COMPRESS_CHARS:
+            self._snapshot = zlib.compress(text.encode("utf-8"), 1)
+        else:
+            self._snapshot = text
+
+
+class DocumentPool(QObject):
+    """多文档内存池
+
+    每个打开的文档有自己的 AutoSaver；当前文档之外，最近使用的文档在
+    内存预算（估计字节数和驻留文档数）之内保持驻留，切换回来时保留撤销
+    历史；超出预算时最久未使用的文档被换出为紧凑的文本，释放
+    QTextDocument 及其排版，再次激活时才重新载入。
+
+    prepare_document 在新建的 QTextDocument 填充内容之前调用（例如设置
+    语法高亮器）。
+    """
+
+    def __init__(self, file_handler, prepare_document=None, memory_bytes=128 * 1024 * 1024,
+                 max_resident=8, parent=None):
+        super().__init__(parent)
+        self.file_handler = file_handler
+        self.prepare_document = prepare_document
+        self.memory_bytes = memory_bytes
+        self.max_resident = max_resident
+        self.current = None
+        self._documents = []
+        self._clock = 0
+
+    def set_limits(self, memory_bytes, max_resident):
+        """设置内存预算（字节）和最多驻留的文档数"""
+        self.memory_bytes = max(0, int(memory_bytes))
+        self.max_resident = max(1, int(max_resident))
+        self.trim()
+
+    def __len__(self):
+        return len(self._documents)
+
+    def documents(self):
+        """所有打开的文档"""
+        return list(self._documents)
+
+    def find(self, file_path):
+        """查找已打开的文件"""
+        file_path = os.path.abspath(file_path)
+        for entry in self._documents:
+            if entry.file_path and os.path.abspath(entry.file_path) == file_path:
+                return entry
+        return None
+
+    def create(self, text="", file_path=None):
+        """加入一个文档，第一次激活时才创建 QTextDocument"""
+        entry = PooledDocument(AutoSaver(self.file_handler, parent=self), text, file_path)
+        self._documents.append(entry)
+        return entry
+
+    def activate(self, entry):
+        """把文档设为当前文档，必要时重新载入，并按预算换出其他文档"""
+        self.load(entry)
+        self.current = entry
+        self._clock += 1
+        entry.last_used = self._clock
+        self.trim()
+        return entry.document
+
+    def load(self, entry):
+        """载入文档（已驻留时不做任何事）"""
+        if entry.document is not None:
+            return entry.document
+        document = QTextDocument(self)
+        if self.prepare_document is not None:
+            self.prepare_document(document)
+        document.setPlainText(entry.text())
+        document.setModified(entry.modified)
+        # 第一次获取排版时文档会发出覆盖全文的 contentsChange，须在开始记录编辑日志之前
+        document.documentLayout()
+        entry.attach(document)
+        return document
+
+    def unload(self, entry):
+        """换出文档，返回是否成功
+
+        当前文档、正在保存的文档，以及含有粗体等字符格式的文档（换出只
+        保留纯文本，格式会丢失）不会被换出。
+        """
+        document = entry.document
+        if document is None or entry is self.current or entry.autosaver.is_saving():
+            return False
+        if MarkdownSerializer.for_document(document).has_rich_formats():
+            return False
+        entry.detach().deleteLater()
+        return True
+
+    def trim(self):
+        """按最久未使用的顺序换出文档，直到满足内存预算"""
+        resident = sorted(
+            (entry for entry in self._documents if entry.document is not None and entry is not self.current),
+            key=lambda entry: entry.last_used,
+        )
+        count = len(resident) + (1 if self.current is not None else 0)
+        size = self.memory_size()
+        for entry in resident:
+            if count <= self.max_resident and size <= self.memory_bytes:
+                break
+            before = entry.memory_size()
+            if self.unload(entry):
+                count -= 1
+                size += entry.memory_size() - before
+
+    def close(self, entry, discard=False):
+        """关闭文档，discard 为 True 时删除其编辑日志"""
+        self._documents.remove(entry)
+        if entry is self.current:
+            self.current = None
+        entry.autosaver.detach(discard)
+        entry.autosaver.shutdown()
+        entry.autosaver.deleteLater()
+        if entry.document is not None:
+            entry.document.deleteLater()
+            entry.document = None
+
+    def memory_size(self):
+        """所有文档估计占用的内存（字节）"""
+        return sum(entry.memory_size() for entry in self._documents)
+
+    def stats(self):
+        """文档数、驻留文档数和估计内存"""
+        return {
+            "documents": len(self._documents),
+            "resident": sum(1 for entry in self._documents if entry.document is not None),
+            "memory_bytes": self.memory_size(),
+        }
+
+    def shutdown(self):
+        """等待所有文档进行中的保存完成"""
+        for entry in self._documents:
+            entry.autosaver.shutdown()
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FlowMark 后台导出
+"""
+
+import threading
+
+from PyQt6.QtCore import QThread, pyqtSignal
+
+
+class ExportWorker(QThread):
+    """在后台线程中执行导出
+
+    export_func(progress, cancelled) 完成实际的导出并返回统计信息，
+    progress(已完成, 总数) 通过信号转发到 GUI 线程，cancelled() 在用户
+    取消后返回 True。
+
+    线程在两次导出之间保持运行，导出器创建的 Qt 对象（例如 PDF 导出
+    缓存的排版，其字体引擎属于所在线程）可以在下一次导出时继续使用，
+    cleanup() 在线程结束前在该线程中调用以释放这些对象。
+    """
+
+    # 导出进度：已完成, 总数（总数为 0 表示进度未知）
+    progress = pyqtSignal(int, int)
+    # 导出完成：统计信息
+    exported = pyqtSignal(dict)
+    # 导出失败：错误信息
+    failed = pyqtSignal(str)
+    # 一次导出结束（无论成功、失败还是取消）
+    completed = pyqtSignal()
+
+    def __init__(self, cleanup=None, parent=None):
+        super().__init__(parent)
+        self._cleanup = cleanup
+        self._condition = threading.Condition()
+        self._export_func = None
+        self._busy = False
+        self._stopping = False
+        self._cancelled = threading.Event()
+
+    def run_export(self, export_func):
+        """开始一次导出，上一次导出尚未结束时返回 False"""
+        with self._condition:
+            if self._busy:
+                return False
+            self._busy = True
+            self._export_func = export_func
+            self._cancelled.clear()
+            self._condition.notify()
+        if not self.isRunning():
+            self.start()
+        return True
+
+    def is_busy(self):
+        """是否有导出正在进行"""
+        with self._condition:
+            return self._busy
+
+    def cancel(self):
+        """取消导出"""
+        self._cancelled.set()
+
+    def is_cancelled(self):
+        """是否已取消"""
+        return self._cancelled.is_set()
+
+    def stop(self):
+        """取消进行中的导出并结束线程"""
+        with self._condition:
+            self._stopping = True
+            self._cancelled.set()
+            self._condition.notify()
+        self.wait()
+
+    def run(self):
+        while True:
+            with self._condition:
+                while self._export_func is None and not self._stopping:
+                    self._condition.wait()
+                if self._stopping:
+                    break
+                export_func = self._export_func
+                self._export_func = None
+            try:
+                stats = export_func(self.progress.emit, self._cancelled.is_set)
+                self.exported.emit(stats)
+            except Exception as e:
+                self.failed.emit(str(e))
+            finally:
+                with self._condition:
+                    self._busy = False
+                self.completed.emit()
+        if self._cleanup is not None:
+            self._cleanup()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FlowMark 大文件后台加载
+"""
+
+import threading
+
+from PyQt6.QtCore import QThread, pyqtSignal
+
+
+class FileLoader(QThread):
+    """大文件后台加载线程
+
+    在后台线程中流式读取并解码文件，逐块通过 chunk_loaded 信号交给
+    GUI 线程追加到文档。同一时刻最多只有 max_pending 个块在途，
+    GUI 线程每处理完一块调用 chunk_consumed，避免读取速度超过
+    插入速度时在内存中堆积整个文件。
+    """
+
+    # 读取到一块文本
+    chunk_loaded = pyqtSignal(str)
+    # 读取进度：百分比
+    progress = pyqtSignal(int)
+    # 读取失败：错误信息
+    failed = pyqtSignal(str)
+
+    def __init__(self, file_handler, file_path, max_pending=2, parent=None):
+        super().__init__(parent)
+        self.file_handler = file_handler
+        self.file_path = file_path
+        self._slots = threading.Semaphore(max_pending)
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        """取消加载"""
+        self._cancelled.set()
+        # 唤醒可能正在等待的读取线程
+        self._slots.release()
+
+    def is_cancelled(self):
+        """是否已取消"""
+        return self._cancelled.is_set()
+
+    def chunk_consumed(self):
+        """GUI 线程已处理完一块"""
+        self._slots.release()
+
+    def run(self):
+        try:
+            for loaded, total, text in self.file_handler.open_file_chunks(
+                self.file_path, cancelled=self._cancelled.is_set
+            ):
+                self._slots.acquire()
+                if self._cancelled.is_set():
+                    return
+                self.chunk_loaded.emit(text)
+                self.progress.emit(loaded * 100 // total)
+        except Exception as e:
+            self.failed.emit(str(e))
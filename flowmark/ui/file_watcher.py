@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FlowMark 外部修改监视
+"""
+
+import hashlib
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from PyQt6.QtCore import QFileSystemWatcher, QObject, QTimer, pyqtSignal
+
+
+def file_state(file_path):
+    """文件的 (大小, 修改时间)，文件不存在时返回 None"""
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        return None
+    return stat.st_size, stat.st_mtime_ns
+
+
+class FileWatcher(QObject):
+    """监视打开的文件被其他程序（git pull、同步客户端等）修改
+
+    基于 QFileSystemWatcher（Linux 上为 inotify）。一次写入往往触发多次
+    通知，收到通知后等待 debounce_ms 毫秒再检查；检查在后台线程中进行，
+    先比较大小和修改时间，变化时才读取文件并比较 SHA-1，内容确实不同
+    时才发出 changed。很多程序（包括 FlowMark 自己）通过替换文件来保存，
+    被替换的路径会从监视中移除，检查时重新加入。
+
+    FlowMark 自己保存文件之后调用 acknowledge 更新基准，不会被当作外部修改。
+    """
+
+    # 文件内容被外部修改：文件路径, 新内容
+    changed = pyqtSignal(str, str)
+    # 文件被删除或移走：文件路径
+    removed = pyqtSignal(str)
+    # 后台线程通知检查结果：文件路径, 新内容（None 表示文件已被删除）
+    _checked = pyqtSignal(str, object)
+
+    def __init__(self, debounce_ms=300, parent=None):
+        super().__init__(parent)
+        self._watcher = QFileSystemWatcher(self)
+        self._watcher.fileChanged.connect(self._on_file_changed)
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        # 正在监视的文件
+        self._paths = set()
+        self._pending = set()
+        # 文件路径 -> (大小, 修改时间, SHA-1)，文件不存在时为 None；
+        # 只在后台线程中读写，检查总是与最新的基准比较
+        self._baselines = {}
+
+        self._debounce_timer = QTimer(self)
+        self._debounce_timer.setSingleShot(True)
+        self._debounce_timer.setInterval(debounce_ms)
+        self._debounce_timer.timeout.connect(self._check_pending)
+
+        self._checked.connect(self._on_checked)
+
+    def files(self):
+        """正在监视的文件"""
+        return sorted(self._paths)
+
+    def set_files(self, file_paths):
+        """监视指定的文件，不在其中的文件停止监视"""
+        file_paths = {os.path.abspath(path) for path in file_paths if path}
+        for path in self._paths - file_paths:
+            self.unwatch(path)
+        for path in file_paths - self._paths:
+            self.watch(path)
+
+    def watch(self, file_path):
+        """开始监视文件，以当前内容为基准"""
+        path = os.path.abspath(file_path)
+        self._paths.add(path)
+        self.acknowledge(path)
+
+    def unwatch(self, file_path):
+        """停止监视文件"""
+        path = os.path.abspath(file_path)
+        self._paths.discard(path)
+        self._pending.discard(path)
+        if path in self._watcher.files():
+            self._watcher.removePath(path)
+        self._executor.submit(self._baselines.pop, path, None)
+
+    def acknowledge(self, file_path):
+        """以文件当前的内容为新的基准（例如自己保存之后）"""
+        path = os.path.abspath(file_path)
+        if path not in self._paths:
+            return
+        self._add_path(path)
+        self._executor.submit(self._read_baseline, path)
+
+    def recheck(self, file_path):
+        """重新检查文件，内容与基准相同也发出 changed
+
+        用于之前的通知没有被处理的情况（例如当时正在保存这个文件），
+        此时基准已经是通知时的内容，普通的检查不会再报告。
+        """
+        path = os.path.abspath(file_path)
+        if path not in self._paths:
+            return
+        self._add_path(path)
+        self._executor.submit(self._check, path, True)
+
+    def shutdown(self):
+        """停止监视并等待进行中的检查结束"""
+        self._debounce_timer.stop()
+        self._pending.clear()
+        self._paths.clear()
+        if self._watcher.files():
+            self._watcher.removePaths(self._watcher.files())
+        self._executor.shutdown(wait=True)
+
+    def _add_path(self, path):
+        if path not in self._watcher.files() and os.path.exists(path):
+            self._watcher.addPath(path)
+
+    def _on_file_changed(self, path):
+        if path in self._paths:
+            self._pending.add(path)
+            self._debounce_timer.start()
+
+    def _check_pending(self):
+        for path in self._pending:
+            self._add_path(path)
+            self._executor.submit(self._check, path)
+        self._pending.clear()
+
+    def _read_baseline(self, path):
+        """在后台线程中读取基准"""
+        state = file_state(path)
+        if state is not None:
+            try:
+                with open(path, "rb") as f:
+                    state += (hashlib.sha1(f.read()).digest(),)
+            except OSError:
+                state = None
+        self._baselines[path] = state
+
+    def _check(self, path, force=False):
+        """在后台线程中检查文件是否变化，force 为 True 时总是发出当前内容"""
+        baseline = self._baselines.get(path)
+        state = file_state(path)
+        if state is None:
+            self._baselines[path] = None
+            if baseline is not None:
+                self._checked.emit(path, None)
+            return
+        if not force and baseline is not None and state == baseline[:2]:
+            return
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return
+        state += (hashlib.sha1(data).digest(),)
+        self._baselines[path] = state
+        if not force and baseline is not None and state[2] == baseline[2]:
+            # 只是修改时间变了（例如 touch），内容相同
+            return
+        try:
+            # 与 FileHandler.open_file 一样按 UTF-8 解码并统一换行符
+            text = data.decode("utf-8").replace("\r\n", "\n").replace("\r", "\n")
+        except UnicodeDecodeError:
+            return
+        self._checked.emit(path, text)
+
+    def _on_checked(self, path, text):
+        if path not in self._paths:
+            # 检查期间已经停止监视
+            return
+        self._add_path(path)
+        if text is None:
+            self.removed.emit(path)
+        else:
+            self.changed.emit(path, text)
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FlowMark 修订历史对话框
+"""
+
+import time
+
+from PyQt6.QtCore import Qt
+from PyQt6.QtWidgets import (
+    QDialog, QDialogButtonBox, QLabel, QListWidget, QListWidgetItem, QPlainTextEdit, QSplitter, QVBoxLayout,
+)
+
+
+class HistoryDialog(QDialog):
+    """浏览修订历史并恢复到选中的修订
+
+    选中修订时才重建其全文（最多重放一组增量）；恢复后 selected_text
+    为选中修订的内容。
+    """
+
+    def __init__(self, history, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle("修订历史")
+        self.resize(900, 600)
+        self.history = history
+        self.selected_text = None
+        self._current_text = None
+
+        layout = QVBoxLayout(self)
+        splitter = QSplitter(Qt.Orientation.Horizontal)
+        self.revision_list = QListWidget()
+        splitter.addWidget(self.revision_list)
+        self.preview = QPlainTextEdit()
+        self.preview.setReadOnly(True)
+        splitter.addWidget(self.preview)
+        splitter.setSizes([260, 640])
+        layout.addWidget(splitter)
+        self.status_label = QLabel()
+        layout.addWidget(self.status_label)
+
+        buttons = QDialogButtonBox(QDialogButtonBox.StandardButton.Close)
+        self.restore_button = buttons.addButton("恢复此版本", QDialogButtonBox.ButtonRole.AcceptRole)
+        self.restore_button.setEnabled(False)
+        buttons.accepted.connect(self.restore)
+        buttons.rejected.connect(self.reject)
+        layout.addWidget(buttons)
+
+        revisions = history.revisions()
+        # 最新的修订在最上面
+        for revision_id, timestamp, length in reversed(revisions):
+            label = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(timestamp))
+            item = QListWidgetItem(f"{label}  ({length} 字符)")
+            item.setData(Qt.ItemDataRole.UserRole, revision_id)
+            self.revision_list.addItem(item)
+        self.status_label.setText(
+            f"共 {len(revisions)} 个修订，占用 {history.memory_size() / 1024:.0f} KB" if revisions
+            else "还没有修订，保存文件后会记录修订"
+        )
+        self.revision_list.currentItemChanged.connect(self._on_current_changed)
+
+    def _on_current_changed(self, item, previous):
+        if item is None:
+            self.restore_button.setEnabled(False)
+            return
+        try:
+            text = self.history.text(item.data(Qt.ItemDataRole.UserRole))
+        except (KeyError, OSError) as e:
+            self.preview.setPlainText(f"无法读取修订: {e}")
+            self.restore_button.setEnabled(False)
+            return
+        self._current_text = text
+        self.preview.setPlainText(text)
+        self.restore_button.setEnabled(True)
+
+    def restore(self):
+        """恢复到选中的修订"""
+        self.selected_text = self._current_text
+        self.accept()
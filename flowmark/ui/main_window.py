@@ -5,27 +5,76 @@
 FlowMark 主窗口类
 """
 
-from PyQt6.QtWidgets import QMainWindow, QWidget, QVBoxLayout, QSplitter, QStatusBar, QMenuBar, QMenu, QFileDialog, QMessageBox, QTabWidget, QToolBar
-from PyQt6.QtGui import QFont, QKeySequence, QAction
-from PyQt6.QtCore import Qt, QSettings
+import os
 
+from PyQt6.QtWidgets import QMainWindow, QWidget, QVBoxLayout, QSplitter, QStatusBar, QMenuBar, QMenu, QFileDialog, QMessageBox, QTabWidget, QTabBar, QToolBar, QProgressDialog, QLabel
+from PyQt6.QtGui import QFont, QKeySequence, QAction, QTextCursor
+from PyQt6.QtCore import Qt, QSettings, QTimer
+
+from flowmark.editor.heading_index import HeadingIndex
 from flowmark.editor.rich_editor import RichEditor
+from flowmark.editor.text_statistics import TextStatistics
+from flowmark.preview.image_cache import ImageCache
 from flowmark.preview.markdown_preview import MarkdownPreview
+from flowmark.preview.pdf_exporter import PdfExporter
+from flowmark.preview.preview_scheduler import PreviewScheduler
+from flowmark.preview.render_worker import RenderWorker
+from flowmark.preview.scroll_sync import ScrollSync
+from flowmark.preview.source_map import SourceMap
+from flowmark.preview.virtual_preview import VirtualPreview
+from flowmark.ui.autosave import DEFAULT_MAX_UNDO_STEPS, AutoSaver
+from flowmark.ui.clipboard import copy_markdown
+from flowmark.ui.document_pool import DocumentPool
+from flowmark.ui.export_worker import ExportWorker
+from flowmark.ui.file_loader import FileLoader
+from flowmark.ui.file_watcher import FileWatcher
+from flowmark.ui.history_dialog import HistoryDialog
+from flowmark.ui.outline_dock import OutlineDock
+from flowmark.ui.search_dock import SearchDock
+from flowmark.ui.workspace_indexer import WorkspaceIndexer
+from flowmark.ui.trace_overlay import TraceOverlay
+from flowmark.utils.tracing import tracer, traced
 from flowmark.utils.file_handler import FileHandler
+from flowmark.utils.html_exporter import HtmlExporter
 from flowmark.utils.markdown_converter import MarkdownConverter
+from flowmark.utils.revision_history import text_delta
+from flowmark.utils.search_index import SearchIndex
 
 class MainWindow(QMainWindow):
     """主窗口类"""
     
+    # 超过该字符数的文档在渲染预览中只排版可见区域（虚拟化预览）
+    VIRTUAL_PREVIEW_CHARS = 256 * 1024
+    
     def __init__(self):
         super().__init__()
-        self.init_ui()
-        self.init_settings()
-        self.init_shortcuts()
         
         # 初始化工具类
         self.file_handler = FileHandler()
         self.markdown_converter = MarkdownConverter()
+        # 图片缓存及其线程池在预览第一次加载图片时才创建
+        self._image_cache = None
+        
+        # 导出在同一个后台线程中依次执行，PDF 排版缓存在该线程中复用
+        self.pdf_exporter = PdfExporter(self.markdown_converter)
+        self.export_worker = ExportWorker(self.pdf_exporter.clear_cache, self)
+        
+        # 监视打开的文件被其他程序修改
+        self.file_watcher = FileWatcher(parent=self)
+        self.file_watcher.changed.connect(self.on_external_change)
+        self.file_watcher.removed.connect(self.on_external_remove)
+        # 自己正在保存时收到的外部修改，保存结束后重新检查
+        self.deferred_external_changes = set()
+        # 选择保存后等待后台保存完成才关闭的文档
+        self.closing_documents = set()
+        
+        self.init_ui()
+        self.init_settings()
+        self.init_shortcuts()
+        
+        # 打开一个未命名文档，并检查上次异常退出时遗留的内容
+        self.add_document()
+        QTimer.singleShot(0, self.check_recovery)
         
     def init_ui(self):
         """初始化界面"""
@@ -47,28 +96,91 @@ class MainWindow(QMainWindow):
         self.splitter = QSplitter(Qt.Orientation.Horizontal)
         main_layout.addWidget(self.splitter)
         
-        # 富文本编辑器
-        self.editor = RichEditor()
-        self.editor.textChanged.connect(self.update_preview)
-        self.splitter.addWidget(self.editor)
+        # 预览调度器
+        self.preview_scheduler = PreviewScheduler(self.render_preview_target, parent=self)
+        
+        # 后台渲染线程，Markdown 转换不占用 GUI 线程
+        self.render_worker = RenderWorker(self.render_document, self)
+        self.render_worker.rendered.connect(self.apply_rendered_html)
         
-        # 预览标签页
+        # 富文本编辑器，多个文档共用一个编辑器，切换标签页时切换文档
+        self.editor = RichEditor()
+        self.editor.textChanged.connect(self.on_text_changed)
+        self.editor.paste_started.connect(self.on_paste_started)
+        self.editor.paste_finished.connect(self.on_paste_finished)
+        
+        # 文档标签页，非活动文档由文档池按内存预算换出
+        self.document_pool = DocumentPool(self.file_handler, self.editor.prepare_document, parent=self)
+        self.tab_bar = QTabBar()
+        self.tab_bar.setTabsClosable(True)
+        self.tab_bar.setMovable(True)
+        self.tab_bar.setDocumentMode(True)
+        self.tab_bar.setExpanding(False)
+        self.tab_bar.currentChanged.connect(self.on_tab_changed)
+        self.tab_bar.tabCloseRequested.connect(
+            lambda index: self.close_document(self.tab_bar.tabData(index))
+        )
+        editor_page = QWidget()
+        editor_layout = QVBoxLayout(editor_page)
+        editor_layout.setContentsMargins(0, 0, 0, 0)
+        editor_layout.setSpacing(0)
+        editor_layout.addWidget(self.tab_bar)
+        editor_layout.addWidget(self.editor)
+        self.splitter.addWidget(editor_page)
+        
+        # 增量文本统计（以下跟踪器在切换文档时重新绑定）
+        self.text_statistics = TextStatistics(self)
+        
+        # 标题索引与大纲面板
+        self.heading_index = HeadingIndex(self)
+        self.outline_dock = OutlineDock(self.heading_index, self)
+        self.outline_dock.heading_activated.connect(self.jump_to_heading)
+        self.addDockWidget(Qt.DockWidgetArea.LeftDockWidgetArea, self.outline_dock)
+        
+        # 工作区全文搜索，打开工作区后才创建索引
+        self.search_index = None
+        self.workspace_indexer = None
+        self.search_dock = SearchDock(self)
+        self.search_dock.result_activated.connect(self.open_search_result)
+        self.addDockWidget(Qt.DockWidgetArea.LeftDockWidgetArea, self.search_dock)
+        self.tabifyDockWidget(self.outline_dock, self.search_dock)
+        self.search_dock.hide()
+        
+        # 源文本行号与渲染预览位置的索引，用于滚动同步和点击跳转
+        self.source_map = SourceMap(self)
+        self.scroll_sync = ScrollSync(self.editor, self.source_map, self)
+        self._render_mark = 0
+        
+        # 预览标签页，预览控件在第一次渲染时才创建
         self.preview_tab = QTabWidget()
+        self._previews = {}
+        self._virtual_preview = None
+        self._preview_style = ""
         
         # Markdown 源码预览
-        self.md_preview = MarkdownPreview()
-        self.preview_tab.addTab(self.md_preview, "Markdown 源码")
+        self.md_page = self.create_preview_page()
+        self.preview_tab.addTab(self.md_page, "Markdown 源码")
         
         # 渲染预览
-        self.render_preview = MarkdownPreview()
-        self.render_preview.set_render_mode(True)
-        self.preview_tab.addTab(self.render_preview, "渲染预览")
+        self.render_page = self.create_preview_page()
+        self.preview_tab.addTab(self.render_page, "渲染预览")
+        
+        self.preview_scheduler.register(self.md_page)
+        self.preview_scheduler.register(self.render_page)
+        self.preview_scheduler.set_visible(self.preview_tab.currentWidget())
+        self.preview_tab.currentChanged.connect(
+            lambda index: self.preview_scheduler.set_visible(self.preview_tab.widget(index))
+        )
         
         self.splitter.addWidget(self.preview_tab)
         
         # 状态栏
         self.status_bar = QStatusBar()
         self.setStatusBar(self.status_bar)
+        self.status_label = QLabel()
+        self.status_bar.addPermanentWidget(self.status_label)
+        self.trace_overlay = TraceOverlay()
+        self.status_bar.addWidget(self.trace_overlay)
         self.update_status()
         
         # 菜单栏
@@ -93,6 +205,46 @@ class MainWindow(QMainWindow):
         font = QFont(font_family, font_size)
         self.editor.setFont(font)
         
+        # 加载预览调度设置
+        debounce_ms = int(self.settings.value("preview/debounce_ms", 150))
+        max_delay_ms = int(self.settings.value("preview/max_delay_ms", 1000))
+        self.preview_scheduler.set_intervals(debounce_ms, max_delay_ms)
+        self.virtual_preview_chars = int(
+            self.settings.value("preview/virtual_threshold", self.VIRTUAL_PREVIEW_CHARS)
+        )
+        self.sync_scroll_action.setChecked(self.settings.value("preview/sync_scroll", True, type=bool))
+        
+        # 加载导出设置
+        self.embed_assets_action.setChecked(self.settings.value("export/self_contained", True, type=bool))
+        self.embed_assets_action.toggled.connect(
+            lambda checked: self.settings.setValue("export/self_contained", checked)
+        )
+        
+        # 加载 Markdown 扩展设置（逗号分隔）
+        extensions = self.settings.value("markdown/extensions")
+        if extensions is not None:
+            self.markdown_converter.set_extensions(
+                [name.strip() for name in str(extensions).split(",") if name.strip()]
+            )
+        
+        # 加载自动保存设置
+        self.autosave_idle_ms = int(self.settings.value("autosave/idle_ms", 3000))
+        
+        # 加载修订历史设置：每个文档的历史内存上限和撤销步数上限（0 表示不限制）
+        self.history_bytes = int(self.settings.value("history/memory_mb", 16)) * 1024 * 1024
+        self.max_undo_steps = int(self.settings.value("history/max_undo_steps", DEFAULT_MAX_UNDO_STEPS))
+        
+        # 加载文档池的内存预算
+        self.document_pool.set_limits(
+            int(self.settings.value("documents/memory_mb", 128)) * 1024 * 1024,
+            int(self.settings.value("documents/max_resident", 8)),
+        )
+        
+        # 恢复上次打开的工作区，索引在窗口显示后于后台增量更新
+        workspace = self.settings.value("workspace/root")
+        if workspace and os.path.isdir(str(workspace)):
+            QTimer.singleShot(0, lambda: self.open_workspace(str(workspace), show=False))
+        
     def init_shortcuts(self):
         """初始化快捷键"""
         # 粗体
@@ -140,6 +292,29 @@ class MainWindow(QMainWindow):
         save_as_action.triggered.connect(self.save_as_file)
         file_menu.addAction(save_as_action)
         
+        history_action = QAction("修订历史...", self)
+        history_action.triggered.connect(self.show_history)
+        file_menu.addAction(history_action)
+        
+        close_action = QAction("关闭标签页", self)
+        close_action.setShortcut("Ctrl+W")
+        close_action.triggered.connect(lambda: self.close_document(self.document_pool.current))
+        file_menu.addAction(close_action)
+        
+        # 会切换或替换当前文档的操作，分块粘贴期间禁用
+        self.document_actions = [new_action, open_action, history_action, close_action]
+        
+        file_menu.addSeparator()
+        
+        workspace_action = QAction("打开工作区...", self)
+        workspace_action.triggered.connect(self.choose_workspace)
+        file_menu.addAction(workspace_action)
+        
+        search_action = QAction("搜索工作区", self)
+        search_action.setShortcut("Ctrl+Shift+F")
+        search_action.triggered.connect(self.search_dock.focus_query)
+        file_menu.addAction(search_action)
+        
         file_menu.addSeparator()
         
         export_menu = file_menu.addMenu("导出")
@@ -148,14 +323,21 @@ class MainWindow(QMainWindow):
         export_md_action.triggered.connect(self.export_md)
         export_menu.addAction(export_md_action)
         
+        # 被追踪的方法通过 lambda 连接，triggered 的 checked 参数不会传给它们
         export_html_action = QAction("导出为 HTML", self)
-        export_html_action.triggered.connect(self.export_html)
+        export_html_action.triggered.connect(lambda: self.export_html())
         export_menu.addAction(export_html_action)
         
         export_pdf_action = QAction("导出为 PDF", self)
-        export_pdf_action.triggered.connect(self.export_pdf)
+        export_pdf_action.triggered.connect(lambda: self.export_pdf())
         export_menu.addAction(export_pdf_action)
         
+        export_menu.addSeparator()
+        
+        self.embed_assets_action = QAction("导出 HTML 时内嵌样式和图片", self)
+        self.embed_assets_action.setCheckable(True)
+        export_menu.addAction(self.embed_assets_action)
+        
         file_menu.addSeparator()
         
         exit_action = QAction("退出", self)
@@ -168,7 +350,7 @@ class MainWindow(QMainWindow):
         
         copy_md_action = QAction("复制为 Markdown", self)
         copy_md_action.setShortcut("Ctrl+Shift+C")
-        copy_md_action.triggered.connect(self.copy_as_markdown)
+        copy_md_action.triggered.connect(lambda: self.copy_as_markdown())
         edit_menu.addAction(copy_md_action)
         
         # 视图菜单
@@ -184,6 +366,28 @@ class MainWindow(QMainWindow):
         dark_theme_action.triggered.connect(lambda: self.set_theme("dark"))
         theme_menu.addAction(dark_theme_action)
         
+        view_menu.addSeparator()
+        
+        view_menu.addAction(self.outline_dock.toggleViewAction())
+        view_menu.addAction(self.search_dock.toggleViewAction())
+        
+        self.sync_scroll_action = QAction("同步滚动", self)
+        self.sync_scroll_action.setCheckable(True)
+        self.sync_scroll_action.setChecked(True)
+        self.sync_scroll_action.toggled.connect(self.set_scroll_sync)
+        view_menu.addAction(self.sync_scroll_action)
+        
+        trace_action = QAction("性能追踪", self)
+        trace_action.setCheckable(True)
+        trace_action.setChecked(tracer.enabled)
+        trace_action.toggled.connect(self.set_tracing)
+        view_menu.addAction(trace_action)
+        self.trace_overlay.set_active(tracer.enabled)
+        
+        export_trace_action = QAction("导出性能追踪...", self)
+        export_trace_action.triggered.connect(self.export_trace)
+        view_menu.addAction(export_trace_action)
+        
     def create_toolbar(self):
         """创建工具栏"""
         # 标题按钮
@@ -245,39 +449,391 @@ class MainWindow(QMainWindow):
         hr_action.triggered.connect(self.editor.insert_horizontal_rule)
         self.toolbar.addAction(hr_action)
         
-    def update_preview(self):
-        """更新预览"""
-        text = self.editor.to_plain_text()
-        md_text = self.markdown_converter.to_markdown(text)
-        
-        self.md_preview.set_content(md_text)
-        self.render_preview.set_content(md_text)
-        
+    @traced("MainWindow.on_text_changed")
+    def on_text_changed(self):
+        """编辑内容变化"""
+        # 分块粘贴期间只标记预览过期，粘贴结束后统一更新
+        if not self.editor.is_pasting():
+            self.update_status()
+        self.preview_scheduler.schedule()
+        
+    def on_paste_started(self):
+        """开始分块粘贴大段文本：暂停预览，期间不能切换、打开或关闭文档"""
+        self.set_document_switching_enabled(False)
+        self.preview_scheduler.suspend()
+        self.status_bar.showMessage("正在粘贴...")
+        
+    def on_paste_finished(self):
+        """分块粘贴结束：合并更新状态栏和预览"""
+        self.set_document_switching_enabled(True)
+        self.status_bar.clearMessage()
         self.update_status()
+        self.preview_scheduler.resume()
         
+    def set_document_switching_enabled(self, enabled):
+        """启用或禁用标签栏、搜索结果和新建、打开、关闭等切换文档的操作"""
+        self.tab_bar.setEnabled(enabled)
+        self.search_dock.setEnabled(enabled)
+        for action in self.document_actions:
+            action.setEnabled(enabled)
+        
+    @traced("MainWindow.update_preview")
+    def update_preview(self):
+        """立即更新预览"""
+        self.preview_scheduler.schedule()
+        self.preview_scheduler.flush()
+        
+    def create_preview_page(self):
+        """创建预览标签页的容器"""
+        page = QWidget()
+        layout = QVBoxLayout(page)
+        layout.setContentsMargins(0, 0, 0, 0)
+        return page
+        
+    def preview_for(self, page):
+        """获取标签页中的预览控件，第一次使用时创建"""
+        preview = self._previews.get(page)
+        if preview is None:
+            preview = MarkdownPreview()
+            preview.set_render_mode(page is self.render_page)
+            preview.setStyleSheet(self._preview_style)
+            if page is self.render_page:
+                preview.set_image_cache(self.image_cache, self.document_directory)
+            page.layout().addWidget(preview)
+            self._previews[page] = preview
+        return preview
+        
+    @property
+    def md_preview(self):
+        """Markdown 源码预览"""
+        return self.preview_for(self.md_page)
+        
+    @property
+    def render_preview(self):
+        """渲染预览"""
+        return self.preview_for(self.render_page)
+        
+    @property
+    def virtual_preview(self):
+        """大文档使用的虚拟化渲染预览，第一次使用时创建"""
+        if self._virtual_preview is None:
+            self._virtual_preview = VirtualPreview()
+            self._virtual_preview.setStyleSheet(self._preview_style)
+            self._virtual_preview.set_image_cache(self.image_cache, self.document_directory)
+            self._virtual_preview.hide()
+            self.render_page.layout().addWidget(self._virtual_preview)
+        return self._virtual_preview
+        
+    def image_cache(self):
+        """预览共用的图片缓存，第一次使用时创建"""
+        if self._image_cache is None:
+            self._image_cache = ImageCache(parent=self)
+        return self._image_cache
+        
+    def document_directory(self):
+        """当前文档所在的目录，用于解析相对图片路径；未命名文档返回 None"""
+        file_path = self.autosaver.file_path
+        return os.path.dirname(os.path.abspath(file_path)) if file_path else None
+        
+    def render_document(self, text):
+        """渲染整篇文档（在后台线程中调用）
+        
+        返回 (结果, 是否使用虚拟化预览)。可以逐块渲染时结果为 RenderedBlock
+        列表，用于建立滚动同步的索引，大文档交给虚拟化预览只排版可见部分；
+        否则结果为完整的 HTML。
+        """
+        if self.markdown_converter.is_block_safe():
+            blocks = self.markdown_converter.to_html_blocks(text)
+            return blocks, len(text) >= self.virtual_preview_chars
+        return self.markdown_converter.to_html(text), False
+        
+    @traced("MainWindow.render_preview_target")
+    def render_preview_target(self, page):
+        """渲染指定的预览页"""
+        md_text = self.markdown_converter.to_markdown(self.editor.document())
+        if page is self.render_page:
+            # 渲染预览交给后台线程做增量块级渲染，完成后再应用
+            self._render_mark = self.source_map.mark()
+            self.render_worker.submit(md_text)
+        else:
+            self.md_preview.set_content(md_text)
+        
+    @traced("MainWindow.apply_rendered_html")
+    def apply_rendered_html(self, generation, result):
+        """应用后台渲染结果，过期的结果直接丢弃"""
+        if not self.render_worker.is_current(generation):
+            self.render_worker.drop()
+            return
+        content, virtual = result
+        blocks = content if isinstance(content, list) else []
+        self.source_map.set_blocks(blocks, self._render_mark)
+        if virtual:
+            # 大文档显示在虚拟化预览中，普通预览清空以释放排版内存
+            preview = self.virtual_preview
+            page_preview = self._previews.get(self.render_page)
+            if page_preview is not None:
+                page_preview.clear()
+                page_preview.hide()
+            preview.set_blocks(blocks)
+        else:
+            preview = self.render_preview
+            if self._virtual_preview is not None:
+                self._virtual_preview.clear()
+                self._virtual_preview.hide()
+            if blocks:
+                preview.set_blocks(blocks)
+            else:
+                preview.set_html(content)
+        preview.show()
+        self.scroll_sync.set_preview(preview)
+        self.scroll_sync.sync_from_editor()
+        
+    def render_stats(self):
+        """获取预览渲染统计（调度次数、渲染队列深度、丢弃的任务数）"""
+        stats = self.preview_scheduler.stats()
+        stats.update(self.render_worker.metrics())
+        return stats
+        
+    @traced("MainWindow.update_status")
     def update_status(self):
         """更新状态栏"""
-        text = self.editor.to_plain_text()
-        words = len(text.split())
-        lines = text.count('\n') + 1
-        self.status_bar.showMessage(f"字数: {words}, 行数: {lines}")
+        stats = self.text_statistics
+        self.status_label.setText(
+            f"字数: {stats.words}, 行数: {stats.lines}, 字符: {stats.chars}, 中日文字符: {stats.cjk_chars}"
+        )
+        
+    def jump_to_heading(self, index):
+        """跳转到第 index 个标题，并把它滚动到编辑器顶部"""
+        if index < len(self.heading_index):
+            self.jump_to_line(self.heading_index.line_of(index))
+        
+    def jump_to_line(self, line):
+        """把光标移到指定行，并把该行滚动到编辑器顶部"""
+        document = self.editor.document()
+        block = document.findBlockByNumber(line)
+        if not block.isValid():
+            return
+        self.editor.setTextCursor(QTextCursor(block))
+        top = document.documentLayout().blockBoundingRect(block).top()
+        self.editor.verticalScrollBar().setValue(int(top))
+        self.editor.setFocus()
+        
+    def set_scroll_sync(self, enabled):
+        """打开或关闭编辑器与渲染预览的滚动同步"""
+        self.scroll_sync.enabled = enabled
+        self.settings.setValue("preview/sync_scroll", enabled)
+        if enabled:
+            self.scroll_sync.sync_from_editor()
+        
+    def set_tracing(self, enabled):
+        """打开或关闭性能追踪"""
+        tracer.enabled = enabled
+        self.trace_overlay.set_active(enabled)
+        
+    def export_trace(self):
+        """导出 Chrome Trace 格式的性能追踪数据"""
+        file_dialog = QFileDialog()
+        file_path, _ = file_dialog.getSaveFileName(self, "导出性能追踪", "flowmark-trace.json", "JSON Files (*.json);;All Files (*)")
+        
+        if file_path:
+            try:
+                tracer.dump_chrome_trace(file_path)
+            except Exception as e:
+                QMessageBox.critical(self, "错误", f"导出性能追踪失败: {str(e)}")
         
     def set_theme(self, theme):
         """设置主题"""
         if theme == "dark":
             # 简化处理，实际需要更复杂的样式设置
-            self.editor.setStyleSheet("background-color: #333; color: #fff;")
-            self.md_preview.setStyleSheet("background-color: #333; color: #fff;")
-            self.render_preview.setStyleSheet("background-color: #333; color: #fff;")
+            self._preview_style = "background-color: #333; color: #fff;"
         else:
-            self.editor.setStyleSheet("")
-            self.md_preview.setStyleSheet("")
-            self.render_preview.setStyleSheet("")
+            self._preview_style = ""
+        self.editor.setStyleSheet(self._preview_style)
+        # 尚未创建的预览控件在创建时应用主题
+        for preview in self._previews.values():
+            preview.setStyleSheet(self._preview_style)
+        if self._virtual_preview is not None:
+            self._virtual_preview.setStyleSheet(self._preview_style)
+        
+    @property
+    def autosaver(self):
+        """当前文档的 AutoSaver"""
+        return self.document_pool.current.autosaver
+        
+    def add_document(self, text="", file_path=None):
+        """在新标签页中打开文档并切换过去"""
+        entry = self.document_pool.create(text, file_path)
+        entry.autosaver.set_idle_interval(self.autosave_idle_ms)
+        entry.autosaver.set_history_limits(self.history_bytes, self.max_undo_steps)
+        entry.autosaver.saved.connect(self.on_saved)
+        entry.autosaver.save_failed.connect(
+            lambda path, error: QMessageBox.critical(self, "错误", f"保存文件失败: {error}")
+        )
+        entry.autosaver.save_failed.connect(lambda path, error: self.recheck_external_change(path))
+        index = self.tab_bar.addTab(entry.title)
+        self.tab_bar.setTabData(index, entry)
+        # 标签栏为空时 addTab 在设置数据之前就发出 currentChanged，这里确保已激活
+        self.activate_document(entry)
+        return entry
+        
+    def open_blank_document(self):
+        """切换到空白的未命名文档：当前文档为空白时直接使用，否则新建标签页"""
+        current = self.document_pool.current
+        if current is None or not current.is_blank():
+            self.add_document()
+        
+    def tab_index(self, entry):
+        """文档所在的标签页序号"""
+        for index in range(self.tab_bar.count()):
+            if self.tab_bar.tabData(index) is entry:
+                return index
+        return -1
+        
+    def on_tab_changed(self, index):
+        """切换标签页"""
+        entry = self.tab_bar.tabData(index) if index >= 0 else None
+        if entry is not None:
+            self.activate_document(entry)
+        
+    @traced("MainWindow.activate_document")
+    def activate_document(self, entry):
+        """切换到指定文档，被换出的文档在这里重新载入"""
+        previous = self.document_pool.current
+        if previous is entry and entry.is_resident:
+            return
+        if previous is not None and previous.is_resident:
+            previous.save_view(self.editor)
+            previous.document.modificationChanged.disconnect(self.on_modification_changed)
+        document = self.document_pool.activate(entry)
+        # 先把跟踪器切换到新文档，再交给编辑器
+        self.text_statistics.set_document(document)
+        self.heading_index.set_document(document)
+        self.source_map.set_document(document)
+        self.editor.set_document(document)
+        entry.restore_view(self.editor)
+        document.modificationChanged.connect(self.on_modification_changed)
+        self.setWindowModified(document.isModified())
+        index = self.tab_index(entry)
+        if index != self.tab_bar.currentIndex():
+            self.tab_bar.blockSignals(True)
+            self.tab_bar.setCurrentIndex(index)
+            self.tab_bar.blockSignals(False)
+        self.update_title()
+        self.update_preview()
+        
+    def close_document(self, entry):
+        """关闭文档，有未保存的修改时先询问；返回是否已关闭
+
+        选择保存时在后台保存，保存完成后才关闭标签页（此时返回 False）。
+        """
+        if entry is None or not self.tab_bar.isEnabled() or entry in self.closing_documents:
+            return False
+        discard = False
+        if entry.is_modified():
+            reply = QMessageBox.question(
+                self, "关闭", f"“{entry.title}”有未保存的修改，是否保存？",
+                QMessageBox.StandardButton.Save | QMessageBox.StandardButton.Discard
+                | QMessageBox.StandardButton.Cancel,
+            )
+            if reply == QMessageBox.StandardButton.Cancel:
+                return False
+            if reply == QMessageBox.StandardButton.Save:
+                file_path = entry.file_path
+                if not file_path:
+                    file_path, _ = QFileDialog.getSaveFileName(self, "保存文件", "", "Markdown Files (*.md);;All Files (*)")
+                    if not file_path:
+                        return False
+                self.save_and_close(entry, file_path)
+                return False
+            discard = True
+        
+        self.remove_document(entry, discard)
+        return True
+        
+    def save_and_close(self, entry, file_path):
+        """通过文档的 AutoSaver 在后台保存，保存成功后关闭标签页
+
+        保存失败，或保存期间又有新的修改时保留标签页。
+        """
+        # 换出的文档先载入，保存与平时一样序列化格式并记录修订
+        self.document_pool.load(entry)
+        autosaver = entry.autosaver
+        self.closing_documents.add(entry)
+        
+        def finish():
+            autosaver.saved.disconnect(on_saved)
+            autosaver.save_failed.disconnect(on_failed)
+            self.closing_documents.discard(entry)
+        
+        def on_saved(path):
+            finish()
+            if entry in self.document_pool.documents() and not entry.is_modified():
+                self.remove_document(entry, True)
+        
+        def on_failed(path, error):
+            finish()
+        
+        autosaver.saved.connect(on_saved)
+        autosaver.save_failed.connect(on_failed)
+        if not autosaver.save(file_path):
+            finish()
+        
+    def remove_document(self, entry, discard=False):
+        """移除文档的标签页并从文档池中关闭，discard 为 True 时删除其编辑日志"""
+        index = self.tab_index(entry)
+        if self.tab_bar.count() == 1:
+            # 始终保留一个标签页
+            self.add_document()
+        elif entry is self.document_pool.current:
+            self.tab_bar.setCurrentIndex(index + 1 if index + 1 < self.tab_bar.count() else index - 1)
+        self.tab_bar.removeTab(self.tab_index(entry))
+        self.document_pool.close(entry, discard)
+        self.update_watched_files()
+        
+    def on_modification_changed(self, modified):
+        """当前文档的修改状态变化"""
+        self.setWindowModified(modified)
+        self.update_tab(self.document_pool.current)
+        
+    def update_tab(self, entry):
+        """更新标签页上的名称和修改标记"""
+        index = self.tab_index(entry)
+        if index >= 0:
+            self.tab_bar.setTabText(index, entry.title + ("*" if entry.is_modified() else ""))
+            self.tab_bar.setTabToolTip(index, entry.file_path or "")
+        
+    def update_watched_files(self):
+        """监视所有打开的文件"""
+        self.file_watcher.set_files(entry.file_path for entry in self.document_pool.documents())
+        
+    def update_title(self):
+        """更新窗口标题"""
+        entry = self.document_pool.current
+        self.setWindowTitle(f"{entry.title}[*] - FlowMark")
+        self.update_tab(entry)
+        
+    def check_recovery(self):
+        """恢复上次异常退出时未保存的未命名文档，每个文档一个标签页"""
+        recovered = AutoSaver.recover_untitled()
+        if not recovered:
+            return
+        if self.ask_recover():
+            for journal_path, text in recovered:
+                self.open_blank_document()
+                self.editor.set_plain_text(text)
+            self.update_preview()
+        # 无论是否恢复，用户作出选择之后才删除遗留的日志
+        AutoSaver.discard_untitled(journal_path for journal_path, text in recovered)
+        
+    def ask_recover(self):
+        """询问是否恢复未保存的修改"""
+        reply = QMessageBox.question(self, "恢复", "检测到上次未保存的修改，是否恢复？")
+        return reply == QMessageBox.StandardButton.Yes
         
     def new_file(self):
         """新建文件"""
-        self.editor.clear()
-        self.update_preview()
+        self.open_blank_document()
+        self.editor.setFocus()
         
     def open_file(self):
         """打开文件"""
@@ -285,17 +841,98 @@ class MainWindow(QMainWindow):
         file_path, _ = file_dialog.getOpenFileName(self, "打开文件", "", "Markdown Files (*.md);;All Files (*)")
         
         if file_path:
-            try:
-                content = self.file_handler.open_file(file_path)
-                self.editor.set_plain_text(content)
-                self.update_preview()
-            except Exception as e:
-                QMessageBox.critical(self, "错误", f"打开文件失败: {str(e)}")
+            self.load_file(file_path)
+        
+    def load_file(self, file_path):
+        """加载文件到编辑器，已打开的文件直接切换到其标签页"""
+        entry = self.document_pool.find(file_path)
+        if entry is not None:
+            self.activate_document(entry)
+            return
+        try:
+            if self.file_handler.is_large_file(file_path):
+                self.load_file_streaming(file_path)
+                return
+            content = self.file_handler.open_file(file_path)
+            recovered = AutoSaver.recover(file_path, content)
+            self.open_blank_document()
+            self.autosaver.detach()
+            self.editor.set_plain_text(content)
+            self.autosaver.attach(self.editor.document(), file_path)
+            if recovered is not None and self.ask_recover():
+                self.editor.set_plain_text(recovered)
+            self.update_title()
+            self.update_preview()
+            self.update_watched_files()
+            self.document_pool.trim()
+        except Exception as e:
+            QMessageBox.critical(self, "错误", f"打开文件失败: {str(e)}")
+        
+    def load_file_streaming(self, file_path):
+        """在后台流式加载大文件，逐块填充文档"""
+        self.open_blank_document()
+        # 加载期间不能切换或关闭标签页
+        self.tab_bar.setEnabled(False)
+        self.autosaver.detach()
+        self.editor.clear()
+        self.editor.setReadOnly(True)
+        document = self.editor.document()
+        # 加载期间不记录撤销，避免撤销栈再持有一份全文
+        document.setUndoRedoEnabled(False)
+        self.preview_scheduler.suspend()
+        
+        progress = QProgressDialog("正在打开文件...", "取消", 0, 100, self)
+        progress.setWindowTitle("打开文件")
+        progress.setWindowModality(Qt.WindowModality.WindowModal)
+        progress.setMinimumDuration(300)
+        
+        loader = FileLoader(self.file_handler, file_path, parent=self)
+        cursor = QTextCursor(document)
+        
+        def append_chunk(text):
+            if not loader.is_cancelled():
+                cursor.movePosition(QTextCursor.MoveOperation.End)
+                cursor.insertText(text)
+            loader.chunk_consumed()
+        
+        def on_failed(message):
+            loader.cancel()
+            QMessageBox.critical(self, "错误", f"打开文件失败: {message}")
+        
+        def on_finished():
+            cancelled = loader.is_cancelled()
+            # 关闭对话框会触发 canceled 信号，先断开
+            progress.canceled.disconnect(loader.cancel)
+            progress.close()
+            if cancelled:
+                # 不保留只加载了一部分的内容，避免误保存
+                self.editor.clear()
+            else:
+                self.file_handler.add_recent_file(file_path)
+            self.autosaver.attach(document, None if cancelled else file_path)
+            self.update_title()
+            self.update_watched_files()
+            document.setUndoRedoEnabled(True)
+            self.editor.setReadOnly(False)
+            self.editor.moveCursor(QTextCursor.MoveOperation.Start)
+            self.tab_bar.setEnabled(True)
+            self.preview_scheduler.resume()
+            self.document_pool.trim()
+            loader.deleteLater()
+        
+        loader.chunk_loaded.connect(append_chunk)
+        loader.progress.connect(progress.setValue)
+        loader.failed.connect(on_failed)
+        loader.finished.connect(on_finished)
+        progress.canceled.connect(loader.cancel)
+        loader.start()
         
     def save_file(self):
         """保存文件"""
-        # 这里简化处理，实际需要检查文件是否已保存过
-        self.save_as_file()
+        # 已有路径时直接在后台保存，否则走另存为
+        # 手动保存成功后按设置清空过长的撤销栈
+        if not self.autosaver.save(trim_undo=True):
+            self.save_as_file()
         
     def save_as_file(self):
         """另存为文件"""
@@ -303,46 +940,272 @@ class MainWindow(QMainWindow):
         file_path, _ = file_dialog.getSaveFileName(self, "保存文件", "", "Markdown Files (*.md);;All Files (*)")
         
         if file_path:
-            try:
-                content = self.editor.to_plain_text()
-                self.file_handler.save_file(file_path, content)
-                QMessageBox.information(self, "成功", "文件保存成功")
-            except Exception as e:
-                QMessageBox.critical(self, "错误", f"保存文件失败: {str(e)}")
+            self.autosaver.save(file_path, trim_undo=True)
+        
+    def show_history(self):
+        """浏览当前文档的修订历史，恢复时作为一次可撤销的编辑"""
+        if self.editor.isReadOnly():
+            return
+        dialog = HistoryDialog(self.autosaver.history, self)
+        if dialog.exec() != HistoryDialog.DialogCode.Accepted or dialog.selected_text is None:
+            return
+        current = self.editor.to_plain_text()
+        start, end, inserted = text_delta(current, dialog.selected_text)
+        if start == end and not inserted:
+            return
+        # 只替换变化的部分，QTextDocument 的位置以 UTF-16 代码单元计
+        prefix = len(current[:start].encode("utf-16-le")) // 2
+        cursor = QTextCursor(self.editor.document())
+        cursor.setPosition(prefix)
+        cursor.setPosition(prefix + len(current[start:end].encode("utf-16-le")) // 2, QTextCursor.MoveMode.KeepAnchor)
+        cursor.insertText(inserted)
+        self.editor.setTextCursor(cursor)
+        
+    def on_external_change(self, file_path, text):
+        """打开的文件被其他程序修改：只更新变化的块，保留撤销历史和滚动位置"""
+        entry = self.document_pool.find(file_path)
+        if entry is None:
+            return
+        if entry.autosaver.is_saving():
+            # 保存完成后再检查一次：此时磁盘上可能是外部修改，也可能是刚保存的内容
+            self.deferred_external_changes.add(os.path.abspath(file_path))
+            return
+        if entry.is_resident:
+            current_text = self.markdown_converter.to_markdown(entry.document)
+        else:
+            current_text = entry.text()
+        if current_text == text:
+            return
+        if entry.is_modified():
+            reply = QMessageBox.question(
+                self, "文件已修改", f"“{entry.title}”已被其他程序修改，是否放弃未保存的修改并重新加载？"
+            )
+            if reply != QMessageBox.StandardButton.Yes:
+                return
+        current = entry is self.document_pool.current
+        if current:
+            entry.save_view(self.editor)
+        # 编辑器的光标随编辑自动调整，只恢复滚动位置
+        entry.reload(text)
+        if current:
+            entry.restore_scroll(self.editor)
+        self.update_tab(entry)
+        self.status_bar.showMessage(f"已重新加载: {file_path}", 3000)
+        
+    def recheck_external_change(self, file_path):
+        """保存结束后重新检查保存期间被推迟处理的外部修改"""
+        file_path = os.path.abspath(file_path)
+        if file_path in self.deferred_external_changes:
+            self.deferred_external_changes.discard(file_path)
+            self.file_watcher.recheck(file_path)
+        
+    def on_external_remove(self, file_path):
+        """打开的文件被删除或移走：标记为未保存，保存时重新写入"""
+        entry = self.document_pool.find(file_path)
+        if entry is None:
+            return
+        if entry.is_resident:
+            entry.document.setModified(True)
+        else:
+            entry.modified = True
+        self.update_tab(entry)
+        self.status_bar.showMessage(f"文件已被删除或移走: {file_path}", 5000)
+        
+    def on_saved(self, file_path):
+        """后台保存完成（可能是非活动标签页的自动保存）"""
+        self.update_title()
+        for entry in self.document_pool.documents():
+            self.update_tab(entry)
+        autosaver = self.sender()
+        if isinstance(autosaver, AutoSaver) and autosaver.undo_trimmed:
+            notice = f"撤销步数超过 {autosaver.max_undo_steps}，已清空撤销历史，更早的内容可以从修订历史中恢复"
+            self.status_bar.showMessage(f"已保存: {file_path}；{notice}", 8000)
+        else:
+            self.status_bar.showMessage(f"已保存: {file_path}", 3000)
+        # 另存为后监视新的路径，自己保存的内容不算外部修改
+        self.update_watched_files()
+        self.file_watcher.acknowledge(file_path)
+        self.recheck_external_change(file_path)
+        if self.workspace_indexer is not None:
+            # 只重新索引保存的文件，不扫描整个工作区
+            self.workspace_indexer.request_file(file_path)
+        
+    def choose_workspace(self):
+        """选择工作区目录"""
+        root = QFileDialog.getExistingDirectory(self, "打开工作区")
+        if root:
+            self.open_workspace(root)
+        
+    def open_workspace(self, root, show=True):
+        """打开工作区：在后台增量更新全文索引"""
+        self.close_workspace()
+        self.search_index = SearchIndex(root)
+        self.workspace_indexer = WorkspaceIndexer(self.search_index, self)
+        self.workspace_indexer.progress.connect(
+            lambda done, total: self.search_dock.set_status(f"正在索引: {done}/{total}")
+        )
+        self.workspace_indexer.indexed.connect(self.on_workspace_indexed)
+        self.workspace_indexer.file_indexed.connect(self.on_workspace_file_indexed)
+        self.workspace_indexer.failed.connect(
+            lambda message: self.search_dock.set_status(f"索引失败: {message}")
+        )
+        self.search_dock.set_index(self.search_index)
+        self.search_dock.set_status("正在索引...")
+        self.settings.setValue("workspace/root", self.search_index.root)
+        self.workspace_indexer.request_update()
+        if show:
+            self.search_dock.focus_query()
+        
+    def close_workspace(self):
+        """关闭当前工作区，等待后台索引停止"""
+        if self.workspace_indexer is not None:
+            self.workspace_indexer.cancel()
+            self.workspace_indexer.wait()
+            self.workspace_indexer.deleteLater()
+            self.workspace_indexer = None
+        if self.search_index is not None:
+            self.search_index.close()
+            self.search_index = None
+        
+    def on_workspace_indexed(self, stats):
+        """一轮索引完成"""
+        # 排队的信号可能在工作区关闭或切换之后才到达
+        if self.search_index is None or self.sender() is not self.workspace_indexer:
+            return
+        self.search_dock.set_status(
+            f"{os.path.basename(self.search_index.root)}: {stats['files']} 个文件"
+            f"（更新 {stats['indexed']}，删除 {stats['removed']}，{stats['seconds']:.2f} 秒）"
+        )
+        if self.search_dock.query_edit.text().strip():
+            self.search_dock.search()
+        
+    def on_workspace_file_indexed(self, file_path):
+        """保存的文件重新索引完成，刷新正在显示的搜索结果"""
+        if self.search_index is None or self.sender() is not self.workspace_indexer:
+            return
+        if self.search_dock.query_edit.text().strip():
+            self.search_dock.search()
+        
+    def open_search_result(self, file_path, line):
+        """打开搜索结果所在的文件并跳转到匹配的行"""
+        self.load_file(file_path)
+        current = self.autosaver.file_path
+        if current is None or os.path.abspath(current) != os.path.abspath(file_path) or self.editor.isReadOnly():
+            # 大文件在后台加载，或打开失败
+            return
+        self.jump_to_line(line)
         
     def export_md(self):
         """导出为 Markdown"""
         self.save_as_file()
         
+    @traced("MainWindow.export_html")
     def export_html(self):
-        """导出为 HTML"""
+        """导出为 HTML（在后台线程中逐块写出）"""
         file_dialog = QFileDialog()
         file_path, _ = file_dialog.getSaveFileName(self, "导出为 HTML", "", "HTML Files (*.html);;All Files (*)")
         
-        if file_path:
-            try:
-                content = self.editor.to_plain_text()
-                html = self.markdown_converter.to_html(content)
-                
-                with open(file_path, 'w', encoding='utf-8') as f:
-                    f.write(html)
-                
-                QMessageBox.information(self, "成功", "导出为 HTML 成功")
-            except Exception as e:
-                QMessageBox.critical(self, "错误", f"导出为 HTML 失败: {str(e)}")
-        
+        if not file_path:
+            return
+        text = self.markdown_converter.to_markdown(self.editor.document())
+        base_dir = self.document_directory()
+        exporter = HtmlExporter(self.markdown_converter, self_contained=self.embed_assets_action.isChecked())
+        
+        def on_exported(stats):
+            message = "导出为 HTML 成功"
+            if stats["missing"]:
+                message += f"，{stats['missing']} 张图片未找到，保留了原地址"
+            QMessageBox.information(self, "成功", message)
+        
+        self.start_export(
+            "导出为 HTML",
+            lambda progress, cancelled: exporter.export(
+                text, file_path, base_dir=base_dir, progress=progress, cancelled=cancelled
+            ),
+            on_exported,
+        )
+        
+    @traced("MainWindow.export_pdf")
     def export_pdf(self):
-        """导出为 PDF"""
-        # 简化处理，实际需要使用 PyQt6 的 PDF 导出功能
-        QMessageBox.information(self, "提示", "PDF 导出功能暂未实现")
-        
+        """导出为 PDF（在后台线程中排版并逐页写出，内容未变化时复用排版）"""
+        file_dialog = QFileDialog()
+        file_path, _ = file_dialog.getSaveFileName(self, "导出为 PDF", "", "PDF Files (*.pdf);;All Files (*)")
+        
+        if not file_path:
+            return
+        text = self.markdown_converter.to_markdown(self.editor.document())
+        base_dir = self.document_directory()
+        
+        def on_exported(stats):
+            message = f"导出为 PDF 成功，共 {stats['pages']} 页"
+            if stats["missing"]:
+                message += f"，{stats['missing']} 张图片未找到"
+            QMessageBox.information(self, "成功", message)
+        
+        self.start_export(
+            "导出为 PDF",
+            lambda progress, cancelled: self.pdf_exporter.export(
+                text, file_path, base_dir=base_dir, progress=progress, cancelled=cancelled
+            ),
+            on_exported,
+        )
+        
+    def start_export(self, title, export_func, on_exported):
+        """在导出线程中执行导出，显示可以取消的进度对话框"""
+        worker = self.export_worker
+        if worker.is_busy():
+            QMessageBox.information(self, "提示", "上一次导出尚未完成")
+            return
+        
+        progress = QProgressDialog(f"正在{title}...", "取消", 0, 100, self)
+        progress.setWindowTitle(title)
+        progress.setWindowModality(Qt.WindowModality.WindowModal)
+        progress.setMinimumDuration(300)
+        
+        def on_progress(done, total):
+            # 总数为 0 时显示忙碌状态
+            if total:
+                progress.setMaximum(100)
+                progress.setValue(done * 100 // total)
+            else:
+                progress.setMaximum(0)
+        
+        def on_worker_exported(stats):
+            if not stats["cancelled"]:
+                on_exported(stats)
+        
+        connections = [
+            (worker.progress, worker.progress.connect(on_progress)),
+            (worker.exported, worker.exported.connect(on_worker_exported)),
+            (worker.failed, worker.failed.connect(
+                lambda message: QMessageBox.critical(self, "错误", f"{title}失败: {message}")
+            )),
+        ]
+        
+        def on_finished():
+            for signal, connection in connections:
+                signal.disconnect(connection)
+            worker.completed.disconnect(on_finished)
+            progress.canceled.disconnect(worker.cancel)
+            progress.close()
+        
+        worker.completed.connect(on_finished)
+        progress.canceled.connect(worker.cancel)
+        worker.run_export(export_func)
+        
+    @traced("MainWindow.copy_as_markdown")
     def copy_as_markdown(self):
-        """复制为 Markdown"""
-        import pyperclip
-        content = self.editor.to_plain_text()
-        md_text = self.markdown_converter.to_markdown(content)
-        pyperclip.copy(md_text)
-        QMessageBox.information(self, "成功", "Markdown 内容已复制到剪贴板")
+        """复制为 Markdown（有选区时只复制选区），HTML 在粘贴时才生成"""
+        cursor = self.editor.textCursor()
+        selected = cursor.hasSelection()
+        if selected:
+            content = self.markdown_converter.to_markdown(
+                self.editor.document(), cursor.selectionStart(), cursor.selectionEnd()
+            )
+        else:
+            content = self.markdown_converter.to_markdown(self.editor.document())
+        copy_markdown(content, self.markdown_converter)
+        self.status_bar.showMessage("已复制选区为 Markdown" if selected else "已复制全文为 Markdown", 3000)
         
     def closeEvent(self, event):
         """关闭事件"""
@@ -355,4 +1218,13 @@ class MainWindow(QMainWindow):
         self.settings.setValue("editor/font_family", font.family())
         self.settings.setValue("editor/font_size", font.pointSize())
         
+        # 停止后台渲染和导出线程，等待进行中的保存完成
+        self.render_worker.stop()
+        self.export_worker.stop()
+        self.file_watcher.shutdown()
+        self.document_pool.shutdown()
+        if self._image_cache is not None:
+            self._image_cache.shutdown()
+        self.close_workspace()
+        
         event.accept()
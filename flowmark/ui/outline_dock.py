@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FlowMark 大纲面板
+"""
+
+from PyQt6.QtCore import Qt, QTimer, pyqtSignal
+from PyQt6.QtWidgets import QDockWidget, QTreeWidget, QTreeWidgetItem
+
+
+class OutlineDock(QDockWidget):
+    """按标题层级显示文档大纲，可折叠，点击标题跳转
+
+    标题列表变化时延迟合并刷新；面板隐藏时不刷新，重新显示时再更新。
+    树节点只保存标题序号，标题行号移动时无需重建。
+    """
+
+    # 选中标题：标题序号
+    heading_activated = pyqtSignal(int)
+
+    def __init__(self, heading_index, parent=None):
+        super().__init__("大纲", parent)
+        self.setObjectName("OutlineDock")
+        self._heading_index = heading_index
+        self._dirty = True
+
+        self.tree = QTreeWidget()
+        self.tree.setHeaderHidden(True)
+        self.tree.itemActivated.connect(self._on_item_activated)
+        self.tree.itemClicked.connect(self._on_item_activated)
+        self.setWidget(self.tree)
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(300)
+        self._timer.timeout.connect(self.refresh)
+        heading_index.headings_changed.connect(self.schedule_refresh)
+        self.visibilityChanged.connect(self._on_visibility_changed)
+
+    def schedule_refresh(self):
+        """标题变化后延迟刷新"""
+        self._dirty = True
+        if self.isVisible():
+            self._timer.start()
+
+    def _on_visibility_changed(self, visible):
+        if visible and self._dirty:
+            self.refresh()
+
+    def refresh(self):
+        """按当前标题重建大纲树，保留折叠状态"""
+        self._timer.stop()
+        self._dirty = False
+        collapsed = set()
+        stack = [self.tree.invisibleRootItem()]
+        while stack:
+            item = stack.pop()
+            for i in range(item.childCount()):
+                child = item.child(i)
+                if child.childCount() and not child.isExpanded():
+                    collapsed.add(child.text(0))
+                stack.append(child)
+
+        self.tree.setUpdatesEnabled(False)
+        self.tree.clear()
+        # 父节点栈：(级别, 节点)
+        parents = [(0, self.tree.invisibleRootItem())]
+        items = []
+        for index, heading in enumerate(self._heading_index.headings()):
+            while parents[-1][0] >= heading.level:
+                parents.pop()
+            item = QTreeWidgetItem(parents[-1][1], [heading.title or "(无标题)"])
+            item.setData(0, Qt.ItemDataRole.UserRole, index)
+            parents.append((heading.level, item))
+            items.append(item)
+        self.tree.expandAll()
+        for item in items:
+            if item.childCount() and item.text(0) in collapsed:
+                item.setExpanded(False)
+        self.tree.setUpdatesEnabled(True)
+
+    def _on_item_activated(self, item, column=0):
+        index = item.data(0, Qt.ItemDataRole.UserRole)
+        if index is not None:
+            self.heading_activated.emit(index)
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FlowMark 工作区搜索面板
+"""
+
+import os
+
+from PyQt6.QtCore import Qt, QTimer, pyqtSignal
+from PyQt6.QtWidgets import QDockWidget, QLabel, QLineEdit, QListWidget, QListWidgetItem, QVBoxLayout, QWidget
+
+
+class SearchDock(QDockWidget):
+    """工作区全文搜索面板
+
+    输入停顿后在 GUI 线程中查询索引（毫秒级），结果显示标题和摘要，
+    点击结果打开文件并跳转到匹配的行。
+    """
+
+    # 选中搜索结果：文件路径, 行号
+    result_activated = pyqtSignal(str, int)
+
+    def __init__(self, parent=None):
+        super().__init__("搜索", parent)
+        self.setObjectName("SearchDock")
+        self._index = None
+
+        widget = QWidget()
+        layout = QVBoxLayout(widget)
+        layout.setContentsMargins(4, 4, 4, 4)
+        self.query_edit = QLineEdit()
+        self.query_edit.setPlaceholderText("搜索工作区...")
+        self.query_edit.setClearButtonEnabled(True)
+        layout.addWidget(self.query_edit)
+        self.status_label = QLabel("未打开工作区")
+        layout.addWidget(self.status_label)
+        self.results = QListWidget()
+        self.results.setWordWrap(True)
+        layout.addWidget(self.results)
+        self.setWidget(widget)
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(150)
+        self._timer.timeout.connect(self.search)
+        self.query_edit.textChanged.connect(lambda text: self._timer.start())
+        self.query_edit.returnPressed.connect(self.search)
+        self.results.itemActivated.connect(self._on_item_activated)
+        self.results.itemClicked.connect(self._on_item_activated)
+
+    def set_index(self, search_index):
+        """设置要查询的索引"""
+        self._index = search_index
+        self.results.clear()
+
+    def set_status(self, text):
+        """显示索引状态"""
+        self.status_label.setText(text)
+
+    def focus_query(self):
+        """显示面板并聚焦搜索框"""
+        self.show()
+        self.raise_()
+        self.query_edit.setFocus()
+        self.query_edit.selectAll()
+
+    def search(self):
+        """按当前输入查询"""
+        self._timer.stop()
+        self.results.clear()
+        query = self.query_edit.text().strip()
+        if self._index is None or not query:
+            return
+        try:
+            results = self._index.search(query)
+        except Exception as e:
+            self.set_status(f"搜索失败: {e}")
+            return
+        for result in results:
+            relative = os.path.relpath(result.path, self._index.root)
+            item = QListWidgetItem(f"{result.title}  ({relative})\n{result.snippet}")
+            item.setToolTip(result.path)
+            item.setData(Qt.ItemDataRole.UserRole, (result.path, result.line))
+            self.results.addItem(item)
+        if not results:
+            self.results.addItem(QListWidgetItem("没有找到匹配的内容"))
+
+    def _on_item_activated(self, item):
+        data = item.data(Qt.ItemDataRole.UserRole)
+        if data:
+            self.result_activated.emit(*data)
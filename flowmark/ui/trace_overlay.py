@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FlowMark 性能追踪状态栏面板
+"""
+
+from PyQt6.QtCore import QTimer
+from PyQt6.QtWidgets import QLabel
+
+from flowmark.utils.tracing import tracer
+
+
+class TraceOverlay(QLabel):
+    """在状态栏中显示各区间的 p95 耗时，鼠标悬停查看完整统计"""
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._timer = QTimer(self)
+        self._timer.setInterval(1000)
+        self._timer.timeout.connect(self.refresh)
+        self.hide()
+
+    def set_active(self, active):
+        """显示或隐藏面板"""
+        self.setVisible(active)
+        if active:
+            self.refresh()
+            self._timer.start()
+        else:
+            self._timer.stop()
+
+    def refresh(self):
+        """刷新统计"""
+        summary = tracer.summary()
+        if not summary:
+            self.setText("性能追踪: 暂无数据")
+            self.setToolTip("")
+            return
+
+        short = []
+        details = []
+        for name, stats in summary.items():
+            short.append(f"{name.rsplit('.', 1)[-1]} {stats['p95']:.1f}")
+            details.append(
+                f"{name}: p50 {stats['p50']:.2f} ms, p95 {stats['p95']:.2f} ms, "
+                f"p99 {stats['p99']:.2f} ms ({stats['count']} 次)"
+            )
+        self.setText("p95(ms) " + " | ".join(short))
+        self.setToolTip("\n".join(details))
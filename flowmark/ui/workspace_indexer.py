@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FlowMark 工作区后台索引
+"""
+
+import threading
+
+from PyQt6.QtCore import QThread, pyqtSignal
+
+
+class WorkspaceIndexer(QThread):
+    """在后台线程中增量更新工作区搜索索引
+
+    索引期间再次请求更新时不会排队多次，只在本轮结束后再更新一轮。
+    保存文件后用 request_file 只重新索引该文件，不扫描整个工作区；
+    排队的整体更新会覆盖这些文件。“线程退出还是继续”与“启动线程还是
+    只做标记”在同一个锁中决定，线程即将退出时到达的请求不会丢失。
+    """
+
+    # 索引进度：已完成, 总数
+    progress = pyqtSignal(int, int)
+    # 一轮更新完成：统计信息
+    indexed = pyqtSignal(dict)
+    # 单个文件重新索引完成：文件路径
+    file_indexed = pyqtSignal(str)
+    # 更新失败：错误信息
+    failed = pyqtSignal(str)
+
+    def __init__(self, search_index, parent=None):
+        super().__init__(parent)
+        self.search_index = search_index
+        self._lock = threading.Lock()
+        self._requested = False
+        # 等待单独重新索引的文件
+        self._files = set()
+        # run() 是否还会检查请求，在锁中读写
+        self._running = False
+        self._cancelled = threading.Event()
+
+    def request_update(self):
+        """请求增量更新整个工作区的索引"""
+        self._request(True)
+
+    def request_file(self, file_path):
+        """请求只重新索引一个文件（例如保存之后）"""
+        self._request(False, file_path)
+
+    def _request(self, full, file_path=None):
+        with self._lock:
+            if full:
+                self._requested = True
+            else:
+                self._files.add(file_path)
+            if self._running:
+                return
+            self._running = True
+        # run() 已经决定退出但线程可能还没有结束，等它结束后再启动
+        self.wait()
+        self.start()
+
+    def cancel(self):
+        """取消更新，已完成的部分会保留"""
+        self._cancelled.set()
+
+    def run(self):
+        try:
+            while True:
+                with self._lock:
+                    if self._cancelled.is_set() or not (self._requested or self._files):
+                        self._running = False
+                        return
+                    full, files = self._requested, self._files
+                    self._requested = False
+                    self._files = set()
+                if full:
+                    stats = self.search_index.update(
+                        progress=self.progress.emit, cancelled=self._cancelled.is_set
+                    )
+                    self.indexed.emit(stats)
+                    continue
+                for file_path in sorted(files):
+                    if self._cancelled.is_set():
+                        break
+                    if self.search_index.update_file(file_path):
+                        self.file_indexed.emit(file_path)
+        except Exception as e:
+            with self._lock:
+                self._running = False
+            self.failed.emit(str(e))
+        finally:
+            self.search_index.release()
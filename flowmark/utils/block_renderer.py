@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FlowMark 增量块级渲染
+"""
+
+import hashlib
+import re
+import threading
+from collections import OrderedDict, namedtuple
+
+# 源文档中的一个顶层块，行号从 0 开始，end_line 不包含
+Block = namedtuple("Block", ["start_line", "end_line", "text"])
+
+# 已渲染的块
+RenderedBlock = namedtuple("RenderedBlock", ["start_line", "end_line", "text", "html"])
+
+_FENCE_RE = re.compile(r"^ {0,3}(`{3,}|~{3,})")
+_LIST_ITEM_RE = re.compile(r"^ {0,3}(?:[*+-]|\d+[.)])\s")
+_QUOTE_RE = re.compile(r"^ {0,3}>")
+_INDENTED_RE = re.compile(r"^(?: {4}|\t)")
+_REFERENCE_RE = re.compile(r"^ {0,3}\[[^\]]+\]:[ \t]*\S.*$", re.MULTILINE)
+_HTML_OPEN_RE = re.compile(r"^ {0,3}<([a-zA-Z][a-zA-Z0-9]*)[\s>]")
+
+
+def split_blocks(text):
+    """将 Markdown 文本拆分为顶层块
+
+    块之间以空行分隔；围栏代码块整体作为一个块；
+    缩进的续行和同一列表（或引用）的后续项会并入前一个块，
+    以保证逐块渲染的结果与整篇渲染一致。
+    """
+    lines = text.split("\n")
+    blocks = []
+    current = []
+    current_start = 0
+    container = None
+    fence = None
+    html_tag = None
+    pending_blank = 0
+
+    def close(end_line):
+        nonlocal current, container, html_tag
+        if current:
+            blocks.append(Block(current_start, end_line, "\n".join(current)))
+        current = []
+        container = None
+        html_tag = None
+
+    for number, line in enumerate(lines):
+        if fence is not None:
+            current.append(line)
+            stripped = line.strip()
+            if stripped.startswith(fence) and stripped.strip(fence[0]) == "":
+                fence = None
+                close(number + 1)
+            continue
+
+        if not line.strip():
+            if current:
+                pending_blank += 1
+            continue
+
+        match = _FENCE_RE.match(line)
+        if match and html_tag is None:
+            close(number - pending_blank)
+            pending_blank = 0
+            current_start = number
+            current.append(line)
+            fence = match.group(1)
+            continue
+
+        if current and pending_blank:
+            continued = (
+                _INDENTED_RE.match(line)
+                or (container is not None and container.match(line))
+                or html_tag is not None
+            )
+            if continued:
+                current.extend([""] * pending_blank)
+            else:
+                close(number - pending_blank)
+        pending_blank = 0
+
+        if not current:
+            current_start = number
+            container = None
+            for pattern in (_LIST_ITEM_RE, _QUOTE_RE):
+                if pattern.match(line):
+                    container = pattern
+            match = _HTML_OPEN_RE.match(line)
+            html_tag = match.group(1).lower() if match else None
+        current.append(line)
+
+        if html_tag is not None and "</%s" % html_tag in line.lower():
+            html_tag = None
+
+    close(len(lines) - pending_blank)
+    return blocks
+
+
+class BlockRenderer:
+    """增量块级渲染器
+
+    把文档拆分为顶层块，按块内容缓存渲染后的 HTML（LRU 淘汰，按块源文本
+    和 HTML 的总字符数限制），只有被编辑的块才需要重新渲染。引用式链接的
+    定义会影响整篇文档，因此所有引用定义会附加到每个块的渲染输入中，并
+    作为缓存键的一部分，定义变化时含链接的块会自动失效。
+
+    缓存由锁保护，可以同时在后台渲染线程和 GUI 线程中使用。
+    """
+
+    def __init__(self, render_func, cache_chars=64 * 1024 * 1024):
+        self._render_func = render_func
+        self._cache = OrderedDict()
+        self._cache_chars = 0
+        self._max_cache_chars = cache_chars
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, text):
+        """渲染整篇文档"""
+        return "\n".join(block.html for block in self.render_blocks(text) if block.html)
+
+    def render_blocks(self, text):
+        """逐块渲染，返回 RenderedBlock 列表"""
+        return list(self.iter_blocks(text))
+
+    def iter_blocks(self, text, blocks=None):
+        """逐块渲染，按顺序逐个生成 RenderedBlock；blocks 为 split_blocks 的结果，可预先计算"""
+        if blocks is None:
+            blocks = split_blocks(text)
+        references = "\n".join(match.group(0) for match in _REFERENCE_RE.finditer(text))
+        if references:
+            references_key = hashlib.sha1(references.encode("utf-8")).hexdigest()
+        else:
+            references_key = ""
+
+        for block in blocks:
+            # 只有可能包含引用式链接的块才依赖引用定义
+            depends = references and "[" in block.text
+            key = (references_key if depends else "", block.text)
+            with self._lock:
+                html = self._cache.get(key)
+                if html is not None:
+                    self.hits += 1
+                    self._cache.move_to_end(key)
+            if html is None:
+                source = block.text + "\n\n" + references if depends else block.text
+                html = self._render_func(source)
+                size = len(block.text) + len(html)
+                with self._lock:
+                    self.misses += 1
+                    if size <= self._max_cache_chars:
+                        # 另一个线程可能同时渲染了同一个块
+                        previous = self._cache.pop(key, None)
+                        if previous is not None:
+                            self._cache_chars -= len(block.text) + len(previous)
+                        self._cache[key] = html
+                        self._cache_chars += size
+                        while self._cache_chars > self._max_cache_chars:
+                            (_, evicted_text), evicted = self._cache.popitem(last=False)
+                            self._cache_chars -= len(evicted_text) + len(evicted)
+            yield RenderedBlock(block.start_line, block.end_line, block.text, html)
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._cache.clear()
+            self._cache_chars = 0
+
+    def stats(self):
+        """获取缓存统计"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._cache),
+                "chars": self._cache_chars,
+            }
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FlowMark 编辑日志（崩溃恢复）
+"""
+
+import glob
+import hashlib
+import json
+import os
+import re
+
+# 日志默认保存目录
+JOURNAL_DIR = os.path.join(os.path.expanduser("~"), ".flowmark", "journal")
+
+# 未命名文档日志的文件名，包含所属进程的 PID
+_UNTITLED_RE = re.compile(r"untitled-(\d+)(?:-\d+)?\.journal$")
+
+
+def process_alive(pid):
+    """进程是否仍在运行（无法确定时按仍在运行处理）"""
+    if pid == os.getpid():
+        return True
+    if os.name == "nt":
+        import ctypes
+
+        kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+        # PROCESS_QUERY_LIMITED_INFORMATION
+        handle = kernel32.OpenProcess(0x1000, False, pid)
+        if not handle:
+            # ERROR_ACCESS_DENIED：进程存在但属于其他用户
+            return ctypes.get_last_error() == 5
+        try:
+            exit_code = ctypes.c_ulong()
+            if not kernel32.GetExitCodeProcess(handle, ctypes.byref(exit_code)):
+                return True
+            # STILL_ACTIVE
+            return exit_code.value == 259
+        finally:
+            kernel32.CloseHandle(handle)
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def file_identity(file_path):
+    """获取文件在磁盘上的标识 (大小, 修改时间)，文件不存在时返回 None"""
+    if not file_path or not os.path.exists(file_path):
+        return None
+    stat = os.stat(file_path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def apply_edits(text, edits):
+    """在文本上重放编辑
+
+    位置和长度以 UTF-16 代码单元计（与 QTextDocument 一致），
+    因此在 UTF-16 编码的缓冲区上做替换。
+    """
+    data = bytearray(text.encode("utf-16-le"))
+    for position, removed, inserted in edits:
+        length = len(data) // 2
+        start = min(position, length) * 2
+        end = min(position + removed, length) * 2
+        data[start:end] = inserted.encode("utf-16-le")
+    return data.decode("utf-16-le")
+
+
+class EditJournal:
+    """只追加的编辑日志
+
+    第一行是头部，记录日志对应的文件及其在磁盘上的标识（大小和修改时间）；
+    之后每行记录一次编辑 [位置, 删除长度, 插入文本]。崩溃后用磁盘上的文件
+    加上日志中的编辑即可恢复，无需频繁重写整个文档。
+
+    保存时先用 checkpoint 取得当前位置，保存成功后调用 commit，
+    日志会被压缩为新的头部加上保存之后的编辑。保存的内容与文档文本
+    不同时（例如粗体等格式序列化为了 Markdown 标记），编辑位置对应的是
+    文档文本而不是磁盘上的文件：保存线程用 write_base 把文档文本写到
+    日志旁边按内容哈希命名的副本中（内容不变时不重写），头部只记录其
+    SHA-1，恢复时在副本上重放。
+    """
+
+    def __init__(self, journal_path):
+        self.journal_path = journal_path
+        self._file = None
+        self._header = None
+        self._edits = []
+        # 已被压缩掉的编辑数，使 checkpoint 在多次 commit 之间保持有效
+        self._committed = 0
+
+    @staticmethod
+    def path_for(file_path, directory=JOURNAL_DIR, key=None):
+        """获取文件对应的日志路径，未命名文档按进程（及进程内的 key）区分"""
+        if file_path:
+            digest = hashlib.sha1(os.path.abspath(file_path).encode("utf-8")).hexdigest()[:16]
+            return os.path.join(directory, f"{digest}.journal")
+        if key is not None:
+            return os.path.join(directory, f"untitled-{os.getpid()}-{key}.journal")
+        return os.path.join(directory, f"untitled-{os.getpid()}.journal")
+
+    @staticmethod
+    def find_untitled(directory=JOURNAL_DIR):
+        """查找已退出的进程遗留的未命名文档日志，按修改时间从新到旧排列
+
+        仍在运行的 FlowMark 进程（包括本进程）的日志正在使用，不算遗留。
+        """
+        paths = []
+        for path in glob.glob(os.path.join(directory, "untitled-*.journal")):
+            match = _UNTITLED_RE.search(os.path.basename(path))
+            if match and not process_alive(int(match.group(1))):
+                paths.append(path)
+        return sorted(paths, key=os.path.getmtime, reverse=True)
+
+    @staticmethod
+    def base_path(journal_path, digest):
+        """保存时的文档文本副本的路径"""
+        return f"{journal_path}.{digest[:16]}.base"
+
+    @staticmethod
+    def write_base(journal_path, text):
+        """把保存时的文档文本写入日志旁边的副本，返回其 SHA-1
+
+        在保存线程中调用；内容相同的副本已经存在时不再写入。
+        """
+        data = text.encode("utf-8", "surrogatepass")
+        digest = hashlib.sha1(data).hexdigest()
+        path = EditJournal.base_path(journal_path, digest)
+        if not os.path.exists(path):
+            directory = os.path.dirname(path)
+            if directory and not os.path.exists(directory):
+                os.makedirs(directory, exist_ok=True)
+            temp_path = path + ".tmp"
+            with open(temp_path, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, path)
+        return digest
+
+    @staticmethod
+    def read_base(journal_path, digest):
+        """读取文档文本副本，不存在或内容与 SHA-1 不符时返回 None"""
+        try:
+            with open(EditJournal.base_path(journal_path, digest), "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        if hashlib.sha1(data).hexdigest() != digest:
+            return None
+        return data.decode("utf-8", "surrogatepass")
+
+    def adopt_base(self, journal_path, digest):
+        """把按 journal_path 写入的副本移到当前日志旁边（保存期间日志被另存为移动时）"""
+        if journal_path == self.journal_path:
+            return
+        source = EditJournal.base_path(journal_path, digest)
+        if os.path.exists(source):
+            os.replace(source, EditJournal.base_path(self.journal_path, digest))
+
+    def start(self, file_path):
+        """以文件当前在磁盘上的内容为基准开始新的日志"""
+        self._header = {"version": 1, "path": file_path, "base": file_identity(file_path)}
+        self._edits = []
+        self._committed = 0
+        self._rewrite()
+
+    def resume(self, file_path):
+        """继续使用磁盘上已有的日志（文档被换出后重新载入时），日志不存在时重新开始
+
+        调用方保证文档内容与日志重放后的结果一致。
+        """
+        header = None
+        if os.path.exists(self.journal_path):
+            header, edits = EditJournal.read(self.journal_path)
+        if header is None or header.get("path") != file_path:
+            self.start(file_path)
+            return
+        self._header = header
+        self._edits = edits
+        self._committed = 0
+        # 重写一遍，丢弃崩溃时可能残留的半行
+        self._rewrite()
+
+    def record(self, position, removed, inserted):
+        """记录一次编辑"""
+        if self._file is None:
+            return
+        edit = [position, removed, inserted]
+        self._edits.append(edit)
+        self._file.write(json.dumps(edit, ensure_ascii=False) + "\n")
+        self._file.flush()
+
+    def has_edits(self):
+        """基准之后是否有编辑"""
+        return bool(self._edits)
+
+    def checkpoint(self):
+        """获取当前日志位置，用于保存完成后的 commit"""
+        return self._committed + len(self._edits)
+
+    def commit(self, checkpoint, file_path, base_digest=None):
+        """保存成功后压缩日志：以新保存的文件为基准，只保留之后的编辑
+
+        base_digest 为 write_base 返回的文档文本副本的 SHA-1，保存的内容
+        与文档文本不同时传入。
+        """
+        if self._header is None:
+            return
+        self._header["path"] = file_path
+        self._header["base"] = file_identity(file_path)
+        if base_digest is None:
+            self._header.pop("text_sha1", None)
+        else:
+            self._header["text_sha1"] = base_digest
+        self._edits = self._edits[max(0, checkpoint - self._committed):]
+        self._committed = max(self._committed, checkpoint)
+        self._rewrite()
+
+    def move(self, journal_path):
+        """把日志移动到新的路径（例如另存为之后）"""
+        if journal_path == self.journal_path:
+            return
+        self.close()
+        if os.path.exists(self.journal_path):
+            os.replace(self.journal_path, journal_path)
+        for path in self._base_files():
+            os.replace(path, journal_path + path[len(self.journal_path):])
+        self.journal_path = journal_path
+        if self._header is not None:
+            self._file = open(self.journal_path, "a", encoding="utf-8")
+
+    def close(self):
+        """关闭日志文件"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def discard(self):
+        """关闭并删除日志"""
+        self.close()
+        self._header = None
+        self._edits = []
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+        self.prune_bases()
+
+    def prune_bases(self):
+        """删除头部没有引用的文档文本副本
+
+        保存线程可能正在写入下一次保存的副本，只应在没有进行中的保存时调用。
+        """
+        digest = self._header.get("text_sha1") if self._header is not None else None
+        keep = EditJournal.base_path(self.journal_path, digest) if digest else None
+        for path in self._base_files():
+            if path != keep:
+                os.remove(path)
+
+    def _base_files(self):
+        return glob.glob(glob.escape(self.journal_path) + ".*.base")
+
+    def _rewrite(self):
+        self.close()
+        directory = os.path.dirname(self.journal_path)
+        if directory and not os.path.exists(directory):
+            os.makedirs(directory)
+        temp_path = self.journal_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            f.write(json.dumps(self._header, ensure_ascii=False) + "\n")
+            for edit in self._edits:
+                f.write(json.dumps(edit, ensure_ascii=False) + "\n")
+        os.replace(temp_path, self.journal_path)
+        self._file = open(self.journal_path, "a", encoding="utf-8")
+
+    @staticmethod
+    def read(journal_path):
+        """读取日志，返回 (头部, 编辑列表)；日志损坏的尾部会被忽略"""
+        header = None
+        edits = []
+        with open(journal_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    item = json.loads(line)
+                except ValueError:
+                    # 崩溃时最后一行可能只写了一半
+                    break
+                if header is None:
+                    header = item
+                else:
+                    edits.append(item)
+        return header, edits
+
+    @staticmethod
+    def recover(journal_path, base_text):
+        """在基准文本上重放日志，返回恢复后的文本
+
+        头部引用了保存时的文档文本副本时以副本为基准，不使用 base_text。
+        日志不存在、没有编辑，文件在磁盘上已被修改（与日志基准不一致），
+        或引用的副本丢失时返回 None。
+        """
+        if not os.path.exists(journal_path):
+            return None
+        header, edits = EditJournal.read(journal_path)
+        if header is None or not edits:
+            return None
+        if header.get("base") != file_identity(header.get("path")):
+            return None
+        if header.get("text_sha1"):
+            base_text = EditJournal.read_base(journal_path, header["text_sha1"])
+            if base_text is None:
+                return None
+        return apply_edits(base_text, edits)
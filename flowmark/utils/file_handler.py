@@ -5,14 +5,28 @@
 FlowMark 文件处理类
 """
 
+import codecs
+import io
+import mmap
 import os
+import shutil
+import uuid
+
+from flowmark.utils.tracing import traced
 
 class FileHandler:
     """文件处理类"""
     
+    # 超过该大小的文件使用流式打开
+    LARGE_FILE_THRESHOLD = 4 * 1024 * 1024
+    
+    # 流式读取时每块的字节数
+    CHUNK_SIZE = 64 * 1024
+    
     def __init__(self):
         self.recent_files = []
         
+    @traced("FileHandler.open_file")
     def open_file(self, file_path):
         """打开文件"""
         if not os.path.exists(file_path):
@@ -21,26 +35,71 @@ class FileHandler:
         with open(file_path, 'r', encoding='utf-8') as f:
             content = f.read()
         
-        # 添加到最近打开的文件列表
-        if file_path not in self.recent_files:
-            self.recent_files.insert(0, file_path)
-            # 只保留最近 10 个文件
-            if len(self.recent_files) > 10:
-                self.recent_files = self.recent_files[:10]
+        self.add_recent_file(file_path)
         
         return content
     
+    def is_large_file(self, file_path):
+        """是否应该使用流式打开"""
+        return os.path.getsize(file_path) >= self.LARGE_FILE_THRESHOLD
+    
+    def open_file_chunks(self, file_path, chunk_size=None, cancelled=None):
+        """流式打开文件
+        
+        通过内存映射按块读取，并做增量 UTF-8 解码和换行符转换，
+        逐块产出 (已读取字节数, 总字节数, 文本)，不会一次性持有整个文件。
+        cancelled 为可选的回调，返回 True 时停止读取。读取在后台线程中
+        进行，不修改最近文件列表，由调用方在加载完成后调用 add_recent_file。
+        """
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(f"文件不存在: {file_path}")
+        
+        chunk_size = chunk_size or self.CHUNK_SIZE
+        decoder = io.IncrementalNewlineDecoder(codecs.getincrementaldecoder('utf-8')(), translate=True)
+        
+        with open(file_path, 'rb') as f:
+            total = os.fstat(f.fileno()).st_size
+            if total == 0:
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                for offset in range(0, total, chunk_size):
+                    if cancelled is not None and cancelled():
+                        return
+                    end = min(offset + chunk_size, total)
+                    text = decoder.decode(mapped[offset:end], final=end == total)
+                    if text:
+                        yield end, total, text
+        
+    @traced("FileHandler.save_file")
     def save_file(self, file_path, content):
-        """保存文件"""
+        """保存文件
+        
+        先写入同目录下的临时文件并刷新到磁盘，再原子地替换目标文件，
+        保存过程中崩溃也不会留下被截断的文件。保存通常在后台线程中进行，
+        不修改最近文件列表，由调用方在 GUI 线程中调用 add_recent_file。
+        """
         # 确保目录存在
         directory = os.path.dirname(file_path)
         if directory and not os.path.exists(directory):
             os.makedirs(directory)
         
-        with open(file_path, 'w', encoding='utf-8') as f:
-            f.write(content)
+        temp_path = os.path.join(directory, f".{os.path.basename(file_path)}.{uuid.uuid4().hex[:8]}.tmp")
+        try:
+            with open(temp_path, 'x', encoding='utf-8') as f:
+                f.write(content)
+                f.flush()
+                os.fsync(f.fileno())
+            if os.path.exists(file_path):
+                # 保留原文件的权限
+                shutil.copymode(file_path, temp_path)
+            os.replace(temp_path, file_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
         
-        # 添加到最近打开的文件列表
+    def add_recent_file(self, file_path):
+        """添加到最近打开的文件列表"""
         if file_path not in self.recent_files:
             self.recent_files.insert(0, file_path)
             # 只保留最近 10 个文件
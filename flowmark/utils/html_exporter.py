@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FlowMark HTML 导出
+
+不依赖 PyQt6，图形界面和命令行（无显示环境）共用。
+"""
+
+import base64
+import html
+import mimetypes
+import os
+import re
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote, unquote, urlsplit
+
+from flowmark.utils.block_renderer import split_blocks
+
+# 默认样式表
+DEFAULT_CSS = """\
+body { margin: 0; background: #fff; color: #24292f; }
+.markdown-body { box-sizing: border-box; max-width: 880px; margin: 0 auto; padding: 32px 24px;
+  font: 16px/1.6 -apple-system, "Segoe UI", "PingFang SC", "Microsoft YaHei", "Noto Sans CJK SC", sans-serif; }
+h1, h2, h3, h4, h5, h6 { margin: 1.4em 0 0.6em; line-height: 1.25; font-weight: 600; }
+h1 { font-size: 2em; border-bottom: 1px solid #d8dee4; padding-bottom: 0.3em; }
+h2 { font-size: 1.5em; border-bottom: 1px solid #d8dee4; padding-bottom: 0.3em; }
+p, ul, ol, blockquote, pre, table { margin: 0 0 1em; }
+a { color: #0969da; text-decoration: none; }
+a:hover { text-decoration: underline; }
+img { max-width: 100%; }
+blockquote { margin-left: 0; padding: 0 1em; color: #57606a; border-left: 4px solid #d0d7de; }
+code { padding: 0.2em 0.4em; font-size: 85%; background: #f0f2f4; border-radius: 4px;
+  font-family: ui-monospace, SFMono-Regular, Consolas, "Liberation Mono", monospace; }
+pre { padding: 16px; overflow: auto; background: #f6f8fa; border-radius: 6px; line-height: 1.45; }
+pre code { padding: 0; font-size: 85%; background: transparent; }
+table { border-collapse: collapse; }
+th, td { padding: 6px 13px; border: 1px solid #d0d7de; }
+tr:nth-child(2n) { background: #f6f8fa; }
+hr { height: 1px; border: 0; background: #d0d7de; margin: 24px 0; }
+"""
+
+# 已缓冲但尚未写出的块数上限
+MAX_PENDING_BLOCKS = 256
+
+_IMG_SRC_RE = re.compile(r'(<img\b[^>]*?\bsrc=")([^"]*)(")', re.IGNORECASE)
+_TAG_RE = re.compile(r"<!--.*?-->|<(/?)([a-zA-Z][a-zA-Z0-9]*)\b[^>]*?(/?)>", re.DOTALL)
+# 没有结束标签的元素
+_VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+_TITLE_RE = re.compile(r"^ {0,3}#[ \t]+(.+?)[ \t#]*$", re.MULTILINE)
+
+
+def document_title(text, default):
+    """文档标题：第一个一级标题，没有时使用 default"""
+    match = _TITLE_RE.search(text)
+    return match.group(1) if match else default
+
+
+def top_level_spans(html_text):
+    """把整篇 HTML 在顶层元素之间拆分，返回 (起点, 终点) 列表
+
+    用于依赖整篇文档的扩展：整体渲染后仍可以逐个顶层元素扫描图片和写出。
+    标签不配对（例如不完整的原始 HTML）时剩余部分作为一段。
+    """
+    spans = []
+    depth = 0
+    start = 0
+    for match in _TAG_RE.finditer(html_text):
+        name = match.group(2)
+        if name is None:
+            # 注释
+            continue
+        if match.group(1):
+            depth = max(0, depth - 1)
+        elif not match.group(3) and name.lower() not in _VOID_TAGS:
+            depth += 1
+            continue
+        if depth == 0:
+            spans.append((start, match.end()))
+            start = match.end()
+    if html_text[start:].strip():
+        spans.append((start, len(html_text)))
+    return spans
+
+
+def encode_data_uri(path):
+    """读取图片并编码为 data URI，返回 bytes，以免大图片在内存中再多一份 str 副本"""
+    mime_type = mimetypes.guess_type(path)[0]
+    if not mime_type or not mime_type.startswith("image/"):
+        raise ValueError(f"不是图片文件: {path}")
+    with open(path, "rb") as f:
+        data = f.read()
+    return b"data:" + mime_type.encode("ascii") + b";base64," + base64.b64encode(data)
+
+
+def resolve_image(src, base_dir):
+    """把图片地址解析为本地文件路径；远程地址、data URI 和无法解析的相对路径返回 None"""
+    src = html.unescape(src)
+    parts = urlsplit(src)
+    if parts.scheme == "file":
+        return os.path.abspath(unquote(parts.path))
+    # Windows 盘符会被解析为单个字母的 scheme
+    if len(parts.scheme) > 1 or parts.netloc:
+        return None
+    path = unquote(src)
+    if os.path.isabs(path):
+        return path
+    if base_dir is None:
+        return None
+    return os.path.abspath(os.path.join(base_dir, path))
+
+
+class HtmlExporter:
+    """把 Markdown 流式导出为完整的 HTML 文件
+
+    逐块渲染并逐块写入临时文件，完成后再替换目标文件，整篇 HTML 不会
+    同时保存在内存中（依赖整篇文档的扩展只能整体渲染，渲染结果按顶层
+    元素拆分后同样逐段写出）。self_contained 为 True 时样式表和本地图片都内嵌
+    在文件中（图片编码为 data URI）：图片在线程池中并行读取和编码，
+    已提交但尚未写出的图片总大小不超过 max_pending_bytes，因此含有大量
+    大图片的文档峰值内存仍然有界。否则相对路径的图片改写为相对于导出
+    文件的路径。
+    """
+
+    def __init__(self, converter, self_contained=True, css_path=None, jobs=None,
+                 max_pending_bytes=64 * 1024 * 1024):
+        self.converter = converter
+        self.self_contained = self_contained
+        self.css_path = css_path
+        self.jobs = jobs or min(8, (os.cpu_count() or 1) + 2)
+        self.max_pending_bytes = max_pending_bytes
+
+    def export(self, text, target, base_dir=None, title=None, progress=None, cancelled=None):
+        """导出到 target，返回统计信息
+
+        base_dir 为解析相对图片路径的目录；progress(已完成块数, 总块数) 报告进度；
+        cancelled() 返回 True 时停止导出，目标文件保持不变。
+        """
+        started = time.perf_counter()
+        stats = {"blocks": 0, "images": 0, "missing": 0, "bytes": 0, "cancelled": False}
+        target = os.path.abspath(target)
+        target_dir = os.path.dirname(target)
+        if not os.path.exists(target_dir):
+            os.makedirs(target_dir)
+        if title is None:
+            title = document_title(text, os.path.splitext(os.path.basename(target))[0])
+
+        if self.converter.is_block_safe():
+            blocks = split_blocks(text)
+            total = len(blocks)
+            chunks = (block.html for block in self.converter.block_renderer.iter_blocks(text, blocks))
+        else:
+            # 依赖整篇文档的扩展只能整体渲染，渲染后按顶层元素拆分，
+            # 图片仍然逐段提交和写出，在途图片的大小限制照常生效
+            document_html = self.converter.to_html(text)
+            spans = top_level_spans(document_html)
+            total = len(spans)
+            chunks = (document_html[start:end].strip() for start, end in spans)
+
+        temp_path = target + ".tmp"
+        executor = ThreadPoolExecutor(max_workers=self.jobs) if self.self_contained else None
+        try:
+            with open(temp_path, "wb") as f:
+                f.write(self._head(title, target_dir).encode("utf-8"))
+                # 等待写出的块：(HTML, 其中的图片路径)
+                pending = deque()
+                # 在途的图片：路径 -> [future, 引用次数, 估计大小]
+                images = {}
+                pending_bytes = 0
+                for chunk in chunks:
+                    if cancelled is not None and cancelled():
+                        stats["cancelled"] = True
+                        break
+                    paths = []
+                    if chunk:
+                        for match in _IMG_SRC_RE.finditer(chunk):
+                            path = resolve_image(match.group(2), base_dir)
+                            if path is None or executor is None:
+                                continue
+                            paths.append(path)
+                            if path in images:
+                                images[path][1] += 1
+                                continue
+                            try:
+                                size = os.path.getsize(path) * 4 // 3
+                            except OSError:
+                                size = 0
+                            images[path] = [executor.submit(encode_data_uri, path), 1, size]
+                            pending_bytes += size
+                    pending.append((chunk, paths))
+                    stats["blocks"] += 1
+                    # 超出预算时先写出最早的块，等待其图片编码完成
+                    while pending and (pending_bytes > self.max_pending_bytes or len(pending) > MAX_PENDING_BLOCKS):
+                        pending_bytes -= self._write_block(f, pending.popleft(), images, base_dir, target_dir, stats)
+                    if progress is not None:
+                        progress(stats["blocks"], total)
+                if not stats["cancelled"]:
+                    while pending:
+                        self._write_block(f, pending.popleft(), images, base_dir, target_dir, stats)
+                    f.write(b"</article>\n</body>\n</html>\n")
+                    stats["bytes"] = f.tell()
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=True, cancel_futures=True)
+
+        if stats["cancelled"]:
+            os.remove(temp_path)
+        else:
+            os.replace(temp_path, target)
+        stats["seconds"] = time.perf_counter() - started
+        return stats
+
+    def _head(self, title, target_dir):
+        """生成文档头部和内联或链接的样式表"""
+        if self.css_path and not self.self_contained:
+            href = quote(os.path.relpath(os.path.abspath(self.css_path), target_dir).replace(os.sep, "/"))
+            style = f'<link rel="stylesheet" href="{html.escape(href)}">'
+        else:
+            css = DEFAULT_CSS
+            if self.css_path:
+                with open(self.css_path, "r", encoding="utf-8") as f:
+                    css = f.read()
+            style = f"<style>\n{css}</style>"
+        return (
+            "<!DOCTYPE html>\n<html>\n<head>\n<meta charset=\"utf-8\">\n"
+            "<meta name=\"viewport\" content=\"width=device-width, initial-scale=1\">\n"
+            f"<title>{html.escape(title)}</title>\n{style}\n</head>\n<body>\n"
+            "<article class=\"markdown-body\">\n"
+        )
+
+    def _write_block(self, f, item, images, base_dir, target_dir, stats):
+        """写出一个块，返回因此释放的在途图片大小"""
+        chunk, paths = item
+        if not chunk:
+            return 0
+        released = 0
+        encoded = {}
+        for path in paths:
+            image = images[path]
+            try:
+                encoded[path] = image[0].result()
+            except (OSError, ValueError):
+                encoded[path] = None
+            image[1] -= 1
+            if image[1] == 0:
+                del images[path]
+                released += image[2]
+
+        # 逐段写出，data URI 直接写入文件而不拼接成新的字符串
+        position = 0
+        for match in _IMG_SRC_RE.finditer(chunk):
+            path = resolve_image(match.group(2), base_dir)
+            if path is None:
+                continue
+            if self.self_contained:
+                data_uri = encoded.get(path)
+                if data_uri is None:
+                    stats["missing"] += 1
+                    continue
+                stats["images"] += 1
+                f.write(chunk[position:match.start(2)].encode("utf-8"))
+                f.write(data_uri)
+            else:
+                # 不内嵌时改写为相对于导出文件的路径
+                relative = quote(os.path.relpath(path, target_dir).replace(os.sep, "/"))
+                f.write((chunk[position:match.start(2)] + html.escape(relative)).encode("utf-8"))
+            position = match.end(2)
+        f.write(chunk[position:].encode("utf-8"))
+        f.write(b"\n")
+        return released
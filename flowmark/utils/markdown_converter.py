@@ -5,17 +5,139 @@
 FlowMark Markdown 转换类
 """
 
-import markdown
+import hashlib
+import threading
+from collections import OrderedDict
+
+from flowmark.utils.block_renderer import BlockRenderer
+from flowmark.utils.tracing import traced
+
+# 默认启用的 Markdown 扩展
+DEFAULT_EXTENSIONS = ["fenced_code", "tables"]
+
+# 依赖整篇文档的扩展（脚注、目录、缩写等），启用时不能逐块渲染
+WHOLE_DOCUMENT_EXTENSIONS = {"footnotes", "toc", "abbr", "extra"}
 
 class MarkdownConverter:
-    """Markdown 转换类"""
+    """Markdown 转换类
+    
+    每个线程复用一个长期存在的 markdown.Markdown 实例（每次使用前 reset），
+    避免每次转换都重新创建实例和注册扩展。整篇文档的转换结果按内容哈希
+    缓存在有界的 LRU 中；预览逐块渲染（to_html_blocks）时也把拼接后的
+    结果放入该缓存，例如预览后立即导出同一内容时无需再次转换。
+    """
+    
+    def __init__(self, extensions=None, extension_configs=None, cache_chars=32 * 1024 * 1024):
+        self._extensions = list(DEFAULT_EXTENSIONS if extensions is None else extensions)
+        self._extension_configs = dict(extension_configs or {})
+        self._local = threading.local()
+        self._version = 0
+        
+        # 整篇文档缓存：内容哈希 -> HTML，按缓存的字符总数限制大小
+        self._cache = OrderedDict()
+        self._cache_chars = 0
+        self._max_cache_chars = cache_chars
+        self._lock = threading.Lock()
+        
+        # 按块缓存渲染结果，编辑后只重新渲染变化的块
+        self.block_renderer = BlockRenderer(self._render)
+    
+    @property
+    def extensions(self):
+        """当前启用的扩展"""
+        return list(self._extensions)
+    
+    def set_extensions(self, extensions, extension_configs=None):
+        """更换扩展，已有的引擎和缓存随之失效"""
+        with self._lock:
+            self._extensions = list(extensions)
+            self._extension_configs = dict(extension_configs or {})
+            self._version += 1
+            self._cache.clear()
+            self._cache_chars = 0
+        self.block_renderer.clear()
     
-    def to_markdown(self, text):
-        """将文本转换为 Markdown 格式"""
-        # 这里简化处理，实际需要根据富文本格式进行转换
-        # 由于我们的编辑器直接使用 Markdown 语法，所以这里直接返回原文
-        return text
+    def is_block_safe(self):
+        """当前扩展是否允许逐块渲染"""
+        names = {name.rsplit(".", 1)[-1] for name in self._extensions if isinstance(name, str)}
+        return not names & WHOLE_DOCUMENT_EXTENSIONS
     
+    def _engine(self):
+        """获取当前线程的 Markdown 实例，第一次使用时才导入 markdown"""
+        engine = getattr(self._local, "engine", None)
+        if engine is None or self._local.version != self._version:
+            import markdown
+            engine = markdown.Markdown(
+                extensions=self._extensions, extension_configs=self._extension_configs
+            )
+            self._local.engine = engine
+            self._local.version = self._version
+        return engine
+    
+    def _render(self, text):
+        """用当前线程的 Markdown 实例渲染一段文本"""
+        return self._engine().reset().convert(text)
+    
+    def to_markdown(self, source, start=None, end=None):
+        """将编辑器内容转换为 Markdown 格式
+        
+        source 为 QTextDocument 时序列化其中的字符格式（粗体、斜体、下划线），
+        start/end 指定只转换的范围；为字符串时已经是 Markdown，原样返回。
+        """
+        if isinstance(source, str):
+            return source
+        # 只有传入文档时才需要 PyQt6，命令行不会走到这里
+        from flowmark.editor.markdown_serializer import MarkdownSerializer
+        return MarkdownSerializer.for_document(source).to_markdown(start, end)
+    
+    @traced("MarkdownConverter.to_html")
     def to_html(self, text):
         """将 Markdown 转换为 HTML 格式"""
-        return markdown.markdown(text)
+        key = hashlib.sha1(text.encode("utf-8")).digest()
+        with self._lock:
+            html = self._cache.get(key)
+            if html is not None:
+                self._cache.move_to_end(key)
+                return html
+            version = self._version
+        
+        if self.is_block_safe():
+            html = self.block_renderer.render(text)
+        else:
+            html = self._render(text)
+        self._store(key, version, html)
+        return html
+    
+    def to_html_blocks(self, text):
+        """将 Markdown 逐块转换为 HTML，返回 RenderedBlock 列表
+        
+        拼接后的 HTML 与 to_html 的结果相同，同时放入整篇文档缓存。
+        """
+        key = hashlib.sha1(text.encode("utf-8")).digest()
+        with self._lock:
+            version = self._version
+        blocks = self.block_renderer.render_blocks(text)
+        if self.is_block_safe():
+            self._store(key, version, "\n".join(block.html for block in blocks if block.html))
+        return blocks
+    
+    def _store(self, key, version, html):
+        """放入整篇文档缓存，扩展在转换期间被更换时丢弃结果"""
+        with self._lock:
+            if version == self._version and len(html) <= self._max_cache_chars:
+                # 多个线程同时未命中同一个键时，后写入的替换先写入的
+                previous = self._cache.pop(key, None)
+                if previous is not None:
+                    self._cache_chars -= len(previous)
+                self._cache[key] = html
+                self._cache_chars += len(html)
+                while self._cache_chars > self._max_cache_chars:
+                    _, evicted = self._cache.popitem(last=False)
+                    self._cache_chars -= len(evicted)
+    
+    def clear_cache(self):
+        """清空所有缓存"""
+        with self._lock:
+            self._cache.clear()
+            self._cache_chars = 0
+        self.block_renderer.clear()
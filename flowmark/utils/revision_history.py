@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FlowMark 修订历史
+"""
+
+import os
+import struct
+import threading
+import time
+import zlib
+
+# 历史文件头
+MAGIC = b"FLOWMARK-HISTORY 1\n"
+# 两个快照之间最多的增量数，重建任意修订最多重放这么多个增量
+SNAPSHOT_INTERVAL = 32
+# 超过该大小（字节）的增量压缩保存
+COMPRESS_BYTES = 256
+
+# 记录头：类型, 是否压缩, 时间戳, 文本长度, 替换起点, 替换终点, 数据长度
+_RECORD = struct.Struct("<BBdQQQI")
+_SNAPSHOT = 0
+_DELTA = 1
+
+
+def history_path(file_path):
+    """文件对应的历史文件路径（与文件放在一起的隐藏文件）"""
+    directory, name = os.path.split(os.path.abspath(file_path))
+    return os.path.join(directory, f".{name}.flowmark-history")
+
+
+def text_delta(old, new):
+    """计算把 old 变为 new 的单个替换 (起点, 终点, 插入文本)
+
+    去掉公共前缀和后缀后剩下的部分即为替换，局部编辑得到的增量很小。
+    先按块比较再逐字符比较，大文本也只需线性时间。
+    """
+    limit = min(len(old), len(new))
+    start = 0
+    step = 4096
+    while step:
+        while start + step <= limit and old[start:start + step] == new[start:start + step]:
+            start += step
+        step //= 8
+    end_limit = limit - start
+    suffix = 0
+    step = 4096
+    while step:
+        while suffix + step <= end_limit and \
+                old[len(old) - suffix - step:len(old) - suffix] == new[len(new) - suffix - step:len(new) - suffix]:
+            suffix += step
+        step //= 8
+    return start, len(old) - suffix, new[start:len(new) - suffix]
+
+
+class Revision:
+    """一个修订：快照保存全文，增量保存相对上一个修订的替换"""
+
+    __slots__ = ("timestamp", "kind", "compressed", "length", "start", "end", "data")
+
+    def __init__(self, timestamp, kind, compressed, length, start, end, data):
+        self.timestamp = timestamp
+        self.kind = kind
+        self.compressed = compressed
+        # 修订的文本长度（字符数）
+        self.length = length
+        self.start = start
+        self.end = end
+        self.data = data
+
+    @property
+    def is_snapshot(self):
+        return self.kind == _SNAPSHOT
+
+    def text(self):
+        """快照的全文或增量的插入文本"""
+        data = zlib.decompress(self.data) if self.compressed else self.data
+        return data.decode("utf-8")
+
+    def pack(self):
+        return _RECORD.pack(
+            self.kind, self.compressed, self.timestamp, self.length, self.start, self.end, len(self.data)
+        ) + self.data
+
+
+class RevisionHistory:
+    """有内存上限的修订历史
+
+    每隔若干个增量保存一个压缩的快照，其余修订只保存相对上一个修订的
+    增量，因此重建任意修订最多从最近的快照重放 SNAPSHOT_INTERVAL 个
+    增量，与历史长度无关。超出内存上限时按快照分组淘汰最早的修订。
+
+    指定 path 时历史保存在磁盘上：新修订追加到文件末尾，淘汰后才重写；
+    release 之后释放内存，下次访问时再从文件读取。修订编号从 0 开始
+    递增，淘汰不会改变其余修订的编号。所有方法都可以在任意线程中调用。
+    """
+
+    def __init__(self, path=None, max_bytes=16 * 1024 * 1024, snapshot_interval=SNAPSHOT_INTERVAL):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.snapshot_interval = snapshot_interval
+        self._lock = threading.RLock()
+        self._revisions = None if path else []
+        # 已淘汰的修订数，即第一个保留修订的编号
+        self._first = 0
+        self._bytes = 0
+        self._last_text = None
+        # 历史文件末尾有无法解析的内容（例如崩溃时写了一半的记录），
+        # 下次写入时重写整个文件而不是追加在其后
+        self._torn = False
+
+    def set_path(self, path):
+        """更换历史文件
+
+        还没有修订时改为读取新文件中已有的历史（例如打开文件后）；否则
+        已有的修订写入新文件（例如另存为之后）。
+        """
+        with self._lock:
+            if path == self.path:
+                return
+            if self.path:
+                self._ensure_loaded()
+            if path and not self._revisions:
+                self.path = path
+                self._revisions = None
+                self._first = 0
+                self._bytes = 0
+                self._last_text = None
+                return
+            self.path = path
+            if path:
+                self._rewrite()
+
+    def set_limit(self, max_bytes):
+        """设置内存上限（字节）"""
+        with self._lock:
+            self.max_bytes = max(0, int(max_bytes))
+            if self._revisions is not None and self._evict() and self.path:
+                self._rewrite()
+
+    def commit(self, text, timestamp=None):
+        """记录一个新修订，返回其编号；内容与最新修订相同时返回 None"""
+        with self._lock:
+            self._ensure_loaded()
+            revisions = self._revisions
+            last = self._latest_text()
+            if last == text:
+                return None
+            timestamp = time.time() if timestamp is None else timestamp
+
+            revision = None
+            if last is not None:
+                start, end, inserted = text_delta(last, text)
+                data = inserted.encode("utf-8")
+                since = 0
+                delta_bytes = 0
+                for previous in reversed(revisions):
+                    if previous.is_snapshot:
+                        break
+                    since += 1
+                    delta_bytes += len(previous.data)
+                snapshot_bytes = len(previous.data)
+                # 增量太多或累计比快照还大时改存快照
+                if since + 1 < self.snapshot_interval and delta_bytes + len(data) < snapshot_bytes:
+                    compressed = len(data) > COMPRESS_BYTES
+                    revision = Revision(
+                        timestamp, _DELTA, compressed, len(text), start, end,
+                        zlib.compress(data, 6) if compressed else data,
+                    )
+            if revision is None:
+                revision = Revision(
+                    timestamp, _SNAPSHOT, True, len(text), 0, 0, zlib.compress(text.encode("utf-8"), 6)
+                )
+
+            revisions.append(revision)
+            self._bytes += len(revision.data)
+            self._last_text = text
+            if self._evict():
+                if self.path:
+                    self._rewrite()
+            elif self.path:
+                self._append(revision)
+            return self._first + len(revisions) - 1
+
+    def __len__(self):
+        with self._lock:
+            self._ensure_loaded()
+            return len(self._revisions)
+
+    def revisions(self):
+        """保留的修订，返回 (编号, 时间戳, 文本长度) 列表，从旧到新"""
+        with self._lock:
+            self._ensure_loaded()
+            return [
+                (self._first + index, revision.timestamp, revision.length)
+                for index, revision in enumerate(self._revisions)
+            ]
+
+    def text(self, revision_id):
+        """重建指定修订的全文"""
+        with self._lock:
+            self._ensure_loaded()
+            index = revision_id - self._first
+            if not 0 <= index < len(self._revisions):
+                raise KeyError(f"修订不存在或已被淘汰: {revision_id}")
+            if index == len(self._revisions) - 1 and self._last_text is not None:
+                return self._last_text
+            return self._rebuild(index)
+
+    def memory_size(self):
+        """修订数据占用的内存（字节），已释放时为 0"""
+        with self._lock:
+            return self._bytes if self._revisions is not None else 0
+
+    def release(self):
+        """释放内存中的修订（只对保存在磁盘上的历史有效）"""
+        with self._lock:
+            if self.path:
+                self._revisions = None
+                self._bytes = 0
+                self._last_text = None
+
+    def clear(self):
+        """删除所有修订"""
+        with self._lock:
+            self._revisions = []
+            self._bytes = 0
+            self._last_text = None
+            if self.path and os.path.exists(self.path):
+                os.remove(self.path)
+
+    def _latest_text(self):
+        if self._last_text is None and self._revisions:
+            self._last_text = self._rebuild(len(self._revisions) - 1)
+        return self._last_text
+
+    def _rebuild(self, index):
+        """从最近的快照开始重放增量"""
+        revisions = self._revisions
+        base = index
+        while not revisions[base].is_snapshot:
+            base -= 1
+        text = revisions[base].text()
+        for revision in revisions[base + 1:index + 1]:
+            text = text[:revision.start] + revision.text() + text[revision.end:]
+        return text
+
+    def _evict(self):
+        """按快照分组淘汰最早的修订，直到低于上限的四分之三，返回是否淘汰了修订
+
+        淘汰到低于上限一定比例，避免之后每次提交都重写历史文件。
+        """
+        revisions = self._revisions
+        if self._bytes <= self.max_bytes:
+            return False
+        target = self.max_bytes * 3 // 4
+        evicted = 0
+        while self._bytes > target:
+            # 找到下一个快照，最新的一组始终保留
+            end = evicted + 1
+            while end < len(revisions) and not revisions[end].is_snapshot:
+                end += 1
+            if end >= len(revisions):
+                break
+            self._bytes -= sum(len(revision.data) for revision in revisions[evicted:end])
+            evicted = end
+        if not evicted:
+            return False
+        del revisions[:evicted]
+        self._first += evicted
+        return True
+
+    def _ensure_loaded(self):
+        if self._revisions is not None:
+            return
+        self._revisions = []
+        self._bytes = 0
+        self._first = 0
+        self._torn = False
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, "rb") as f:
+            data = f.read()
+        if not data.startswith(MAGIC):
+            self._torn = bool(data)
+            return
+        offset = len(MAGIC)
+        # 紧跟文件头的是第一个保留修订的编号
+        if len(data) >= offset + 8:
+            self._first = struct.unpack_from("<Q", data, offset)[0]
+            offset += 8
+        while offset + _RECORD.size <= len(data):
+            kind, compressed, timestamp, length, start, end, size = _RECORD.unpack_from(data, offset)
+            body = offset + _RECORD.size
+            if body + size > len(data):
+                # 崩溃时最后一条记录可能只写了一半
+                break
+            revision = Revision(timestamp, kind, bool(compressed), length, start, end, data[body:body + size])
+            offset = body + size
+            if not self._revisions and not revision.is_snapshot:
+                self._first += 1
+                continue
+            self._revisions.append(revision)
+            self._bytes += size
+        self._torn = offset != len(data)
+
+    def _append(self, revision):
+        if self._torn or not os.path.exists(self.path):
+            self._rewrite()
+            return
+        with open(self.path, "ab") as f:
+            f.write(revision.pack())
+
+    def _rewrite(self):
+        temp_path = self.path + ".tmp"
+        with open(temp_path, "wb") as f:
+            f.write(MAGIC)
+            f.write(struct.pack("<Q", self._first))
+            for revision in self._revisions:
+                f.write(revision.pack())
+        os.replace(temp_path, self.path)
+        self._torn = False
@@ -0,0 +1,385 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FlowMark 工作区全文搜索索引
+"""
+
+import hashlib
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections import Counter, namedtuple
+
+from flowmark.utils.tracing import traced
+
+# 索引文件目录
+INDEX_DIR = os.path.join(os.path.expanduser("~"), ".flowmark", "index")
+
+# 参与索引的文件扩展名
+MARKDOWN_EXTENSIONS = (".md", ".markdown")
+
+# 索引格式版本，分词方式变化时递增，旧索引会被重建
+INDEX_VERSION = 1
+
+# 中日文字符（汉字、假名）
+_CJK = "\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff"
+_TOKEN_RE = re.compile(f"[{_CJK}]+|(?:(?![{_CJK}])\\w)+")
+_CJK_RUN_RE = re.compile(f"[{_CJK}]+")
+_TITLE_RE = re.compile(r"^ {0,3}#{1,6}[ \t]+(.+?)[ \t#]*$", re.MULTILINE)
+
+# 单词最大长度，过长的（例如 base64 数据）不索引
+MAX_TERM_LENGTH = 64
+
+# 生成摘要时按块读取文件，最多读取的字符数
+SNIPPET_CHUNK_CHARS = 64 * 1024
+SNIPPET_READ_CHARS = 1024 * 1024
+
+# BM25 参数
+_K1 = 1.2
+_B = 0.75
+
+# 搜索结果：文件路径、标题、得分、首个匹配所在行号（从 0 开始）、摘要
+SearchResult = namedtuple("SearchResult", ["path", "title", "score", "line", "snippet"])
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS files (
+    id INTEGER PRIMARY KEY,
+    path TEXT UNIQUE NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    length INTEGER NOT NULL,
+    title TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS postings (
+    term TEXT NOT NULL,
+    file_id INTEGER NOT NULL,
+    tf INTEGER NOT NULL,
+    PRIMARY KEY (term, file_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS postings_file ON postings (file_id);
+"""
+
+
+def tokenize(text):
+    """索引用分词：西文按单词（小写），中日文按单字和相邻两字"""
+    tokens = []
+    for match in _TOKEN_RE.finditer(text):
+        token = match.group(0)
+        if _CJK_RUN_RE.match(token):
+            tokens.extend(token)
+            tokens.extend(token[i:i + 2] for i in range(len(token) - 1))
+        elif len(token) <= MAX_TERM_LENGTH:
+            tokens.append(token.lower())
+    return tokens
+
+
+def query_terms(query):
+    """查询分词：中日文连续两字以上时只用相邻两字，单字时用单字"""
+    terms = []
+    for match in _TOKEN_RE.finditer(query):
+        token = match.group(0)
+        if _CJK_RUN_RE.match(token):
+            if len(token) == 1:
+                terms.append(token)
+            else:
+                terms.extend(token[i:i + 2] for i in range(len(token) - 1))
+        else:
+            terms.append(token.lower()[:MAX_TERM_LENGTH])
+    # 去重并保持顺序
+    return list(dict.fromkeys(terms))
+
+
+def index_path_for(root):
+    """工作区对应的索引文件路径"""
+    digest = hashlib.sha1(os.path.abspath(root).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(INDEX_DIR, f"{digest}.sqlite")
+
+
+class SearchIndex:
+    """工作区 Markdown 文件的持久化倒排索引
+
+    索引保存在 SQLite 文件中（词项 -> 文件 -> 词频），按文件的修改时间
+    和大小增量更新，只重新索引变化的文件。搜索时只读取查询词项的倒排
+    列表并按 BM25 排序，再从排名靠前的文件开头按块读取到第一个匹配为止
+    生成摘要（有读取上限），与工作区和文件大小基本无关。最后一个西文查询词按前缀匹配，便于边输入边搜索。
+
+    每个线程使用自己的数据库连接；数据库使用 WAL 模式，后台线程更新
+    索引时仍然可以搜索。
+    """
+
+    def __init__(self, root, index_path=None):
+        self.root = os.path.abspath(root)
+        self.index_path = index_path or index_path_for(self.root)
+        self._connections = {}
+
+    def _connect(self):
+        """获取当前线程的数据库连接"""
+        ident = threading.get_ident()
+        connection = self._connections.get(ident)
+        if connection is None:
+            os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+            # 连接只在创建它的线程中使用，关闭时可能在其他线程
+            connection = sqlite3.connect(self.index_path, timeout=30, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(_SCHEMA)
+            row = connection.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+            if row is None or int(row[0]) != INDEX_VERSION:
+                with connection:
+                    connection.execute("DELETE FROM postings")
+                    connection.execute("DELETE FROM files")
+                    connection.execute(
+                        "INSERT OR REPLACE INTO meta (key, value) VALUES ('version', ?)", (str(INDEX_VERSION),)
+                    )
+            self._connections[ident] = connection
+        return connection
+
+    def release(self):
+        """关闭当前线程的数据库连接，后台线程结束前调用"""
+        connection = self._connections.pop(threading.get_ident(), None)
+        if connection is not None:
+            connection.close()
+
+    def close(self):
+        """关闭所有数据库连接"""
+        for connection in self._connections.values():
+            connection.close()
+        self._connections.clear()
+
+    def scan(self):
+        """列出工作区中的 Markdown 文件，返回 {路径: (mtime_ns, size)}"""
+        files = {}
+        for root, dirs, names in os.walk(self.root):
+            dirs[:] = [d for d in dirs if not d.startswith(".")]
+            for name in names:
+                if name.lower().endswith(MARKDOWN_EXTENSIONS):
+                    path = os.path.join(root, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    files[path] = (stat.st_mtime_ns, stat.st_size)
+        return files
+
+    @traced("SearchIndex.update")
+    def update(self, progress=None, cancelled=None, batch_size=200):
+        """增量更新索引
+
+        progress(done, total) 报告进度，cancelled() 返回 True 时停止
+        （已提交的部分保留，下次继续）。返回更新统计。
+        """
+        start = time.perf_counter()
+        connection = self._connect()
+        current = self.scan()
+        indexed = {
+            path: (file_id, mtime_ns, size)
+            for file_id, path, mtime_ns, size in connection.execute("SELECT id, path, mtime_ns, size FROM files")
+        }
+
+        removed = [file_id for path, (file_id, _, _) in indexed.items() if path not in current]
+        changed = [
+            path for path, identity in current.items()
+            if path not in indexed or indexed[path][1:] != identity
+        ]
+
+        with connection:
+            for file_id in removed:
+                self._delete(connection, file_id)
+
+        done = 0
+        total = len(changed)
+        for offset in range(0, total, batch_size):
+            if cancelled is not None and cancelled():
+                break
+            with connection:
+                for path in changed[offset:offset + batch_size]:
+                    self._index_file(connection, path, indexed.get(path, (None,))[0])
+                    done += 1
+            if progress is not None:
+                progress(done, total)
+
+        return {
+            "files": len(current),
+            "indexed": done,
+            "removed": len(removed),
+            "unchanged": len(current) - total,
+            "seconds": time.perf_counter() - start,
+        }
+
+    def update_file(self, path):
+        """重新索引单个文件（例如保存之后）"""
+        path = os.path.abspath(path)
+        if not path.startswith(self.root + os.sep) or not path.lower().endswith(MARKDOWN_EXTENSIONS):
+            return False
+        connection = self._connect()
+        row = connection.execute("SELECT id FROM files WHERE path = ?", (path,)).fetchone()
+        with connection:
+            if os.path.exists(path):
+                self._index_file(connection, path, row[0] if row else None)
+            elif row:
+                self._delete(connection, row[0])
+        return True
+
+    def _delete(self, connection, file_id):
+        connection.execute("DELETE FROM postings WHERE file_id = ?", (file_id,))
+        connection.execute("DELETE FROM files WHERE id = ?", (file_id,))
+
+    def _index_file(self, connection, path, file_id):
+        try:
+            stat = os.stat(path)
+            with open(path, "r", encoding="utf-8", errors="replace") as f:
+                text = f.read()
+        except OSError:
+            if file_id is not None:
+                self._delete(connection, file_id)
+            return
+
+        counts = Counter(tokenize(text))
+        match = _TITLE_RE.search(text)
+        title = match.group(1) if match else os.path.splitext(os.path.basename(path))[0]
+        length = sum(counts.values())
+        if file_id is None:
+            cursor = connection.execute(
+                "INSERT INTO files (path, mtime_ns, size, length, title) VALUES (?, ?, ?, ?, ?)",
+                (path, stat.st_mtime_ns, stat.st_size, length, title),
+            )
+            file_id = cursor.lastrowid
+        else:
+            connection.execute("DELETE FROM postings WHERE file_id = ?", (file_id,))
+            connection.execute(
+                "UPDATE files SET mtime_ns = ?, size = ?, length = ?, title = ? WHERE id = ?",
+                (stat.st_mtime_ns, stat.st_size, length, title, file_id),
+            )
+        connection.executemany(
+            "INSERT INTO postings (term, file_id, tf) VALUES (?, ?, ?)",
+            ((term, file_id, tf) for term, tf in counts.items()),
+        )
+
+    def _postings(self, connection, term, prefix):
+        """词项的倒排列表 {文件: 词频}，prefix 时合并所有以 term 开头的词项"""
+        if prefix:
+            rows = connection.execute(
+                "SELECT file_id, SUM(tf) FROM postings WHERE term >= ? AND term < ? GROUP BY file_id",
+                (term, term + "\U0010ffff"),
+            )
+        else:
+            rows = connection.execute("SELECT file_id, tf FROM postings WHERE term = ?", (term,))
+        return dict(rows)
+
+    @traced("SearchIndex.search")
+    def search(self, query, limit=20):
+        """搜索，返回按相关度排序的 SearchResult 列表
+
+        所有查询词都命中的文件排在前面，其次按 BM25 得分排序。
+        """
+        terms = query_terms(query)
+        if not terms:
+            return []
+        connection = self._connect()
+        count, total_length = connection.execute("SELECT COUNT(*), SUM(length) FROM files").fetchone()
+        if not count:
+            return []
+        average_length = (total_length or 0) / count or 1
+
+        weighted = []
+        last_latin = None if _CJK_RUN_RE.match(terms[-1]) else len(terms) - 1
+        for index, term in enumerate(terms):
+            postings = self._postings(connection, term, index == last_latin and len(term) >= 2)
+            if postings:
+                idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                weighted.append((idf, postings))
+        if not weighted:
+            return []
+
+        files = {}
+        ids = list(set().union(*(postings for _, postings in weighted)))
+        for offset in range(0, len(ids), 500):
+            chunk = ids[offset:offset + 500]
+            placeholders = ",".join("?" * len(chunk))
+            for file_id, path, length, title in connection.execute(
+                f"SELECT id, path, length, title FROM files WHERE id IN ({placeholders})", chunk
+            ):
+                files[file_id] = (path, length, title)
+
+        ranked = []
+        for file_id, (path, length, title) in files.items():
+            norm = _K1 * (1 - _B + _B * length / average_length)
+            score = 0.0
+            matched = 0
+            for idf, postings in weighted:
+                tf = postings.get(file_id)
+                if tf:
+                    score += idf * tf * (_K1 + 1) / (tf + norm)
+                    matched += 1
+            ranked.append((matched, score, path, title))
+        ranked.sort(key=lambda item: (-item[0], -item[1], item[2]))
+
+        results = []
+        for _, score, path, title in ranked[:limit]:
+            line, snippet = make_snippet(path, query)
+            results.append(SearchResult(path, title, score, line, snippet))
+        return results
+
+    def stats(self):
+        """索引统计"""
+        connection = self._connect()
+        files = connection.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+        terms = connection.execute("SELECT COUNT(DISTINCT term) FROM postings").fetchone()[0]
+        return {"files": files, "terms": terms}
+
+
+def make_snippet(path, query, width=80, read_limit=SNIPPET_READ_CHARS):
+    """读取文件生成包含查询词的摘要，返回 (行号, 摘要)
+
+    按块读取，找到第一个查询词后即停止，最多读取 read_limit 个字符；
+    其中没有匹配时摘要取文件开头。大文件也只读取开头的一部分。
+    """
+    tokens = [token.lower() for token in _TOKEN_RE.findall(query)]
+    # 块之间保留的字符数，使跨块的查询词和匹配前的上下文仍然完整
+    overlap = max((len(token) for token in tokens), default=0) + width
+    try:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            head = ""
+            text = ""
+            # 已从 text 开头丢弃的字符数和换行数
+            skipped = 0
+            skipped_lines = 0
+            position = -1
+            while position < 0 and skipped + len(text) < read_limit:
+                chunk = f.read(min(SNIPPET_CHUNK_CHARS, read_limit - skipped - len(text)))
+                if not chunk:
+                    break
+                if not head:
+                    head = chunk[:width + 1]
+                cut = max(0, len(text) - overlap)
+                skipped += cut
+                skipped_lines += text.count("\n", 0, cut)
+                text = text[cut:] + chunk
+                lowered = text.lower()
+                for token in tokens:
+                    found = lowered.find(token)
+                    if found >= 0 and (position < 0 or found < position):
+                        position = found
+            if position < 0:
+                # CJK 查询的字可能被换行分开，退回到文件开头
+                text, skipped, skipped_lines, position = head, 0, 0, 0
+            else:
+                # 补足匹配之后的上下文，多读一个字符用于判断后面是否还有内容
+                text += f.read(max(0, position + width + 1 - len(text)))
+    except OSError:
+        return 0, ""
+
+    line = skipped_lines + text.count("\n", 0, position)
+    start = max(0, position - width // 3)
+    end = min(len(text), start + width)
+    snippet = " ".join(text[start:end].split())
+    if start > 0 or skipped:
+        snippet = "..." + snippet
+    if end < len(text):
+        snippet += "..."
+    return line, snippet
@@ -0,0 +1,56 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FlowMark 启动耗时报告
+"""
+
+import os
+import sys
+import time
+
+
+class StartupProfiler:
+    """记录启动过程中各阶段的耗时和加载的模块
+
+    设置环境变量 FLOWMARK_STARTUP_REPORT=1 或传入 --startup-report 参数时，
+    窗口显示后在标准错误输出报告。
+    """
+
+    def __init__(self):
+        self._origin = time.perf_counter()
+        self._modules = set(sys.modules)
+        self._marks = []
+        self.enabled = os.environ.get("FLOWMARK_STARTUP_REPORT") == "1"
+
+    def mark(self, name):
+        """记录一个阶段的结束时间"""
+        self._marks.append((name, time.perf_counter()))
+
+    def loaded_modules(self):
+        """启动以来新加载的顶层包及其模块数"""
+        packages = {}
+        for name in set(sys.modules) - self._modules:
+            package = name.split(".", 1)[0]
+            packages[package] = packages.get(package, 0) + 1
+        return packages
+
+    def report(self, limit=15):
+        """生成启动报告，列出加载模块最多的 limit 个包"""
+        lines = ["FlowMark 启动报告:"]
+        previous = self._origin
+        for name, moment in self._marks:
+            lines.append(f"  {name:<24} {(moment - previous) * 1000:8.1f} ms")
+            previous = moment
+        lines.append(f"  {'合计':<24} {(previous - self._origin) * 1000:8.1f} ms")
+        packages = sorted(self.loaded_modules().items(), key=lambda item: (-item[1], item[0]))
+        lines.append(f"已加载 {len(packages)} 个包（模块数）:")
+        for package, count in packages[:limit]:
+            lines.append(f"  {package:<24} {count:5d}")
+        if len(packages) > limit:
+            lines.append(f"  ... 其余 {len(packages) - limit} 个包")
+        return "\n".join(lines)
+
+
+# 全局启动记录器，越早导入越准确
+profiler = StartupProfiler()
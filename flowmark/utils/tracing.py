@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FlowMark 热路径性能追踪
+
+默认关闭，关闭时每个被追踪的调用只多一次属性判断。设置环境变量
+FLOWMARK_TRACE=1 或在界面中打开后，记录各个区间的耗时，维护滚动的
+p50/p95/p99 统计，并可导出为 Chrome Trace 格式（chrome://tracing、Perfetto）。
+"""
+
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+
+class _Span:
+    """一次计时区间"""
+
+    __slots__ = ("_tracer", "_name", "_start")
+
+    def __init__(self, tracer, name):
+        self._tracer = tracer
+        self._name = name
+        self._start = 0
+
+    def __enter__(self):
+        self._start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._tracer.record(self._name, self._start, time.perf_counter_ns() - self._start)
+        return False
+
+
+class _NullSpan:
+    """追踪关闭时使用的空区间"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Tracer:
+    """性能追踪器
+
+    每个区间名保留最近 max_samples 个耗时样本用于计算分位数，
+    同时保留最近 max_events 个事件用于导出 Chrome Trace。
+    """
+
+    def __init__(self, enabled=False, max_samples=1024, max_events=100000):
+        self.enabled = enabled
+        self._max_samples = max_samples
+        self._samples = {}
+        self._events = deque(maxlen=max_events)
+        self._lock = threading.Lock()
+        self._origin = time.perf_counter_ns()
+
+    def span(self, name):
+        """返回一个计时区间，用于 with 语句"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name)
+
+    def record(self, name, start_ns, duration_ns):
+        """记录一次区间耗时"""
+        with self._lock:
+            samples = self._samples.get(name)
+            if samples is None:
+                samples = self._samples[name] = deque(maxlen=self._max_samples)
+            samples.append(duration_ns)
+            self._events.append((name, start_ns, duration_ns, threading.get_ident()))
+
+    def percentiles(self, name):
+        """获取区间的 p50/p95/p99（毫秒）和样本数"""
+        with self._lock:
+            ordered = sorted(self._samples.get(name, ()))
+        if not ordered:
+            return None
+
+        def pick(fraction):
+            return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] / 1e6
+
+        return {"p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99), "count": len(ordered)}
+
+    def summary(self):
+        """获取所有区间的统计"""
+        with self._lock:
+            names = sorted(self._samples)
+        return {name: self.percentiles(name) for name in names}
+
+    def reset(self):
+        """清空所有样本和事件"""
+        with self._lock:
+            self._samples.clear()
+            self._events.clear()
+
+    def chrome_trace(self):
+        """生成 Chrome Trace 格式的数据"""
+        pid = os.getpid()
+        with self._lock:
+            events = list(self._events)
+        return {
+            "traceEvents": [
+                {
+                    "name": name,
+                    "cat": "flowmark",
+                    "ph": "X",
+                    "ts": (start - self._origin) / 1000,
+                    "dur": duration / 1000,
+                    "pid": pid,
+                    "tid": tid,
+                }
+                for name, start, duration, tid in events
+            ],
+            "displayTimeUnit": "ms",
+        }
+
+    def dump_chrome_trace(self, file_path):
+        """把追踪数据写入 Chrome Trace JSON 文件"""
+        with open(file_path, "w", encoding="utf-8") as f:
+            json.dump(self.chrome_trace(), f)
+
+
+# 全局追踪器
+tracer = Tracer(enabled=os.environ.get("FLOWMARK_TRACE") == "1")
+
+
+def traced(name):
+    """追踪函数耗时的装饰器
+
+    包装函数以 *args 接收参数并原样传给被包装的函数。PyQt 无法从包装
+    函数看出槽接受几个参数，会把信号的全部参数（例如 triggered 的
+    checked）传进来，因此不接受这些参数的被追踪方法要通过 lambda 连接。
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not tracer.enabled:
+                return func(*args, **kwargs)
+            start = time.perf_counter_ns()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                tracer.record(name, start, time.perf_counter_ns() - start)
+
+        return wrapper
+
+    return decorator
@@ -5,30 +5,55 @@
 FlowMark 启动脚本
 """
 
+import hashlib
 import os
 import sys
 import subprocess
 
+# 依赖指纹文件，内容不变时跳过 pip
+FINGERPRINT_FILE = ".flowmark-deps"
+
+# 影响依赖安装结果的文件
+DEPENDENCY_FILES = ["requirements.txt", "setup.py"]
+
+# 计算依赖指纹
+def dependency_fingerprint():
+    digest = hashlib.sha1()
+    digest.update(sys.executable.encode("utf-8"))
+    digest.update(sys.version.encode("utf-8"))
+    for name in DEPENDENCY_FILES:
+        if os.path.exists(name):
+            with open(name, "rb") as f:
+                digest.update(f.read())
+    return digest.hexdigest()
+
 # 检查并安装依赖
 def install_dependencies():
-    print("正在检查依赖...")
+    fingerprint = dependency_fingerprint()
+    if os.path.exists(FINGERPRINT_FILE):
+        with open(FINGERPRINT_FILE, "r", encoding="utf-8") as f:
+            if f.read().strip() == fingerprint:
+                # 依赖没有变化，无需再运行 pip
+                return
+    
+    print("正在安装依赖...")
     try:
-        # 检查是否已安装 pip
-        subprocess.check_call([sys.executable, "-m", "pip", "--version"])
-        
-        # 安装依赖
-        print("正在安装依赖...")
         subprocess.check_call([sys.executable, "-m", "pip", "install", "-e", "."])
         print("依赖安装成功！")
     except Exception as e:
         print(f"依赖安装失败: {str(e)}")
         sys.exit(1)
+    
+    with open(FINGERPRINT_FILE, "w", encoding="utf-8") as f:
+        f.write(fingerprint)
 
 # 启动应用
 def start_app():
     print("正在启动 FlowMark...")
     try:
-        subprocess.run([sys.executable, "-m", "flowmark.main"])
+        # 在当前进程中启动，省去再启动一个解释器的开销
+        from flowmark.main import main
+        main()
     except Exception as e:
         print(f"启动应用失败: {str(e)}")
         sys.exit(1)
@@ -36,6 +61,7 @@ def start_app():
 if __name__ == "__main__":
     # 切换到脚本所在目录
     os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    sys.path.insert(0, os.getcwd())
     
     # 安装依赖
     install_dependencies()
@@ -7,12 +7,11 @@ setup(
     install_requires=[
         "PyQt6",
         "markdown",
-        "pyperclip",
         "Pillow"
     ],
     entry_points={
         "console_scripts": [
-            "flowmark=flowmark.main:main"
+            "flowmark=flowmark.cli:main"
         ]
     }
 )
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FlowMark 测试配置
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+# 在导入 Qt 和 flowmark 之前设置：无显示环境下运行，日志和设置写入临时目录
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+os.environ["HOME"] = tempfile.mkdtemp(prefix="flowmark-test-home-")
+
+import pytest
+from PyQt6.QtWidgets import QApplication
+
+
+@pytest.fixture(scope="session")
+def qapp():
+    """整个测试会话共用的 QApplication"""
+    app = QApplication.instance() or QApplication(sys.argv)
+    yield app
+
+
+@pytest.fixture
+def slot_errors(monkeypatch):
+    """收集槽函数中抛出的异常（PyQt 默认会因此中止进程）"""
+    errors = []
+    monkeypatch.setattr(sys, "excepthook", lambda kind, value, tb: errors.append(value))
+    return errors
+
+
+def wait_until(app, predicate, timeout=10.0):
+    """处理事件直到 predicate() 为真，超时返回 False"""
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        app.processEvents()
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return predicate()
+
+
+@pytest.fixture
+def window(qapp, monkeypatch):
+    """主窗口；询问和提示对话框直接返回，不阻塞测试"""
+    from PyQt6.QtWidgets import QMessageBox
+
+    from flowmark.ui.main_window import MainWindow
+
+    monkeypatch.setattr(QMessageBox, "question", lambda *args, **kwargs: QMessageBox.StandardButton.No)
+    monkeypatch.setattr(QMessageBox, "information", lambda *args, **kwargs: QMessageBox.StandardButton.Ok)
+    main_window = MainWindow()
+    main_window.show()
+    qapp.processEvents()
+    yield main_window
+    main_window.close()
+    main_window.deleteLater()
+    qapp.processEvents()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FlowMark 后台保存测试
+"""
+
+from PyQt6.QtGui import QTextCursor, QTextDocument
+
+from flowmark.ui.autosave import DEFAULT_MAX_UNDO_STEPS, AutoSaver
+from flowmark.utils.file_handler import FileHandler
+from tests.conftest import wait_until
+
+
+def make_saver(tmp_path, max_undo_steps):
+    file_path = str(tmp_path / "a.md")
+    with open(file_path, "w", encoding="utf-8") as f:
+        f.write("")
+    document = QTextDocument()
+    document.documentLayout()
+    saver = AutoSaver(FileHandler(), idle_ms=0)
+    saver.set_history_limits(1024 * 1024, max_undo_steps)
+    saver.attach(document, file_path)
+    cursor = QTextCursor(document)
+    for index in range(10):
+        cursor.insertText(f"{index}\n")
+    return saver, document, file_path
+
+
+def test_save_keeps_undo_stack(qapp, tmp_path):
+    saver, document, file_path = make_saver(tmp_path, 5)
+    saver.save()
+    assert wait_until(qapp, lambda: not saver.is_saving())
+    assert document.isUndoAvailable()
+    with open(file_path, encoding="utf-8") as f:
+        assert f.read() == document.toPlainText()
+    saver.shutdown()
+
+
+def test_trim_undo_is_opt_in(qapp, tmp_path):
+    saver, document, _ = make_saver(tmp_path, 0)
+    assert not saver.trim_undo()
+    assert document.isUndoAvailable()
+    saver.max_undo_steps = 5
+    assert saver.trim_undo()
+    assert not document.isUndoAvailable()
+    saver.shutdown()
+
+
+def test_default_undo_cap(qapp):
+    saver = AutoSaver(FileHandler(), idle_ms=0)
+    assert saver.max_undo_steps == DEFAULT_MAX_UNDO_STEPS > 0
+    saver.shutdown()
+
+
+def test_manual_save_trims_after_success(qapp, tmp_path):
+    saver, document, _ = make_saver(tmp_path, 5)
+    notices = []
+    saver.saved.connect(lambda path: notices.append(saver.undo_trimmed))
+    saver.save(trim_undo=True)
+    assert wait_until(qapp, lambda: not saver.is_saving())
+    assert notices == [True]
+    assert not document.isUndoAvailable()
+    saver.shutdown()
+
+
+def test_failed_manual_save_keeps_undo(qapp, tmp_path, monkeypatch):
+    saver, document, _ = make_saver(tmp_path, 5)
+
+    def fail(path, content):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(saver.file_handler, "save_file", fail)
+    failures = []
+    saver.save_failed.connect(lambda path, error: failures.append(error))
+    saver.save(trim_undo=True)
+    assert wait_until(qapp, lambda: not saver.is_saving())
+    assert failures == ["disk full"]
+    assert document.isUndoAvailable()
+    assert not saver.undo_trimmed
+
+    # 之后的自动保存成功也不会带上这次失败的手动保存的提示
+    monkeypatch.undo()
+    notices = []
+    saver.saved.connect(lambda path: notices.append(saver.undo_trimmed))
+    saver.save()
+    assert wait_until(qapp, lambda: not saver.is_saving())
+    assert notices == [False]
+    assert document.isUndoAvailable()
+    saver.shutdown()
+
+
+def test_recent_files_updated_on_gui_thread(qapp, tmp_path, monkeypatch):
+    import threading
+
+    saver, document, file_path = make_saver(tmp_path, 0)
+    threads = []
+    add_recent_file = saver.file_handler.add_recent_file
+
+    def record(path):
+        threads.append(threading.current_thread())
+        add_recent_file(path)
+
+    monkeypatch.setattr(saver.file_handler, "add_recent_file", record)
+    saver.save()
+    assert wait_until(qapp, lambda: not saver.is_saving())
+    assert threads == [threading.main_thread()]
+    assert saver.file_handler.get_recent_files() == [file_path]
+    saver.shutdown()
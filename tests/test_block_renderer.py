@@ -0,0 +1,43 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FlowMark 增量块级渲染测试
+"""
+
+from flowmark.utils.block_renderer import BlockRenderer, split_blocks
+
+
+def render(text):
+    return "<p>%s</p>" % text
+
+
+def test_split_blocks_keeps_fences_and_lists():
+    text = "# 标题\n\n```\na\n\nb\n```\n\n- 一\n\n- 二\n\n段落"
+    assert [block.text for block in split_blocks(text)] == [
+        "# 标题", "```\na\n\nb\n```", "- 一\n\n- 二", "段落"
+    ]
+
+
+def test_unchanged_blocks_are_cached():
+    renderer = BlockRenderer(render)
+    renderer.render("a\n\nb\n\nc")
+    renderer.render("a\n\nB\n\nc")
+    assert renderer.stats()["misses"] == 4
+    assert renderer.stats()["hits"] == 2
+
+
+def test_cache_is_bounded_by_characters():
+    renderer = BlockRenderer(render, cache_chars=100)
+    text = "\n\n".join("块%03d" % number for number in range(1000))
+    assert renderer.render(text).count("<p>") == 1000
+    stats = renderer.stats()
+    assert stats["chars"] <= 100
+    assert stats["size"] == stats["chars"] // len("块000" + render("块000"))
+
+
+def test_block_larger_than_cache_is_not_stored():
+    renderer = BlockRenderer(render, cache_chars=10)
+    assert renderer.render("x" * 20) == render("x" * 20)
+    assert renderer.stats()["size"] == 0
+    assert renderer.stats()["chars"] == 0
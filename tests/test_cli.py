@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FlowMark 命令行测试
+"""
+
+import json
+
+from flowmark.cli import convert, main
+
+
+def write(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding="utf-8")
+    return str(path)
+
+
+def test_convert_cache_depends_on_extensions(tmp_path):
+    source = write(tmp_path / "a.md", "正文[^1]\n\n[^1]: 脚注")
+    cache_path = str(tmp_path / "cache.json")
+    stats = convert([source], jobs=1, cache_path=cache_path, quiet=True)
+    assert stats["converted"] == 1
+    assert convert([source], jobs=1, cache_path=cache_path, quiet=True)["skipped"] == 1
+
+    stats = convert([source], jobs=1, cache_path=cache_path, quiet=True, extensions=["footnotes"])
+    assert stats["converted"] == 1
+    with open(str(tmp_path / "a.html"), encoding="utf-8") as f:
+        assert "footnote" in f.read()
+
+
+def test_convert_keeps_cache_entries_of_other_inputs(tmp_path):
+    first = write(tmp_path / "a" / "one.md", "# 一")
+    second = write(tmp_path / "b" / "two.md", "# 二")
+    cache_path = str(tmp_path / "cache.json")
+    convert([str(tmp_path / "a")], jobs=1, cache_path=cache_path, quiet=True)
+    convert([str(tmp_path / "b")], jobs=1, cache_path=cache_path, quiet=True)
+    with open(cache_path, encoding="utf-8") as f:
+        cache = json.load(f)
+    assert {str(tmp_path / "a" / "one.md"), str(tmp_path / "b" / "two.md")} <= set(cache)
+    assert convert([first, second], jobs=1, cache_path=cache_path, quiet=True)["skipped"] == 2
+
+
+def test_export_command(tmp_path, capsys):
+    (tmp_path / "notes").mkdir()
+    write(tmp_path / "notes" / "a.md", "# A\n\n![x](x.png)")
+    (tmp_path / "notes" / "x.png").write_bytes(b"\x89PNG\r\n\x1a\n")
+    output = tmp_path / "build"
+    assert main(["export", str(tmp_path / "notes"), "-o", str(output), "--no-embed", "-q"]) == 0
+    assert 'src="../notes/x.png"' in (output / "a.html").read_text(encoding="utf-8")
+    assert "导出 1 个，失败 0 个" in capsys.readouterr().out
+
+    single = tmp_path / "single.html"
+    assert main(["export", str(tmp_path / "notes" / "a.md"), "-o", str(single), "-q"]) == 0
+    assert 'src="data:image/png;base64,' in single.read_text(encoding="utf-8")
+
+
+def test_pdf_command(tmp_path, capsys):
+    source = write(tmp_path / "a.md", "# 标题\n\n" + "正文\n\n" * 200)
+    target = tmp_path / "a.pdf"
+    assert main(["pdf", source, "-o", str(target), "-j", "1", "-q"]) == 0
+    with open(str(target), "rb") as f:
+        assert f.read(5) == b"%PDF-"
+    assert "导出 1 个，失败 0 个" in capsys.readouterr().out
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FlowMark 按块差异更新文档测试
+"""
+
+import random
+
+from PyQt6.QtGui import QTextDocument
+
+from flowmark.editor.document_patch import block_opcodes, map_block, patch_document
+
+
+def test_map_block():
+    old = ["a", "b", "c", "d"]
+    new = ["x", "a", "b", "d"]
+    opcodes = block_opcodes(old, new)
+    assert [map_block(opcodes, number) for number in range(4)] == [1, 2, 3, 3]
+
+
+def test_patch_keeps_untouched_blocks(qapp):
+    lines = [f"line {index}" for index in range(200)]
+    document = QTextDocument()
+    document.setPlainText("\n".join(lines))
+    document.documentLayout()
+    untouched = document.findBlockByNumber(150)
+    layout = untouched.layout()
+    new_lines = ["new"] + lines[:50] + ["changed"] + lines[51:100] + lines[101:]
+    opcodes = patch_document(document, "\n".join(new_lines))
+    assert document.toPlainText() == "\n".join(new_lines)
+    # 未变化的块是同一个块（排版被保留），块号按差异映射
+    assert document.findBlockByNumber(map_block(opcodes, 150)).layout() is layout
+    document.undo()
+    assert document.toPlainText() == "\n".join(lines)
+
+
+def test_randomized_patch(qapp):
+    rng = random.Random(3)
+    for trial in range(300):
+        old = [rng.choice("abcde") for _ in range(rng.randint(1, 12))]
+        new = [rng.choice("abcdef") for _ in range(rng.randint(1, 12))]
+        document = QTextDocument()
+        document.setPlainText("\n".join(old))
+        patch_document(document, "\n".join(new))
+        assert document.toPlainText() == "\n".join(new), (old, new)
+        # 整个更新是一次撤销
+        document.undo()
+        assert document.toPlainText() == "\n".join(old), (old, new)
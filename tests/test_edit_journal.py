@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FlowMark 编辑日志测试
+"""
+
+import os
+import subprocess
+import sys
+
+from flowmark.ui.autosave import AutoSaver
+from flowmark.utils.edit_journal import EditJournal, apply_edits
+
+
+def exited_pid():
+    """一个已经退出的进程的 PID"""
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def write_untitled(directory, name, text):
+    journal = EditJournal(os.path.join(directory, name))
+    journal.start(None)
+    journal.record(0, 0, text)
+    journal.close()
+    return journal.journal_path
+
+
+def test_apply_edits_uses_utf16_positions():
+    # 😀 占两个 UTF-16 代码单元
+    assert apply_edits("😀ab", [(2, 1, "X")]) == "😀Xb"
+    assert apply_edits("abc", [(1, 1, ""), (0, 0, ">")]) == ">ac"
+
+
+def test_recover_and_commit(tmp_path):
+    file_path = tmp_path / "a.md"
+    file_path.write_text("hello", encoding="utf-8")
+    journal = EditJournal(EditJournal.path_for(str(file_path), str(tmp_path)))
+    journal.start(str(file_path))
+    journal.record(5, 0, " world")
+    checkpoint = journal.checkpoint()
+    journal.record(0, 1, "H")
+    assert EditJournal.recover(journal.journal_path, "hello") == "Hello world"
+
+    # 保存到 checkpoint 后只保留之后的编辑
+    file_path.write_text("hello world", encoding="utf-8")
+    journal.commit(checkpoint, str(file_path))
+    assert EditJournal.recover(journal.journal_path, "hello world") == "Hello world"
+    journal.close()
+
+
+def test_recover_ignores_torn_tail(tmp_path):
+    journal = EditJournal(str(tmp_path / "j.journal"))
+    journal.start(None)
+    journal.record(0, 0, "abc")
+    journal.close()
+    with open(journal.journal_path, "a", encoding="utf-8") as f:
+        f.write('[3, 0, "de')
+    assert EditJournal.recover(journal.journal_path, "") == "abc"
+
+
+def test_find_untitled_skips_running_processes(tmp_path):
+    directory = str(tmp_path)
+    orphan = write_untitled(directory, f"untitled-{exited_pid()}-3.journal", "lost")
+    write_untitled(directory, f"untitled-{os.getpid()}-1.journal", "mine")
+    write_untitled(directory, f"untitled-{os.getppid()}.journal", "other instance")
+    assert EditJournal.find_untitled(directory) == [orphan]
+
+
+def test_recover_untitled_keeps_journals_until_discarded(tmp_path):
+    directory = str(tmp_path)
+    orphan = write_untitled(directory, f"untitled-{exited_pid()}.journal", "lost")
+    live = write_untitled(directory, f"untitled-{os.getppid()}-2.journal", "other instance")
+
+    recovered = AutoSaver.recover_untitled(directory)
+    assert recovered == [(orphan, "lost")]
+    # 用户作出选择之前日志保留，其他实例的日志始终不动
+    assert os.path.exists(orphan)
+    AutoSaver.discard_untitled(path for path, text in recovered)
+    assert not os.path.exists(orphan)
+    assert os.path.exists(live)
+
+
+def test_base_copy_follows_journal(tmp_path):
+    file_path = tmp_path / "a.md"
+    file_path.write_text("**hi** there", encoding="utf-8")
+    journal = EditJournal(str(tmp_path / "old.journal"))
+    journal.start(str(file_path))
+    digest = EditJournal.write_base(journal.journal_path, "hi there")
+    journal.commit(journal.checkpoint(), str(file_path), digest)
+    journal.record(8, 0, "!")
+    assert EditJournal.recover(journal.journal_path, "**hi** there") == "hi there!"
+
+    # 另存为移动日志时副本随之移动
+    journal.move(str(tmp_path / "new.journal"))
+    assert EditJournal.recover(journal.journal_path, "") == "hi there!"
+    assert not os.path.exists(EditJournal.base_path(str(tmp_path / "old.journal"), digest))
+
+    # 副本丢失时无法可靠重放
+    os.remove(EditJournal.base_path(journal.journal_path, digest))
+    assert EditJournal.recover(journal.journal_path, "**hi** there") is None
+    journal.discard()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FlowMark 外部修改监视测试
+"""
+
+import os
+
+from flowmark.ui.file_watcher import FileWatcher
+from tests.conftest import wait_until
+
+
+def make_watcher(file_path):
+    watcher = FileWatcher(debounce_ms=20)
+    changes = []
+    watcher.changed.connect(lambda path, text: changes.append((path, text)))
+    watcher.removed.connect(lambda path: changes.append((path, None)))
+    watcher.watch(file_path)
+    # 等后台线程读取基准
+    watcher._executor.submit(lambda: None).result()
+    return watcher, changes
+
+
+def test_reports_changes_and_ignores_touch(qapp, tmp_path):
+    file_path = str(tmp_path / "a.md")
+    with open(file_path, "w", encoding="utf-8") as f:
+        f.write("one")
+    watcher, changes = make_watcher(file_path)
+
+    os.utime(file_path)
+    with open(file_path, "w", encoding="utf-8") as f:
+        f.write("two\r\n")
+    assert wait_until(qapp, lambda: changes)
+    assert changes == [(file_path, "two\n")]
+
+    # 原子替换后仍在监视
+    with open(file_path + ".tmp", "w", encoding="utf-8") as f:
+        f.write("three")
+    os.replace(file_path + ".tmp", file_path)
+    assert wait_until(qapp, lambda: len(changes) == 2)
+    assert changes[1] == (file_path, "three")
+
+    # 只改变修改时间不算修改
+    os.utime(file_path, ns=(1, 1))
+    assert not wait_until(qapp, lambda: len(changes) > 2, timeout=0.5)
+
+    os.remove(file_path)
+    assert wait_until(qapp, lambda: len(changes) == 3)
+    assert changes[2] == (file_path, None)
+    watcher.shutdown()
+
+
+def test_recheck_reports_unchanged_content(qapp, tmp_path):
+    file_path = str(tmp_path / "a.md")
+    with open(file_path, "w", encoding="utf-8") as f:
+        f.write("same")
+    watcher, changes = make_watcher(file_path)
+    watcher.recheck(file_path)
+    assert wait_until(qapp, lambda: changes)
+    assert changes == [(file_path, "same")]
+    watcher.shutdown()
+
+
+def test_change_during_save_is_applied_after_save(qapp, window, monkeypatch, tmp_path):
+    file_path = str(tmp_path / "doc.md")
+    with open(file_path, "w", encoding="utf-8") as f:
+        f.write("original\ntext")
+    window.load_file(file_path)
+    entry = window.document_pool.current
+    monkeypatch.setattr(entry.autosaver, "is_saving", lambda: True)
+    with open(file_path, "w", encoding="utf-8") as f:
+        f.write("original\nexternal")
+    window.on_external_change(os.path.abspath(file_path), "original\nexternal")
+    assert window.editor.toPlainText() == "original\ntext"
+
+    # 保存结束后重新检查，外部修改不会丢失
+    monkeypatch.setattr(entry.autosaver, "is_saving", lambda: False)
+    window.on_saved(file_path)
+    assert wait_until(qapp, lambda: window.editor.toPlainText() == "original\nexternal")
+    assert not entry.is_modified()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FlowMark HTML 导出测试
+"""
+
+from flowmark.utils.html_exporter import HtmlExporter
+from flowmark.utils.markdown_converter import MarkdownConverter
+
+# 1x1 的 PNG
+PNG = bytes.fromhex(
+    "89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+    "1f15c4890000000d49444154789c6360000002000154a24f5d0000000049454e44ae426082"
+)
+
+
+def write_images(directory, count):
+    for index in range(count):
+        (directory / f"{index}.png").write_bytes(PNG * 100)
+
+
+def test_whole_document_export_bounds_pending_images(tmp_path, monkeypatch):
+    write_images(tmp_path, 40)
+    text = "正文[^1]\n\n" + "\n\n".join(f"![{index}]({index}.png)" for index in range(40)) + "\n\n[^1]: 脚注"
+    converter = MarkdownConverter(extensions=["footnotes"])
+    assert not converter.is_block_safe()
+    # 只够同时容纳两张图片
+    exporter = HtmlExporter(converter, jobs=2, max_pending_bytes=len(PNG) * 100 * 4 // 3 * 2)
+    peak = []
+    write_block = HtmlExporter._write_block
+
+    def record(self, f, item, images, *args):
+        peak.append(len(images))
+        return write_block(self, f, item, images, *args)
+
+    monkeypatch.setattr(HtmlExporter, "_write_block", record)
+    target = tmp_path / "out.html"
+    stats = exporter.export(text, str(target), base_dir=str(tmp_path))
+    assert stats["images"] == 40 and stats["missing"] == 0
+    assert max(peak) <= 3
+    content = target.read_text(encoding="utf-8")
+    assert content.count('src="data:image/png;base64,') == 40
+    assert 'class="footnote"' in content
+
+
+def test_images_are_embedded_as_data_uris(tmp_path):
+    (tmp_path / "a.png").write_bytes(PNG)
+    target = tmp_path / "out" / "doc.html"
+    stats = HtmlExporter(MarkdownConverter()).export("# 标题\n\n![a](a.png)", str(target), base_dir=str(tmp_path))
+    content = target.read_text(encoding="utf-8")
+    assert stats["images"] == 1 and stats["missing"] == 0
+    assert '<img alt="a" src="data:image/png;base64,iVBORw0KGgo' in content
+    assert "<title>标题</title>" in content and "<style>" in content
+
+
+def test_missing_image_keeps_original_src(tmp_path):
+    target = tmp_path / "doc.html"
+    stats = HtmlExporter(MarkdownConverter()).export("![a](missing.png)", str(target), base_dir=str(tmp_path))
+    assert stats["images"] == 0 and stats["missing"] == 1
+    assert 'src="missing.png"' in target.read_text(encoding="utf-8")
+
+
+def test_no_embed_rewrites_paths_relative_to_target(tmp_path):
+    (tmp_path / "images").mkdir()
+    (tmp_path / "images" / "a b.png").write_bytes(PNG)
+    target = tmp_path / "build" / "html" / "doc.html"
+    exporter = HtmlExporter(MarkdownConverter(), self_contained=False)
+    exporter.export("![a](images/a%20b.png)\n\n![r](https://example.com/r.png)", str(target), base_dir=str(tmp_path))
+    content = target.read_text(encoding="utf-8")
+    assert 'src="../../images/a%20b.png"' in content
+    assert 'src="https://example.com/r.png"' in content
+    assert "data:" not in content
+
+
+def test_cancel_leaves_target_untouched(tmp_path):
+    target = tmp_path / "doc.html"
+    target.write_text("旧的导出", encoding="utf-8")
+    text = "\n\n".join(f"段落 {index}" for index in range(100))
+    calls = []
+
+    def cancelled():
+        calls.append(None)
+        return len(calls) > 10
+
+    stats = HtmlExporter(MarkdownConverter()).export(text, str(target), cancelled=cancelled)
+    assert stats["cancelled"]
+    assert target.read_text(encoding="utf-8") == "旧的导出"
+    assert [path.name for path in tmp_path.iterdir()] == ["doc.html"]
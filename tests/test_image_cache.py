@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FlowMark 预览图片缓存测试
+"""
+
+from PyQt6.QtCore import Qt
+from PyQt6.QtGui import QImage
+
+from flowmark.preview.image_cache import ImageCache
+from flowmark.preview.markdown_preview import MarkdownPreview
+from tests.conftest import wait_until
+
+
+def make_image(path):
+    image = QImage(64, 32, QImage.Format.Format_RGB32)
+    image.fill(Qt.GlobalColor.red)
+    assert image.save(str(path))
+    return str(path)
+
+
+def test_executor_created_on_first_decode(qapp, tmp_path):
+    cache = ImageCache(cache_dir=str(tmp_path / "thumbnails"))
+    assert cache._executor is None
+    path = make_image(tmp_path / "a.png")
+    assert cache.is_placeholder(cache.image(path))
+    assert cache._executor is not None
+    assert wait_until(qapp, lambda: not cache.is_pending())
+    image = cache.image(path)
+    assert image is not None and not cache.is_placeholder(image)
+    cache.shutdown()
+
+
+def test_shutdown_without_images(qapp, tmp_path):
+    cache = ImageCache(cache_dir=str(tmp_path / "thumbnails"))
+    cache.shutdown()
+    assert cache._executor is None
+
+
+def test_preview_requests_cache_on_first_image(qapp, tmp_path):
+    created = []
+
+    def factory():
+        created.append(ImageCache(cache_dir=str(tmp_path / "thumbnails")))
+        return created[-1]
+
+    preview = MarkdownPreview()
+    preview.set_render_mode(True)
+    preview.set_image_cache(factory, lambda: str(tmp_path))
+    preview.show()
+    preview.setHtml("<p>没有图片</p>")
+    qapp.processEvents()
+    assert not created
+
+    make_image(tmp_path / "b.png")
+    preview.setHtml('<p><img src="b.png"></p>')
+    qapp.processEvents()
+    assert len(created) == 1
+    assert preview.image_cache() is created[0]
+    assert wait_until(qapp, lambda: not created[0].is_pending())
+    created[0].shutdown()
+    preview.deleteLater()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FlowMark 主窗口菜单操作测试
+"""
+
+import os
+
+from PyQt6.QtGui import QAction
+from PyQt6.QtWidgets import QFileDialog
+
+from tests.conftest import wait_until
+
+
+def find_action(window, text):
+    """按名称查找菜单操作"""
+    for action in window.findChildren(QAction):
+        if action.text() == text:
+            return action
+    raise LookupError(text)
+
+
+def test_export_pdf_action(qapp, window, slot_errors, monkeypatch, tmp_path):
+    target = str(tmp_path / "out.pdf")
+    monkeypatch.setattr(QFileDialog, "getSaveFileName", lambda *args, **kwargs: (target, ""))
+    window.editor.set_plain_text("# 标题\n\n正文")
+    find_action(window, "导出为 PDF").trigger()
+    assert not slot_errors
+    assert wait_until(qapp, lambda: not window.export_worker.is_busy() and os.path.exists(target))
+    with open(target, "rb") as f:
+        assert f.read(5) == b"%PDF-"
+
+
+def test_export_html_action(qapp, window, slot_errors, monkeypatch, tmp_path):
+    target = str(tmp_path / "out.html")
+    monkeypatch.setattr(QFileDialog, "getSaveFileName", lambda *args, **kwargs: (target, ""))
+    window.editor.set_plain_text("# 标题\n\n正文")
+    find_action(window, "导出为 HTML").trigger()
+    assert not slot_errors
+    assert wait_until(qapp, lambda: not window.export_worker.is_busy() and os.path.exists(target))
+    with open(target, encoding="utf-8") as f:
+        assert "<title>标题</title>" in f.read()
+
+
+def test_copy_as_markdown_action(qapp, window, slot_errors):
+    window.editor.set_plain_text("# 标题\n\n**粗体**")
+    find_action(window, "复制为 Markdown").trigger()
+    assert not slot_errors
+    mime_data = qapp.clipboard().mimeData()
+    assert bytes(mime_data.data("text/markdown")).decode("utf-8") == "# 标题\n\n**粗体**"
+    assert "<h1" in mime_data.html()
+
+
+def test_chunked_paste(qapp, window, monkeypatch):
+    from PyQt6.QtCore import QMimeData
+
+    editor = window.editor
+    monkeypatch.setattr(editor, "LARGE_PASTE_CHARS", 1000)
+    monkeypatch.setattr(editor, "PASTE_CHUNK_CHARS", 100)
+    editor.set_plain_text("head\ntail")
+    cursor = editor.textCursor()
+    cursor.setPosition(5)
+    editor.setTextCursor(cursor)
+    text = "".join(f"line {index}\n" for index in range(500))
+    mime_data = QMimeData()
+    mime_data.setText(text)
+    mime_data.setHtml("<b>ignored</b>")
+    editor.insertFromMimeData(mime_data)
+
+    assert editor.is_pasting() and editor.isReadOnly()
+    assert not find_action(window, "打开").isEnabled()
+    assert not find_action(window, "关闭标签页").isEnabled()
+    assert not window.tab_bar.isEnabled()
+    assert wait_until(qapp, lambda: not editor.is_pasting())
+    assert editor.toPlainText() == "head\n" + text + "tail"
+    assert not editor.isReadOnly()
+    assert find_action(window, "打开").isEnabled()
+    editor.document().undo()
+    assert editor.toPlainText() == "head\ntail"
+
+
+def test_chunked_paste_restores_read_only(qapp, window, monkeypatch):
+    editor = window.editor
+    monkeypatch.setattr(editor, "PASTE_CHUNK_CHARS", 10)
+    # 例如后台流式加载期间编辑器是只读的，粘贴结束后仍应保持只读
+    editor.setReadOnly(True)
+    editor.paste_text("x" * 100)
+    assert wait_until(qapp, lambda: not editor.is_pasting())
+    assert editor.isReadOnly()
+
+
+def test_image_cache_not_created_at_startup(window):
+    assert window._image_cache is None
+
+
+def test_close_with_save_keeps_formatting(qapp, window, monkeypatch, tmp_path):
+    from PyQt6.QtGui import QFont, QTextCharFormat, QTextCursor
+    from PyQt6.QtWidgets import QMessageBox
+
+    target = tmp_path / "formatted.md"
+    target.write_text("粗体 正文", encoding="utf-8")
+    window.load_file(str(target))
+    entry = window.document_pool.current
+    cursor = QTextCursor(entry.document)
+    cursor.setPosition(2, QTextCursor.MoveMode.KeepAnchor)
+    char_format = QTextCharFormat()
+    char_format.setFontWeight(QFont.Weight.Bold)
+    cursor.mergeCharFormat(char_format)
+    assert entry.is_modified()
+
+    monkeypatch.setattr(QMessageBox, "question", lambda *args, **kwargs: QMessageBox.StandardButton.Save)
+    window.close_document(entry)
+    assert wait_until(qapp, lambda: entry not in window.document_pool.documents())
+    assert target.read_text(encoding="utf-8") == "**粗体** 正文"
+
+
+def test_close_with_save_runs_in_background(qapp, window, monkeypatch, tmp_path):
+    import threading
+
+    from PyQt6.QtWidgets import QMessageBox
+
+    from flowmark.utils.revision_history import RevisionHistory, history_path
+
+    target = tmp_path / "note.md"
+    target.write_text("旧内容", encoding="utf-8")
+    window.load_file(str(target))
+    entry = window.document_pool.current
+    window.editor.selectAll()
+    window.editor.insertPlainText("新内容")
+    threads = []
+    save_file = entry.autosaver.file_handler.save_file
+
+    def failing_save(file_path, content):
+        threads.append(threading.current_thread())
+        raise OSError("磁盘已满")
+
+    monkeypatch.setattr(QMessageBox, "question", lambda *args, **kwargs: QMessageBox.StandardButton.Save)
+    monkeypatch.setattr(QMessageBox, "critical", lambda *args, **kwargs: QMessageBox.StandardButton.Ok)
+    monkeypatch.setattr(entry.autosaver.file_handler, "save_file", failing_save)
+    assert not window.close_document(entry)
+    assert wait_until(qapp, lambda: not window.closing_documents)
+    # 保存失败时保留标签页和未保存的修改，保存不在 GUI 线程中进行
+    assert threads and threads[0] is not threading.current_thread()
+    assert entry in window.document_pool.documents() and entry.is_modified()
+
+    monkeypatch.setattr(entry.autosaver.file_handler, "save_file", save_file)
+    window.close_document(entry)
+    assert wait_until(qapp, lambda: entry not in window.document_pool.documents())
+    assert target.read_text(encoding="utf-8") == "新内容"
+    # 与普通保存一样记录修订
+    history = RevisionHistory(history_path(str(target)))
+    assert history.text(history.revisions()[-1][0]) == "新内容"
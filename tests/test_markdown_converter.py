@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FlowMark Markdown 转换测试
+"""
+
+from flowmark.utils.markdown_converter import MarkdownConverter
+
+
+def test_to_html_is_cached():
+    converter = MarkdownConverter()
+    html = converter.to_html("# 标题")
+    assert "<h1" in html
+    assert converter.to_html("# 标题") is html
+
+
+def test_concurrent_miss_on_same_key_counts_once(monkeypatch):
+    converter = MarkdownConverter(cache_chars=100)
+    render = converter.block_renderer.render
+    nested = []
+
+    def render_with_concurrent_miss(text):
+        # 模拟另一个线程在本次渲染期间对同一文本未命中并写入缓存
+        if not nested:
+            nested.append(text)
+            converter.to_html(text)
+        return render(text)
+
+    monkeypatch.setattr(converter.block_renderer, "render", render_with_concurrent_miss)
+    html = converter.to_html("para")
+    assert converter._cache_chars == len(html)
+    # 计数没有漂移，之后的写入和淘汰不会在空缓存上 popitem
+    for index in range(50):
+        converter.to_html(f"paragraph {index}")
+    assert converter._cache_chars == sum(len(value) for value in converter._cache.values())
+
+
+def test_preview_blocks_seed_whole_document_cache(monkeypatch):
+    converter = MarkdownConverter()
+    text = "# 标题\n\n正文\n\n- 列表"
+    blocks = converter.to_html_blocks(text)
+
+    def fail(text):
+        raise AssertionError("预览之后导出不应再次渲染")
+
+    monkeypatch.setattr(converter.block_renderer, "render", fail)
+    html = converter.to_html(text)
+    assert html == "\n".join(block.html for block in blocks if block.html)
+    assert converter.to_html(text) is html
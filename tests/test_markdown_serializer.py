@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FlowMark 富文本序列化测试
+"""
+
+import os
+import random
+
+from PyQt6.QtGui import QFont, QTextCharFormat, QTextCursor, QTextDocument
+
+from flowmark.editor.markdown_serializer import MarkdownSerializer, serialize_runs
+from flowmark.ui.autosave import AutoSaver
+from flowmark.utils.file_handler import FileHandler
+from tests.conftest import wait_until
+
+_BOLD, _ITALIC, _UNDERLINE = 1, 2, 0
+
+
+def fresh_markdown(document, start=None, end=None):
+    """不使用缓存重新序列化"""
+    serializer = MarkdownSerializer(document)
+    try:
+        return serializer.to_markdown(start, end)
+    finally:
+        document.contentsChange.disconnect(serializer._on_contents_change)
+        serializer.setParent(None)
+
+
+def apply_format(document, start, end, kind):
+    cursor = QTextCursor(document)
+    cursor.setPosition(start)
+    cursor.setPosition(end, QTextCursor.MoveMode.KeepAnchor)
+    char_format = QTextCharFormat()
+    if kind == "bold":
+        char_format.setFontWeight(QFont.Weight.Bold)
+    elif kind == "italic":
+        char_format.setFontItalic(True)
+    elif kind == "underline":
+        char_format.setFontUnderline(True)
+    else:
+        char_format.setFontWeight(QFont.Weight.Normal)
+        char_format.setFontItalic(False)
+        char_format.setFontUnderline(False)
+    cursor.mergeCharFormat(char_format)
+
+
+def test_serialize_runs():
+    assert serialize_runs([((), "a "), ((_BOLD,), "b"), ((), " c")]) == "a **b** c"
+    assert serialize_runs([((_BOLD,), "a "), ((_BOLD, _ITALIC), "b")]) == "**a *b***"
+    assert serialize_runs([((_UNDERLINE,), " u ")]) == " <u>u</u> "
+
+
+def test_plain_document_is_returned_unchanged(qapp):
+    document = QTextDocument()
+    document.setPlainText("# 标题\n\n正文 **原样**")
+    assert MarkdownSerializer.for_document(document).to_markdown() == "# 标题\n\n正文 **原样**"
+    assert MarkdownSerializer.for_document(document).to_markdown(0, 4) == "# 标题"
+
+
+def test_randomized_edit_format_undo(qapp):
+    rng = random.Random(7)
+    words = ["alpha", "beta", "中文", "😀", " ", "\n", "gamma delta"]
+    document = QTextDocument()
+    document.setPlainText("start\nof the\ndocument")
+    serializer = MarkdownSerializer.for_document(document)
+    for step in range(400):
+        length = document.characterCount() - 1
+        operation = rng.random()
+        cursor = QTextCursor(document)
+        if operation < 0.35:
+            cursor.setPosition(rng.randint(0, length))
+            cursor.insertText("".join(rng.choice(words) for _ in range(rng.randint(1, 4))))
+        elif operation < 0.5 and length:
+            start = rng.randint(0, length - 1)
+            cursor.setPosition(start)
+            cursor.setPosition(min(length, start + rng.randint(1, 8)), QTextCursor.MoveMode.KeepAnchor)
+            cursor.removeSelectedText()
+        elif operation < 0.8 and length:
+            start = rng.randint(0, length - 1)
+            end = min(length, start + rng.randint(1, 20))
+            apply_format(document, start, end, rng.choice(["bold", "italic", "underline", "plain"]))
+        elif operation < 0.9:
+            document.undo()
+        else:
+            document.redo()
+        assert serializer.to_markdown() == fresh_markdown(document), step
+        length = document.characterCount() - 1
+        start = rng.randint(0, length)
+        end = rng.randint(start, length)
+        assert serializer.to_markdown(start, end) == fresh_markdown(document, start, end), step
+
+
+def test_recover_after_saving_formatted_document(qapp, tmp_path):
+    file_path = str(tmp_path / "rich.md")
+    with open(file_path, "w", encoding="utf-8") as f:
+        f.write("hello world")
+    document = QTextDocument()
+    document.setPlainText("hello world")
+    document.documentLayout()
+    saver = AutoSaver(FileHandler(), idle_ms=0)
+    saver.attach(document, file_path)
+    apply_format(document, 0, 5, "bold")
+    saver.save()
+    assert wait_until(qapp, lambda: not saver.is_saving())
+    with open(file_path, encoding="utf-8") as f:
+        disk_text = f.read()
+    assert disk_text == "**hello** world"
+
+    # 保存后的编辑位置对应文档文本，而不是带标记的文件内容
+    cursor = QTextCursor(document)
+    cursor.setPosition(11)
+    cursor.insertText("!")
+    cursor.setPosition(6)
+    cursor.insertText("big ")
+    assert AutoSaver.recover(file_path, disk_text) == document.toPlainText() == "hello big world!"
+    saver.shutdown()
+
+
+def test_journal_base_text_is_written_only_when_it_changes(qapp, tmp_path, monkeypatch):
+    import glob
+    import json
+
+    from flowmark.utils.edit_journal import EditJournal
+
+    monkeypatch.setattr(EditJournal, "path_for", staticmethod(
+        lambda file_path, directory=str(tmp_path / "journal"), key=None: os.path.join(directory, "doc.journal")
+    ))
+    file_path = str(tmp_path / "rich.md")
+    with open(file_path, "w", encoding="utf-8") as f:
+        f.write("hello world")
+    document = QTextDocument()
+    document.setPlainText("hello world")
+    document.documentLayout()
+    saver = AutoSaver(FileHandler(), idle_ms=0)
+    saver.attach(document, file_path)
+    apply_format(document, 0, 5, "bold")
+    writes = []
+    write_base = EditJournal.write_base
+    monkeypatch.setattr(EditJournal, "write_base", staticmethod(
+        lambda journal_path, text: writes.append(text) or write_base(journal_path, text)
+    ))
+
+    def save():
+        assert saver.save()
+        assert wait_until(qapp, lambda: not saver.is_saving())
+        return glob.glob(str(tmp_path / "journal" / "doc.journal.*.base"))
+
+    first = save()
+    assert len(first) == 1
+    modified = os.path.getmtime(first[0])
+    # 只改格式，文档文本不变：副本不重写
+    apply_format(document, 6, 11, "italic")
+    assert save() == first and os.path.getmtime(first[0]) == modified
+    with open(str(tmp_path / "journal" / "doc.journal"), encoding="utf-8") as f:
+        header = json.loads(f.readline())
+    assert "text" not in header and "hello world" not in json.dumps(header)
+
+    # 文本变化后写入新副本，旧副本被清理
+    cursor = QTextCursor(document)
+    cursor.setPosition(11)
+    cursor.insertText("!")
+    second = save()
+    assert len(second) == 1 and second != first
+    assert len(writes) == 3
+    saver.shutdown()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FlowMark 修订历史测试
+"""
+
+import os
+
+from flowmark.utils.revision_history import RevisionHistory, history_path, text_delta
+
+
+def test_text_delta():
+    assert text_delta("hello world", "hello brave world") == (6, 6, "brave ")
+    assert text_delta("abc", "abc") == (3, 3, "")
+    old = "x" * 10000 + "a" + "y" * 10000
+    assert text_delta(old, old.replace("a", "bc")) == (10000, 10001, "bc")
+
+
+def test_rebuild_every_revision():
+    history = RevisionHistory(snapshot_interval=4)
+    texts = [f"line {i}\n" * (i + 1) for i in range(20)]
+    ids = [history.commit(text) for text in texts]
+    assert history.commit(texts[-1]) is None
+    for revision_id, text in zip(ids, texts):
+        assert history.text(revision_id) == text
+
+
+def test_persisted_history(tmp_path):
+    path = history_path(str(tmp_path / "a.md"))
+    history = RevisionHistory(path)
+    for text in ("a", "ab", "abc"):
+        history.commit(text)
+    reloaded = RevisionHistory(path)
+    assert [reloaded.text(revision_id) for revision_id, _, _ in reloaded.revisions()] == ["a", "ab", "abc"]
+
+
+def test_eviction_keeps_ids(tmp_path):
+    history = RevisionHistory(str(tmp_path / "h"), max_bytes=2000, snapshot_interval=2)
+    texts = [os.urandom(200).hex() for _ in range(20)]
+    ids = [history.commit(text) for text in texts]
+    revisions = history.revisions()
+    assert len(revisions) < len(texts)
+    assert revisions[-1][0] == ids[-1]
+    for revision_id, _, _ in revisions:
+        assert history.text(revision_id) == texts[revision_id]
+    reloaded = RevisionHistory(str(tmp_path / "h"))
+    assert reloaded.revisions() == revisions
+
+
+def test_commit_after_torn_tail(tmp_path):
+    path = str(tmp_path / "h")
+    history = RevisionHistory(path)
+    for text in ("aaaa", "aaaab", "aaaac"):
+        history.commit(text)
+    # 模拟崩溃时最后一条记录只写了一半
+    with open(path, "r+b") as f:
+        f.truncate(os.path.getsize(path) - 1)
+
+    reopened = RevisionHistory(path)
+    assert [text for text in map(reopened.text, [0, 1])] == ["aaaa", "aaaab"]
+    revision_id = reopened.commit("z" * 100)
+
+    reloaded = RevisionHistory(path)
+    assert [revision[0] for revision in reloaded.revisions()] == [0, 1, revision_id]
+    assert reloaded.text(1) == "aaaab"
+    assert reloaded.text(revision_id) == "z" * 100
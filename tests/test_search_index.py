@@ -0,0 +1,42 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FlowMark 工作区搜索索引测试
+"""
+
+import flowmark.utils.search_index as search_index
+from flowmark.utils.search_index import SearchIndex, make_snippet
+
+
+def test_search_ranks_and_snippets(tmp_path):
+    (tmp_path / "a.md").write_text("# 笔记\n\n第一行\n性能优化的记录\n", encoding="utf-8")
+    (tmp_path / "b.md").write_text("# 其他\n\n无关内容\n", encoding="utf-8")
+    index = SearchIndex(str(tmp_path), str(tmp_path / "index.sqlite"))
+    assert index.update()["indexed"] == 2
+    results = index.search("性能优化")
+    assert [result.title for result in results] == ["笔记"]
+    assert results[0].line == 3
+    assert "性能优化" in results[0].snippet
+    index.close()
+
+
+def test_snippet_across_chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr(search_index, "SNIPPET_CHUNK_CHARS", 16)
+    path = tmp_path / "long.md"
+    path.write_text("line\n" * 20 + "xx needle yy\n" + "tail\n" * 50, encoding="utf-8")
+    line, snippet = make_snippet(str(path), "Needle", width=20)
+    assert line == 20
+    assert "needle yy" in snippet
+    assert snippet.startswith("...") and snippet.endswith("...")
+
+
+def test_snippet_reads_at_most_the_limit(tmp_path, monkeypatch):
+    monkeypatch.setattr(search_index, "SNIPPET_CHUNK_CHARS", 16)
+    path = tmp_path / "huge.md"
+    path.write_text("开头的内容\n" + "x" * 1000 + "\nneedle", encoding="utf-8")
+    # 限制之内没有匹配时退回到文件开头
+    line, snippet = make_snippet(str(path), "needle", width=20, read_limit=100)
+    assert line == 0
+    assert snippet.startswith("开头的内容")
+    assert make_snippet(str(path), "needle", width=20, read_limit=2000) == (2, "...xxxxx needle")
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FlowMark 源文本位置映射测试
+"""
+
+from PyQt6.QtGui import QTextCursor, QTextDocument
+
+from flowmark.preview.source_map import SourceMap
+from flowmark.utils.block_renderer import BlockRenderer
+
+
+def make_map(text):
+    document = QTextDocument()
+    # 没有排版对象的文档不会发出 contentsChange
+    document.documentLayout()
+    document.setPlainText(text)
+    source_map = SourceMap()
+    source_map.set_document(document)
+    blocks = BlockRenderer(lambda source: "<p>%s</p>" % source).render_blocks(text)
+    source_map.set_blocks(blocks, source_map.mark())
+    return document, source_map, blocks
+
+
+def insert_at_line(document, line, text):
+    cursor = QTextCursor(document.findBlockByNumber(line))
+    cursor.insertText(text)
+
+
+def test_blocks_and_lines(qapp):
+    _, source_map, _ = make_map("a\n\nb\nb\n\nc")
+    assert source_map.block_count == 3
+    assert source_map.block_for_line(3) == (1, 0.5)
+    assert source_map.line_for_block(2) == 5
+
+
+def test_edits_are_patched_until_next_render(qapp):
+    document, source_map, _ = make_map("a\n\nb\n\nc")
+    mark = source_map.mark()
+    insert_at_line(document, 2, "x\ny\n")
+    # 编辑器中的第 6 行对应渲染时的第 4 行（"c"）
+    assert source_map.source_line(6) == 4
+    assert source_map.editor_line(4) == 6
+    assert source_map.editor_line(0) == 0
+
+    # 用编辑之前提交的渲染结果重建，之后的编辑仍作为补丁保留
+    insert_at_line(document, 0, "z\n")
+    stale = BlockRenderer(lambda source: source).render_blocks("a\n\nx\ny\nb\n\nc")
+    source_map.set_blocks(stale, mark + 1)
+    assert source_map.source_line(7) == 6
+    assert source_map.editor_line(6) == 7
+
+
+def test_too_many_patches_drop_the_index(qapp):
+    document, source_map, _ = make_map("a")
+    for _ in range(SourceMap.MAX_PATCHES + 1):
+        insert_at_line(document, 0, "x\n")
+    assert source_map.block_count == 0
+    assert source_map.block_for_line(0) == (-1, 0.0)
+
+
+def test_folded_patches_match_applying_each_patch(qapp):
+    import random
+
+    def source_line(patches, line):
+        for first, old_last, new_last in reversed(patches):
+            if line > new_last:
+                line -= new_last - old_last
+            elif line >= first:
+                line = min(line, old_last + 1)
+        return max(0, line)
+
+    def editor_line(patches, line):
+        for first, old_last, new_last in patches:
+            if line > old_last:
+                line += new_last - old_last
+            elif line >= first:
+                line = min(line, new_last + 1)
+        return max(0, line)
+
+    document, source_map, _ = make_map("\n\n".join("p%d" % index for index in range(20)))
+    rng = random.Random(7)
+    for _ in range(60):
+        cursor = QTextCursor(document.findBlockByNumber(rng.randrange(document.blockCount())))
+        if rng.random() < 0.5:
+            cursor.insertText("x\n" * rng.randint(1, 3))
+        else:
+            cursor.movePosition(QTextCursor.MoveOperation.Down, QTextCursor.MoveMode.KeepAnchor, rng.randint(1, 3))
+            cursor.removeSelectedText()
+    patches = source_map._patches
+    assert patches
+    for line in range(document.blockCount() + 5):
+        assert source_map.source_line(line) == source_line(patches, line)
+        assert source_map.editor_line(line) == editor_line(patches, line)
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FlowMark 性能追踪测试
+"""
+
+import pytest
+from PyQt6.QtCore import QObject
+from PyQt6.QtGui import QAction
+
+from flowmark.utils.tracing import Tracer, traced, tracer
+
+
+class _Target(QObject):
+    def __init__(self):
+        super().__init__()
+        self.calls = []
+
+    @traced("test.no_args")
+    def no_args(self):
+        self.calls.append(())
+
+    @traced("test.checked")
+    def with_checked(self, checked):
+        self.calls.append((checked,))
+
+
+def test_traced_keeps_signature_errors():
+    target = _Target()
+    with pytest.raises(TypeError):
+        target.no_args(False)
+    assert target.calls == []
+
+
+def test_traced_slots_connected_to_triggered(qapp, slot_errors):
+    target = _Target()
+    action = QAction()
+    action.setCheckable(True)
+    action.triggered.connect(lambda: target.no_args())
+    action.triggered.connect(target.with_checked)
+    action.trigger()
+    assert not slot_errors
+    assert target.calls == [(), (True,)]
+
+
+def test_traced_records_when_enabled(monkeypatch):
+    monkeypatch.setattr(tracer, "enabled", True)
+    tracer.reset()
+    _Target().no_args()
+    assert tracer.percentiles("test.no_args")["count"] == 1
+
+
+def test_percentiles():
+    local = Tracer(enabled=True)
+    for value in range(1, 101):
+        local.record("span", 0, value * 1000000)
+    stats = local.percentiles("span")
+    assert stats["count"] == 100
+    assert stats["p50"] == 51
+    assert stats["p99"] == 100
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FlowMark 虚拟化预览测试
+"""
+
+import bisect
+import itertools
+import random
+
+from flowmark.preview.virtual_preview import HeightIndex
+
+
+def test_height_index_matches_prefix_sums():
+    rng = random.Random(7)
+    heights = [rng.randint(0, 50) for _ in range(300)]
+    index = HeightIndex(heights)
+    for _ in range(500):
+        position = rng.randrange(len(heights))
+        heights[position] = rng.randint(0, 50)
+        index.set(position, heights[position])
+        tops = [0] + list(itertools.accumulate(heights))
+        assert index.total == tops[-1]
+        probe = rng.randrange(len(heights) + 1)
+        assert index.top(probe) == tops[probe]
+        y = rng.randrange(tops[-1] + 10)
+        # y 所在的块：最后一个顶部不超过 y 的块，零高度的块不会被选中
+        expected = min(bisect.bisect_right(tops, y) - 1, len(heights) - 1)
+        assert index.find(y) == expected
+
+
+def test_height_index_empty():
+    index = HeightIndex()
+    assert len(index) == 0
+    assert index.total == 0
+    assert index.find(10) == -1
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+FlowMark 工作区后台索引测试
+"""
+
+import threading
+import time
+
+from flowmark.ui.workspace_indexer import WorkspaceIndexer
+
+
+class _FakeIndex:
+    def __init__(self):
+        self.updated = threading.Event()
+        self.updates = 0
+
+    def update(self, progress=None, cancelled=None):
+        self.updates += 1
+        self.updated.set()
+        return {"files": 0, "indexed": 0, "removed": 0, "unchanged": 0, "seconds": 0.0}
+
+    def release(self):
+        pass
+
+
+def test_request_while_thread_exits_is_not_lost(qapp):
+    index = _FakeIndex()
+    indexer = WorkspaceIndexer(index)
+    for attempt in range(300):
+        index.updated.clear()
+        indexer.request_update()
+        assert index.updated.wait(2), attempt
+        # 让下一次请求落在线程退出前后的不同时刻
+        time.sleep((attempt % 7) * 0.00005)
+    indexer.cancel()
+    indexer.wait()
+
+
+def test_indexed_result_after_close_is_ignored(window):
+    window.on_workspace_indexed({"files": 1, "indexed": 1, "removed": 0, "seconds": 0.0})
+
+
+def test_saved_file_is_indexed_without_a_full_scan(qapp, tmp_path):
+    from flowmark.utils.search_index import SearchIndex
+
+    from tests.conftest import wait_until
+
+    note = tmp_path / "note.md"
+    note.write_text("# 笔记\n\n旧内容", encoding="utf-8")
+    index = SearchIndex(str(tmp_path), str(tmp_path / "index.sqlite"))
+    indexer = WorkspaceIndexer(index)
+    full_updates = []
+    files = []
+    indexer.indexed.connect(full_updates.append)
+    indexer.file_indexed.connect(files.append)
+    indexer.request_update()
+    assert wait_until(qapp, lambda: full_updates)
+
+    note.write_text("# 笔记\n\n保存后的关键词", encoding="utf-8")
+    indexer.request_file(str(note))
+    assert wait_until(qapp, lambda: files == [str(note)])
+    assert len(full_updates) == 1
+    indexer.wait()
+    assert [result.path for result in index.search("关键词")] == [str(note)]
+    index.close()